@@ -0,0 +1,165 @@
+# backend/background.py
+"""
+Bounded in-process queue for persistence that does not shape the reply
+(memory facts, chain conversations, feedback).
+
+Routes await `background.submit(name, fn, *args)` and return right away; a
+few worker tasks run the jobs (sync functions via asyncio.to_thread) with
+jittered exponential backoff between retries. When the queue is full, submit
+waits for a free slot, so a slow store pushes back on callers instead of
+growing memory without bound. On shutdown, drain() gives queued jobs
+BACKGROUND_DRAIN_TIMEOUT seconds to finish.
+
+Writes are eventually consistent: a read right after the response may not
+see them yet.
+"""
+import os
+import time
+import random
+import asyncio
+import contextvars
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+import metrics
+
+BACKGROUND_QUEUE_SIZE = int(os.getenv("BACKGROUND_QUEUE_SIZE", "1000"))
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))
+BACKGROUND_RETRIES = int(os.getenv("BACKGROUND_RETRIES", "3"))
+BACKGROUND_RETRY_BASE_MS = float(os.getenv("BACKGROUND_RETRY_BASE_MS", "200"))
+BACKGROUND_RETRY_MAX_MS = float(os.getenv("BACKGROUND_RETRY_MAX_MS", "5000"))
+BACKGROUND_DRAIN_TIMEOUT = float(os.getenv("BACKGROUND_DRAIN_TIMEOUT", "10"))
+
+
+class WorkQueue:
+    def __init__(
+        self,
+        maxsize: int = BACKGROUND_QUEUE_SIZE,
+        workers: int = BACKGROUND_WORKERS,
+        retries: int = BACKGROUND_RETRIES,
+    ):
+        self.maxsize = maxsize
+        self.workers = workers
+        self.retries = retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop = None
+        self._tasks = []
+        self._closed = False
+        self._rng = random.Random()
+        self._outcomes = Counter()  # (job, outcome) -> count
+        self._stats = {"submitted": 0, "waited_for_slot": 0}
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # First use, or a new event loop (tests, benchmarks): the old
+        # queue and workers belong to a loop that is gone
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        # Workers start from an empty context so they do not inherit (and
+        # keep writing into) the request that happened to start them
+        self._tasks = [
+            contextvars.Context().run(loop.create_task, self._worker())
+            for _ in range(self.workers)
+        ]
+
+    async def submit(self, name: str, fn: Callable, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) to run after the caller has moved on.
+        """
+        if self._closed:
+            # Shutting down (or shut down): nobody will run it later, so do it now
+            await self._run(name, fn, args, kwargs)
+            return
+        self._ensure_started()
+        job = (name, fn, args, kwargs)
+        self._stats["submitted"] += 1
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._stats["waited_for_slot"] += 1
+            await self._queue.put(job)
+        metrics.observe_background_depth(self._queue.qsize())
+
+    def _backoff(self, attempt: int) -> float:
+        cap = min(BACKGROUND_RETRY_MAX_MS, BACKGROUND_RETRY_BASE_MS * (2 ** attempt)) / 1000.0
+        return self._rng.uniform(0, cap)
+
+    async def _run(self, name: str, fn: Callable, args, kwargs):
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(fn):
+                    await fn(*args, **kwargs)
+                else:
+                    await asyncio.to_thread(fn, *args, **kwargs)
+            except Exception as e:
+                if attempt >= self.retries:
+                    self._record(name, "failed", time.perf_counter() - start)
+                    print(f"Background job {name} failed after {attempt + 1} attempts:", e)
+                    return
+                self._record(name, "retried", time.perf_counter() - start)
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+            else:
+                self._record(name, "ok", time.perf_counter() - start)
+                return
+
+    def _record(self, name: str, outcome: str, seconds: float):
+        self._outcomes[(name, outcome)] += 1
+        metrics.observe_background_job(name, outcome, seconds)
+
+    async def _worker(self):
+        queue = self._queue
+        while True:
+            name, fn, args, kwargs = await queue.get()
+            try:
+                await self._run(name, fn, args, kwargs)
+            finally:
+                queue.task_done()
+                metrics.observe_background_depth(queue.qsize())
+
+    def open(self):
+        """
+        Accept queued jobs again after drain() (a new app lifespan in the
+        same process); until then submitted jobs run inline.
+        """
+        self._closed = False
+
+    async def drain(self, timeout: float = BACKGROUND_DRAIN_TIMEOUT):
+        """
+        Stop taking new jobs and wait up to `timeout` for queued ones.
+        """
+        self._closed = True
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Background queue drain timed out; {self._queue.qsize()} jobs dropped")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def stats(self) -> Dict:
+        jobs: Dict[str, Dict[str, int]] = {}
+        for (name, outcome), count in self._outcomes.items():
+            jobs.setdefault(name, {})[outcome] = count
+        return {
+            **self._stats,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "capacity": self.maxsize,
+            "workers": self.workers,
+            "jobs": jobs,
+        }
+
+
+queue = WorkQueue()
+
+
+async def submit(name: str, fn: Callable, *args, **kwargs):
+    await queue.submit(name, fn, *args, **kwargs)
@@ -0,0 +1,129 @@
+"""
+Micro-benchmark for language detection.
+
+Compares the old per-route implementation (per-character CJK loop, unseeded
+langdetect on every call) with the shared language module, uncached and cached.
+
+    cd backend
+    python bench/bench_language.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLES = [
+    "hello",
+    "hola",
+    "How do I save money for a car while I'm still a student?",
+    "Can you help me plan a weekly budget for groceries and rent?",
+    "¿Cuánto debería ahorrar cada mes para comprar un coche?",
+    "Comment puis-je réduire mes dépenses mensuelles sans trop de sacrifices ?",
+    "Wie kann ich als Student am besten für ein Auto sparen?",
+    "学生のうちに車のためにどうやって貯金すればいいですか？",
+    "我是学生，怎样才能为买车存钱？",
+    "학생인데 차를 사기 위해 어떻게 저축해야 하나요?",
+    "Как студенту накопить на машину?",
+    "Qual é a melhor forma de poupar dinheiro para um carro?",
+]
+ROUNDS = 200
+
+
+def legacy_detect_language(text: str) -> str:
+    # Verbatim copy of the detection that used to live in routes/chat.py
+    from langdetect import detect, LangDetectException
+    from language import language_name
+
+    if not text:
+        return "English"
+    cleaned = " ".join(text.strip().split())
+    lowered = cleaned.lower()
+
+    greeting_map = {
+        "hello": "English", "hi": "English", "hey": "English", "yo": "English",
+        "sup": "English", "hola": "Spanish", "bonjour": "French", "salut": "French",
+        "ciao": "Italian", "hallo": "German", "guten tag": "German",
+        "ola": "Portuguese", "oi": "Portuguese", "hej": "Swedish", "hei": "English",
+    }
+
+    if len(lowered) <= 20:
+        if lowered in greeting_map:
+            return greeting_map[lowered]
+        if all(ord(ch) < 128 for ch in lowered):
+            return "English"
+
+    for ch in text:
+        code = ord(ch)
+        if 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
+            return "Korean"
+        if 0x3040 <= code <= 0x309F or 0x30A0 <= code <= 0x30FF:
+            return "Japanese"
+        if 0x4E00 <= code <= 0x9FFF:
+            return "Chinese"
+    try:
+        return language_name(detect(text))
+    except LangDetectException:
+        return "English"
+
+
+def per_call_us(fn, rounds=ROUNDS, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for text in SAMPLES:
+                fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best / (rounds * len(SAMPLES)) * 1e6
+
+
+def legacy_script_scan(text):
+    for ch in text:
+        code = ord(ch)
+        if 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
+            return "Korean"
+        if 0x3040 <= code <= 0x309F or 0x30A0 <= code <= 0x30FF:
+            return "Japanese"
+        if 0x4E00 <= code <= 0x9FFF:
+            return "Chinese"
+    return None
+
+
+def main():
+    import language
+
+    start = time.perf_counter()
+    language.warm_up()
+    print(f"profile warm-up:            {(time.perf_counter() - start) * 1e3:8.1f} ms (once, at startup)")
+
+    legacy = per_call_us(legacy_detect_language, rounds=ROUNDS // 10)
+
+    def uncached(text):
+        language._detect_normalized.cache_clear()
+        return language.detect_language(text)
+
+    fresh = per_call_us(uncached, rounds=ROUNDS // 10)
+    language._detect_normalized.cache_clear()
+    cached = per_call_us(language.detect_language)
+
+    print(f"legacy (per call):          {legacy:8.1f} us")
+    print(f"shared, cache miss:         {fresh:8.1f} us")
+    print(f"shared, cache hit:          {cached:8.2f} us  ({legacy / cached:,.0f}x faster than legacy)")
+
+    # Script classifier alone, worst case: no CJK character anywhere
+    long_latin = " ".join(SAMPLES[2:7]) * 10
+    n = 2000
+    start = time.perf_counter()
+    for _ in range(n):
+        legacy_script_scan(long_latin)
+    loop_us = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    for _ in range(n):
+        language._SCRIPT_RE.search(long_latin)
+    regex_us = (time.perf_counter() - start) / n * 1e6
+    print(f"script scan, {len(long_latin)} chars:  loop {loop_us:8.1f} us  vs  compiled {regex_us:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+In-process stand-in for the Firestore client, for load tests.
+
+Implements the subset of the google-cloud-firestore API the app uses
+(collection / document / get / set / update / where / limit / stream /
+on_snapshot, ArrayUnion and SERVER_TIMESTAMP). Every RPC blocks for
+FAKE_FIRESTORE_LATENCY_MS, like the real synchronous client does, so
+calls made directly on the event loop show up as loop lag.
+"""
+import os
+import copy
+import time
+import uuid
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+from google.cloud.firestore_v1.transforms import ArrayUnion, Sentinel
+
+FAKE_FIRESTORE_LATENCY_MS = float(os.getenv("FAKE_FIRESTORE_LATENCY_MS", "20"))
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict]):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeWatch:
+    def __init__(self, collection, callback):
+        self._collection = collection
+        self._callback = callback
+        self.is_active = True
+
+    def unsubscribe(self):
+        self.is_active = False
+        self._collection._watches.discard(self)
+
+
+def _change(kind: str, snap: FakeSnapshot):
+    return SimpleNamespace(type=SimpleNamespace(name=kind), document=snap)
+
+
+class FakeDocument:
+    def __init__(self, collection, doc_id: str):
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self) -> FakeSnapshot:
+        self._collection._client._rpc()
+        with self._collection._client._lock:
+            data = self._collection._docs.get(self.id)
+            return FakeSnapshot(self.id, copy.deepcopy(data) if data is not None else None)
+
+    def set(self, data: Dict):
+        self._collection._client._rpc()
+        with self._collection._client._lock:
+            existed = self.id in self._collection._docs
+            self._collection._docs[self.id] = _resolve(data, {})
+        self._collection._notify("MODIFIED" if existed else "ADDED", self.id)
+
+    def update(self, data: Dict):
+        from google.api_core.exceptions import NotFound
+
+        self._collection._client._rpc()
+        with self._collection._client._lock:
+            current = self._collection._docs.get(self.id)
+            if current is None:
+                raise NotFound(f"No document to update: {self.id}")
+            self._collection._docs[self.id] = {**current, **_resolve(data, current)}
+        self._collection._notify("MODIFIED", self.id)
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=(), limit=None):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._limit = limit
+
+    def where(self, field: str, op: str, value):
+        return FakeQuery(self._collection, self._filters + ((field, op, value),), self._limit)
+
+    def limit(self, count: int):
+        return FakeQuery(self._collection, self._filters, count)
+
+    def stream(self):
+        self._collection._client._rpc()
+        with self._collection._client._lock:
+            items = [
+                FakeSnapshot(doc_id, copy.deepcopy(data))
+                for doc_id, data in self._collection._docs.items()
+                if all(_matches(data, f) for f in self._filters)
+            ]
+        return iter(items[:self._limit] if self._limit is not None else items)
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client, name: str):
+        super().__init__(self)
+        self._client = client
+        self.name = name
+        self._docs = {}
+        self._watches = set()
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocument:
+        return FakeDocument(self, doc_id or uuid.uuid4().hex[:20])
+
+    def on_snapshot(self, callback) -> FakeWatch:
+        watch = FakeWatch(self, callback)
+        with self._client._lock:
+            snaps = [FakeSnapshot(i, copy.deepcopy(d)) for i, d in self._docs.items()]
+        self._watches.add(watch)
+        callback(snaps, [_change("ADDED", s) for s in snaps], datetime.now(timezone.utc))
+        return watch
+
+    def _notify(self, kind: str, doc_id: str):
+        if not self._watches:
+            return
+        with self._client._lock:
+            snap = FakeSnapshot(doc_id, copy.deepcopy(self._docs.get(doc_id)))
+        for watch in list(self._watches):
+            watch._callback([snap], [_change(kind, snap)], datetime.now(timezone.utc))
+
+
+class FakeFirestore:
+    def __init__(self, latency_ms: Optional[float] = None):
+        self.latency_ms = FAKE_FIRESTORE_LATENCY_MS if latency_ms is None else latency_ms
+        self._lock = threading.Lock()
+        self._collections = {}
+        self.rpcs = 0
+
+    def _rpc(self):
+        self.rpcs += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def collection(self, name: str) -> FakeCollection:
+        with self._lock:
+            coll = self._collections.get(name)
+            if coll is None:
+                coll = self._collections[name] = FakeCollection(self, name)
+            return coll
+
+    def seed(self, name: str, docs: Dict[str, Dict]):
+        """
+        Load documents without paying RPC latency.
+        """
+        coll = self.collection(name)
+        with self._lock:
+            for doc_id, data in docs.items():
+                coll._docs[doc_id] = copy.deepcopy(data)
+
+
+def _resolve(data: Dict, current: Dict) -> Dict:
+    out = {}
+    for key, value in data.items():
+        if isinstance(value, ArrayUnion):
+            existing = list(current.get(key) or [])
+            out[key] = existing + [v for v in value.values if v not in existing]
+        elif isinstance(value, Sentinel):
+            out[key] = datetime.now(timezone.utc)
+        else:
+            out[key] = copy.deepcopy(value)
+    return out
+
+
+def _matches(data: Dict, flt) -> bool:
+    field, op, value = flt
+    actual = data.get(field)
+    if op == "==":
+        return actual == value
+    if op == "array-contains":
+        return isinstance(actual, list) and value in actual
+    if op == "array-contains-any":
+        return isinstance(actual, list) and any(v in actual for v in value)
+    if op == "in":
+        return actual in value
+    raise NotImplementedError(f"Unsupported filter op: {op}")
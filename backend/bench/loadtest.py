@@ -0,0 +1,425 @@
+"""
+End-to-end load test for the FastAPI app.
+
+Drives the real routes in-process (httpx + ASGI transport) with concurrent
+closed-loop clients. Firestore is replaced by bench/fake_firestore.py and
+the LLM by the fake backend (LLM_BACKEND=fake), so nothing leaves the
+machine. Each scenario runs on its own and reports throughput, latency
+percentiles and event-loop lag (how late a 10 ms timer fires while the
+scenario runs; anything blocking the loop shows up here).
+
+    cd backend
+    python bench/loadtest.py                      # run all scenarios
+    python bench/loadtest.py --only chat_query    # comma-separated subset
+    python bench/loadtest.py --save               # write bench/baseline.json
+    python bench/loadtest.py --compare            # exit 1 on regression vs baseline
+    python bench/loadtest.py --runs 5             # median of 5 runs (default 3)
+
+STORAGE_BACKEND=memory or sqlite runs the same scenarios against the local
+stores instead of the Firestore stand-in.
+
+Client and app share one event loop, so numbers are relative: compare runs
+on the same machine with the same settings, not against production. A single
+run is noisy; each scenario is run --runs times (interleaved) and the median
+of every metric is reported, saved and compared.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+from types import ModuleType
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("OPENAI_API_KEY", "load-test")
+os.environ.setdefault("STORAGE_BACKEND", "firestore")
+if os.environ["STORAGE_BACKEND"] == "sqlite":
+    os.environ.setdefault("STORAGE_SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "loadtest.db"))
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+LAG_INTERVAL = 0.01
+
+AGENTS = {
+    "cars": {"name": "Car Buddy", "role": "Car buying advisor", "specialties": ["cars", "car buying", "car insurance"]},
+    "money": {"name": "Penny", "role": "Personal finance coach", "specialties": ["budgeting", "saving", "money"]},
+    "fitness": {"name": "Coach Kim", "role": "Fitness coach", "specialties": ["fitness", "workouts", "running"]},
+    "cooking": {"name": "Chef Lu", "role": "Home cooking helper", "specialties": ["cooking", "recipes", "meal prep"]},
+    "travel": {"name": "Nomad", "role": "Travel planner", "specialties": ["travel", "flights", "packing"]},
+    "study": {"name": "Prof Ada", "role": "Study coach", "specialties": ["studying", "exams", "math"]},
+}
+
+MESSAGES = [
+    "hello",
+    "What car should I buy as a student on a budget?",
+    "How much should I save every month for a new car?",
+    "Can you give me a beginner running plan for three days a week?",
+    "What is a quick healthy dinner I can cook in twenty minutes?",
+    "How do I pack light for a two week trip to Japan?",
+    "What is the best way to study for a math exam in one week?",
+    "Is leasing or financing a car better if I drive a lot?",
+    "My name is Sam and I prefer vegetarian recipes",
+    "¿Cómo puedo ahorrar dinero para un viaje?",
+    "Comment préparer un budget mensuel simple ?",
+    "How many push ups should I do per day to get stronger?",
+]
+
+# Write scenarios use their own agent ids, so the read scenarios (kb_list,
+# feedback_stats) see the same seeded records on every run instead of
+# however much earlier scenarios and runs happened to write
+WRITE_AGENTS = [f"scratch-{agent_id}" for agent_id in AGENTS]
+SEED_KB_DOCS = 25
+SEED_FEEDBACK = 100
+
+HELP_PROMPTS = [
+    "I need help choosing a used car",
+    "help me build a monthly budget",
+    "I want to start running again",
+    "what should I cook for meal prep this week",
+    "planning flights for a trip to Lisbon",
+    "I want to learn gardening for my balcony",
+]
+
+
+def seed_docs():
+    return {
+        agent_id: {
+            **agent,
+            "persona": f"You are {agent['name']}, friendly and practical.",
+            "summary": f"Helps with {', '.join(agent['specialties'][:2])}.",
+            "guidelines": "Keep answers short.",
+            "memory": [f"User likes {s}" for s in agent["specialties"]],
+            "isActive": True,
+            "createdAt": "2024-01-01T00:00:00",
+        }
+        for agent_id, agent in AGENTS.items()
+    }
+
+
+def seed_records():
+    """
+    collection -> {doc id: record} read by the kb_list and feedback_stats scenarios.
+    """
+    rng = random.Random(0)
+    kb, feedback = {}, {}
+    for agent_id in AGENTS:
+        for i in range(SEED_KB_DOCS):
+            kb[f"{agent_id}-kb-{i}"] = {
+                "agent_id": agent_id,
+                "content": " ".join(rng.choice(MESSAGES) for _ in range(8)),
+                "metadata": {"source_type": "text"},
+                "created_at": "2024-01-01T00:00:00",
+            }
+        for i in range(SEED_FEEDBACK):
+            feedback[f"{agent_id}-chat_{i}"] = {
+                "chat_id": f"{agent_id}-chat",
+                "message_id": str(i),
+                "agent_id": agent_id,
+                "feedback_type": rng.choice(["thumbs_up", "thumbs_up", "thumbs_down", "flag_incorrect"]),
+                "user_comment": rng.choice(["", "", "great answer", "too long"]),
+                "created_at": "2024-01-01T00:00:00",
+            }
+    return {"knowledge_base": kb, "feedback": feedback}
+
+
+def install_storage():
+    """
+    Seed the selected store. For Firestore, make `from firebase_admin_init
+    import db` return the in-process fake; must run before the app is imported.
+    Returns the fake client, or None for local stores.
+    """
+    if os.environ["STORAGE_BACKEND"] != "firestore":
+        from storage import get_store
+
+        store = get_store()
+        for agent_id, doc in seed_docs().items():
+            store.put_agent(agent_id, doc)
+        for collection, records in seed_records().items():
+            for doc_id, data in records.items():
+                store.add(collection, data, doc_id)
+        return None
+
+    from fake_firestore import FakeFirestore
+
+    fake = FakeFirestore()
+    module = ModuleType("firebase_admin_init")
+    module.db = fake
+    sys.modules["firebase_admin_init"] = module
+    fake.seed("agents", seed_docs())
+    for collection, records in seed_records().items():
+        fake.seed(collection, records)
+    return fake
+
+
+# ===== SCENARIOS =====
+# Each scenario issues one request and returns the response.
+
+async def chat_query(client, rng):
+    return await client.post("/chat/query", json={
+        "agent_id": rng.choice(list(AGENTS)),
+        "user_message": rng.choice(MESSAGES),
+    })
+
+
+async def chains_query(client, rng):
+    primary, secondary = rng.sample(list(AGENTS), 2)
+    return await client.post("/chains/query", json={
+        "primary_agent_id": primary,
+        "secondary_agent_id": secondary,
+        "user_message": rng.choice(MESSAGES),
+        "pass_context": rng.random() < 0.5,
+    })
+
+
+async def help_route(client, rng):
+    return await client.post("/help/route", json={"prompt": rng.choice(HELP_PROMPTS)})
+
+
+async def kb_upload(client, rng):
+    return await client.post("/kb/upload-text", json={
+        "agent_id": rng.choice(WRITE_AGENTS),
+        "content": " ".join(rng.choice(MESSAGES) for _ in range(8)),
+        "metadata": {"source_type": "text"},
+    })
+
+
+async def kb_list(client, rng):
+    return await client.get(f"/kb/agent/{rng.choice(list(AGENTS))}")
+
+
+async def feedback_submit(client, rng):
+    n = rng.randrange(1_000_000)
+    return await client.post("/feedback/", json={
+        "chat_id": f"chat-{n % 500}",
+        "message_id": f"msg-{n}",
+        "agent_id": rng.choice(WRITE_AGENTS),
+        "feedback_type": rng.choice(["thumbs_up", "thumbs_up", "thumbs_down", "flag_incorrect"]),
+        "user_comment": rng.choice(["", "", "great answer", "too long"]),
+    })
+
+
+async def feedback_stats(client, rng):
+    return await client.get(f"/feedback/stats/{rng.choice(list(AGENTS))}")
+
+
+SCENARIOS = {
+    "chat_query": chat_query,
+    "chains_query": chains_query,
+    "help_route": help_route,
+    "kb_upload": kb_upload,
+    "kb_list": kb_list,
+    "feedback_submit": feedback_submit,
+    "feedback_stats": feedback_stats,
+}
+
+
+# ===== MEASUREMENT =====
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100.0 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def monitor_loop_lag(samples, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, time.perf_counter() - start - LAG_INTERVAL))
+
+
+async def run_scenario(client, name, fn, concurrency, duration, seed):
+    latencies = []
+    errors = 0
+    lag = []
+    stop = asyncio.Event()
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(f"{seed}:{name}:{worker_id}")
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                resp = await fn(client, rng)
+                failed = resp.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    monitor = asyncio.create_task(monitor_loop_lag(lag, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+
+    latencies.sort()
+    lag.sort()
+    ms = lambda s: round(s * 1000, 2)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+        "loop_lag_p99_ms": ms(percentile(lag, 99)),
+        "loop_lag_max_ms": ms(lag[-1]) if lag else 0.0,
+    }
+
+
+def median_row(rows):
+    """
+    Per-metric median over runs; errors keep the worst run.
+    """
+    out = {}
+    for column in COLUMNS:
+        values = sorted(row[column] for row in rows)
+        if column == "errors":
+            out[column] = values[-1]
+        elif len(values) % 2:
+            out[column] = values[len(values) // 2]
+        else:
+            out[column] = round((values[len(values) // 2 - 1] + values[len(values) // 2]) / 2, 2)
+    out["runs"] = len(rows)
+    return out
+
+
+async def run(names, concurrency, duration, seed, runs):
+    import httpx
+    from main import app
+
+    rows = {name: [] for name in names}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            # Interleaved, so slow drift on the machine hits every scenario alike
+            for i in range(runs):
+                for name in names:
+                    row = await run_scenario(client, name, SCENARIOS[name], concurrency, duration, f"{seed}:{i}")
+                    rows[name].append(row)
+                    print_row(f"{name}#{i + 1}" if runs > 1 else name, row)
+    results = {name: median_row(rows[name]) for name in names}
+    if runs > 1:
+        print(f"median of {runs} runs:")
+        for name in names:
+            print_row(name, results[name])
+    return results
+
+
+# ===== REPORTING =====
+
+COLUMNS = ["requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "loop_lag_p99_ms", "loop_lag_max_ms"]
+
+
+def print_header():
+    print(f"{'scenario':<20}" + "".join(f"{c:>16}" for c in COLUMNS))
+
+
+def print_row(name, row):
+    print(f"{name:<20}" + "".join(f"{row[c]:>16}" for c in COLUMNS), flush=True)
+
+
+def settings(args):
+    return {
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "runs": args.runs,
+        "seed": args.seed,
+        "llm_backend": os.getenv("LLM_BACKEND"),
+        "storage_backend": os.environ["STORAGE_BACKEND"],
+        "fake_llm_latency_ms": os.getenv("FAKE_LLM_LATENCY_MS", "300"),
+        "fake_llm_latency_dist": os.getenv("FAKE_LLM_LATENCY_DIST", "lognormal"),
+        "fake_firestore_latency_ms": os.getenv("FAKE_FIRESTORE_LATENCY_MS", "20"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Flag scenarios whose p95 / p99 / loop lag grew, or whose throughput
+    dropped, by more than `tolerance`. Returns a list of messages.
+    """
+    regressions = []
+    for name, row in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for metric in ("p95_ms", "p99_ms", "loop_lag_p99_ms"):
+            # Ignore sub-millisecond noise on near-zero baselines
+            limit = max(base[metric] * (1 + tolerance), base[metric] + 1.0)
+            if row[metric] > limit:
+                regressions.append(f"{name}: {metric} {base[metric]} -> {row[metric]}")
+        if row["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {base['rps']} -> {row['rps']}")
+        if row["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {row['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default="", help="comma-separated scenarios (default: all)")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients per scenario")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--runs", type=int, default=3, help="runs per scenario; medians are reported (default 3)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", action="store_true", help=f"write results to {BASELINE_PATH}")
+    parser.add_argument("--compare", action="store_true", help="compare against the saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.4, help="allowed relative slowdown of the medians (default 0.4)")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.only.split(",") if n.strip()] or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+
+    fake_db = install_storage()
+    print(f"concurrency={args.concurrency} duration={args.duration}s per scenario, {args.runs} run(s)")
+    print_header()
+    results = asyncio.run(run(names, args.concurrency, args.duration, args.seed, args.runs))
+    if fake_db is not None:
+        print(f"firestore rpcs: {fake_db.rpcs}")
+
+    if args.save:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings(args), "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {BASELINE_PATH}")
+
+    if args.compare:
+        if not os.path.exists(BASELINE_PATH):
+            sys.exit(f"no baseline at {BASELINE_PATH}; run with --save first")
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+        recorded = baseline.get("settings", {})
+        changed = {k: v for k, v in settings(args).items() if recorded.get(k) != v}
+        if changed:
+            print("warning: baseline was recorded with different settings:",
+                  {k: (recorded.get(k), v) for k, v in changed.items()})
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("REGRESSIONS:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("no regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
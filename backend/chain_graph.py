@@ -0,0 +1,144 @@
+# backend/chain_graph.py
+"""
+Scheduler for multi-agent chains described as a DAG (POST /chains/graph).
+
+Every node starts as soon as the nodes it depends on have finished, so
+independent nodes run concurrently and the chain takes as long as its
+critical path, not the sum of its nodes. Each node gets its own deadline
+(capped by what is left of the chain deadline); a node that times out or
+whose LLM call fails is dropped, and its dependents run with whatever
+upstream answers did arrive.
+"""
+import os
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, List
+
+import llm
+
+CHAIN_TIMEOUT = float(os.getenv("CHAIN_TIMEOUT", "60"))
+CHAIN_NODE_TIMEOUT = float(os.getenv("CHAIN_NODE_TIMEOUT", "30"))
+CHAIN_MAX_NODES = int(os.getenv("CHAIN_MAX_NODES", "16"))
+# Floor for client-supplied deadlines; anything shorter cannot finish an LLM call
+CHAIN_MIN_TIMEOUT = float(os.getenv("CHAIN_MIN_TIMEOUT", "1"))
+
+
+class ChainGraphError(ValueError):
+    pass
+
+
+def topological_order(nodes) -> List:
+    """
+    Nodes ordered so that every node comes after its dependencies.
+    Raises ChainGraphError for duplicate ids, unknown dependencies or cycles.
+    """
+    if not nodes:
+        raise ChainGraphError("A chain needs at least one node")
+    if len(nodes) > CHAIN_MAX_NODES:
+        raise ChainGraphError(f"A chain can have at most {CHAIN_MAX_NODES} nodes")
+
+    by_id = {}
+    for node in nodes:
+        if node.id in by_id:
+            raise ChainGraphError(f"Duplicate node id: {node.id}")
+        by_id[node.id] = node
+    for node in nodes:
+        for dep in node.depends_on:
+            if dep not in by_id:
+                raise ChainGraphError(f"Node {node.id} depends on unknown node {dep}")
+
+    # Kahn's algorithm; keeps the request order among ready nodes
+    pending = {node.id: len(set(node.depends_on)) for node in nodes}
+    dependents: Dict[str, List[str]] = {node.id: [] for node in nodes}
+    for node in nodes:
+        for dep in set(node.depends_on):
+            dependents[dep].append(node.id)
+
+    order = []
+    ready = [node.id for node in nodes if pending[node.id] == 0]
+    while ready:
+        node_id = ready.pop(0)
+        order.append(by_id[node_id])
+        for child in dependents[node_id]:
+            pending[child] -= 1
+            if pending[child] == 0:
+                ready.append(child)
+    if len(order) != len(nodes):
+        raise ChainGraphError("Chain graph has a cycle")
+    return order
+
+
+def critical_path(nodes, results: Dict[str, Dict]) -> List[str]:
+    """
+    Node ids along the longest chain of node durations.
+    """
+    best: Dict[str, tuple] = {}  # node id -> (ms up to and including it, path)
+    for node in topological_order(nodes):
+        upstream = max((best[dep] for dep in node.depends_on), default=(0.0, []), key=lambda b: b[0])
+        best[node.id] = (upstream[0] + results[node.id]["ms"], upstream[1] + [node.id])
+    return max(best.values(), key=lambda b: b[0])[1]
+
+
+def frontier(nodes, results: Dict[str, Dict]) -> List[str]:
+    """
+    Answered nodes whose answer no other answered node has built on; these
+    are what the synthesizer merges.
+    """
+    consumed = set()
+    for node in nodes:
+        if results[node.id]["status"] == "ok":
+            consumed.update(node.depends_on)
+    return [
+        node.id for node in nodes
+        if results[node.id]["status"] == "ok" and node.id not in consumed
+    ]
+
+
+async def run(
+    nodes,
+    run_node: Callable[..., Awaitable[str]],
+    deadline: float,
+    node_timeout: float = CHAIN_NODE_TIMEOUT,
+) -> Dict[str, Dict]:
+    """
+    Run every node; `run_node(node, upstream, timeout)` gets the answers of
+    its dependencies that succeeded ({node id: text}) and returns its own.
+
+    Returns {node id: {"status": ok | timeout | error, "ms", "text"?, "error"?}}.
+    `deadline` is a time.monotonic() value for the whole graph.
+    """
+    order = topological_order(nodes)
+    tasks: Dict[str, asyncio.Future] = {}
+
+    async def execute(node) -> Dict:
+        upstream = {}
+        for dep in node.depends_on:
+            result = await tasks[dep]
+            if result["status"] == "ok":
+                upstream[dep] = result["text"]
+
+        budget = min(max(node.timeout or node_timeout, CHAIN_MIN_TIMEOUT), deadline - time.monotonic())
+        if budget <= 0:
+            return {"status": "timeout", "ms": 0.0}
+
+        start = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(run_node(node, upstream, budget), budget)
+            result = {"status": "ok", "text": text}
+        except asyncio.TimeoutError:
+            result = {"status": "timeout"}
+        except llm.LLMError as e:
+            result = {"status": "error", "error": str(e)}
+        result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    # Dependencies come first, so tasks[dep] exists by the time anyone awaits it
+    for node in order:
+        tasks[node.id] = asyncio.ensure_future(execute(node))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return {node_id: task.result() for node_id, task in tasks.items()}
@@ -1,63 +1,232 @@
 # backend/db.py
-from typing import Optional, List, Dict
+import os
+import time
+import threading
+import uuid
+from typing import Optional, List, Dict, Callable
 from datetime import datetime
-from firebase_admin_init import db
+import memory_index
+from link_graph import LinkGraph, link_id
+import metrics
+import storage
+from storage import get_store
+from storage.base import (
+    COLLECTION_FEEDBACK,
+    COLLECTION_KB,
+    COLLECTION_SAVED_RESPONSES,
+    COLLECTION_AGENT_CHAINS,
+    COLLECTION_CHAIN_CONVERSATIONS,
+)
+
+# Persistence is delegated to the store selected by STORAGE_BACKEND
+# (firestore, memory or sqlite); see storage/__init__.py.
+
+# ===== AGENT CACHE =====
+# Agent documents are read on almost every request (chat, chains, memory).
+# They are cached in-process and kept fresh by the store's change feed
+# (a Firestore snapshot listener). If there is no feed, cached entries
+# fall back to expiring after AGENT_CACHE_TTL seconds.
+
+AGENT_CACHE_TTL = float(os.getenv("AGENT_CACHE_TTL", "300"))
+AGENT_CACHE_WATCH = os.getenv("AGENT_CACHE_WATCH", "1") != "0"
+
+_agent_cache = {}  # agent_id -> (data, cached_at)
+_agent_cache_lock = threading.Lock()
+_agent_watch_lock = threading.Lock()
+_agent_fetch_locks = {}  # agent_id -> Lock, so concurrent misses share one read
+_agent_cache_stats = {"hits": 0, "misses": 0, "snapshot_updates": 0}
+_agent_change_hooks = []
+_agent_watch = None
+_agent_watch_loaded = False  # True once the listener delivered the full collection
+_agent_watch_retry_at = 0.0
+
+
+def on_agent_change(fn: Callable[[str, Optional[Dict]], None]):
+    """
+    Register fn(agent_id, agent_or_None) to be called when the listener
+    sees an agent added, modified or removed.
+    """
+    _agent_change_hooks.append(fn)
+
+
+def _agent_watch_live() -> bool:
+    return _agent_watch is not None and getattr(_agent_watch, "is_active", False)
+
+
+def _ensure_agent_watch():
+    global _agent_watch, _agent_watch_loaded, _agent_watch_retry_at
+    if not AGENT_CACHE_WATCH or _agent_watch_live():
+        return
+    if time.monotonic() < _agent_watch_retry_at:
+        return
+    with _agent_watch_lock:
+        if _agent_watch_live() or time.monotonic() < _agent_watch_retry_at:
+            return
+        if _agent_watch is not None:
+            # Listener stopped streaming -> replace it
+            try:
+                _agent_watch.unsubscribe()
+            except Exception:
+                pass
+            _agent_watch = None
+            _agent_watch_loaded = False
+
+        # Whatever happens, do not try again before the TTL fallback kicks in
+        _agent_watch_retry_at = time.monotonic() + AGENT_CACHE_TTL
+        try:
+            _agent_watch = get_store().watch_agents(_on_agents_changed)
+        except Exception as e:
+            # TTL fallback keeps working without the listener
+            print("Agent snapshot listener unavailable:", e)
+
+
+def _on_agents_changed(changed):
+    global _agent_watch_loaded
+    now = time.monotonic()
+    with _agent_cache_lock:
+        for agent_id, data in changed:
+            if data is None:
+                _agent_cache.pop(agent_id, None)
+            else:
+                _agent_cache[agent_id] = (data, now)
+        _agent_cache_stats["snapshot_updates"] += len(changed)
+        _agent_watch_loaded = True
+
+    for agent_id, data in changed:
+        for fn in _agent_change_hooks:
+            try:
+                fn(agent_id, dict(data) if data else None)
+            except Exception as e:
+                print("Agent change hook failed:", e)
+
+
+def _get_cached_agent(agent_id: str) -> Optional[Dict]:
+    with _agent_cache_lock:
+        entry = _agent_cache.get(agent_id)
+        if entry is not None:
+            data, cached_at = entry
+            if _agent_watch_live() or time.monotonic() - cached_at < AGENT_CACHE_TTL:
+                _agent_cache_stats["hits"] += 1
+                return dict(data)
+            del _agent_cache[agent_id]
+        _agent_cache_stats["misses"] += 1
+        return None
+
 
-COLLECTION_AGENTS = "agents"
-COLLECTION_FEEDBACK = "feedback"
-COLLECTION_KB = "knowledge_base"
-COLLECTION_SAVED_RESPONSES = "saved_responses"
-COLLECTION_AGENT_CHAINS = "agent_chains"
+def _cache_agent(agent_id: str, data: Dict):
+    with _agent_cache_lock:
+        _agent_cache[agent_id] = (data, time.monotonic())
+
+
+def agent_cache_stats() -> Dict:
+    with _agent_cache_lock:
+        return {
+            **_agent_cache_stats,
+            "entries": len(_agent_cache),
+            "listener_active": _agent_watch_live(),
+            "storage_backend": get_store().name,
+            "ttl_seconds": AGENT_CACHE_TTL,
+        }
 
 # ===== AGENT FUNCTIONS =====
+# Public functions below are timed per call (metrics.db_operation_duration_seconds)
 
+_timed = metrics.timed_db(storage.backend_name)
+
+
+@_timed
+def new_agent_id() -> str:
+    """
+    Fresh id for an agent document.
+    """
+    return get_store().new_agent_id()
+
+@_timed
 def create_agent_doc(doc: Dict):
     """
-    Create a new agent document in Firestore.
+    Create a new agent document.
     """
     agent_id = doc.get("id")
     if not agent_id:
         raise ValueError("Document must have an 'id' field")
-    db.collection(COLLECTION_AGENTS).document(agent_id).set(doc)
+    stored = get_store().put_agent(agent_id, doc)
+    _cache_agent(agent_id, {**stored, "id": agent_id})
 
+@_timed
 def get_agent_by_id(agent_id: str) -> Optional[Dict]:
-    snap = db.collection(COLLECTION_AGENTS).document(agent_id).get()
-    if not snap.exists:
-        return None
-
-    data = snap.to_dict()
-    data["id"] = snap.id  #  REQUIRED
-    return data
+    _ensure_agent_watch()
+    cached = _get_cached_agent(agent_id)
+    if cached is not None:
+        return cached
+
+    with _agent_cache_lock:
+        fetch_lock = _agent_fetch_locks.setdefault(agent_id, threading.Lock())
+
+    with fetch_lock:
+        try:
+            # Another thread may have fetched it while we waited
+            with _agent_cache_lock:
+                entry = _agent_cache.get(agent_id)
+            if entry is not None:
+                return dict(entry[0])
+
+            data = get_store().get_agent(agent_id)
+            if data is None:
+                return None
+
+            _cache_agent(agent_id, data)
+            return dict(data)
+        finally:
+            with _agent_cache_lock:
+                _agent_fetch_locks.pop(agent_id, None)
+
+def peek_agent(agent_id: str) -> Optional[Dict]:
+    """
+    Agent from the in-process cache only, never the store, so it is safe to
+    call on the event loop. None means "not cached", not "missing".
+    """
+    return _get_cached_agent(agent_id)
 
+@_timed
 def list_agents() -> List[Dict]:
-    docs = db.collection(COLLECTION_AGENTS).stream()
-    agents = []
+    _ensure_agent_watch()
+    if _agent_watch_live() and _agent_watch_loaded:
+        with _agent_cache_lock:
+            return [dict(data) for data, _ in _agent_cache.values()]
 
-    for d in docs:
-        data = d.to_dict()
-        data["id"] = d.id  #  REQUIRED
-        agents.append(data)
+    agents = []
+    for data in get_store().list_agents():
+        _cache_agent(data["id"], data)
+        agents.append(dict(data))
 
     return agents
 
 # ===== FEEDBACK FUNCTIONS =====
 
+@_timed
 def save_feedback(feedback_data: Dict):
     """
     Save user feedback (thumbs up/down, comments, flagged responses).
     """
-    feedback_data["created_at"] = datetime.now().isoformat()
-    doc_id = f"{feedback_data.get('chat_id')}_{feedback_data.get('message_id')}"
-    db.collection(COLLECTION_FEEDBACK).document(doc_id).set(feedback_data)
-    return doc_id
+    # Keep the original time when a queued write is retried
+    feedback_data.setdefault("created_at", datetime.now().isoformat())
+    return get_store().add(COLLECTION_FEEDBACK, feedback_data, feedback_id(feedback_data))
 
+def feedback_id(feedback_data: Dict) -> str:
+    """
+    Document id of a feedback entry: one per chat message, so re-rating
+    a message replaces the earlier rating.
+    """
+    return f"{feedback_data.get('chat_id')}_{feedback_data.get('message_id')}"
+
+@_timed
 def get_feedback_for_agent(agent_id: str) -> List[Dict]:
     """
     Get all feedback for a specific agent.
     """
-    docs = db.collection(COLLECTION_FEEDBACK).where("agent_id", "==", agent_id).stream()
-    return [d.to_dict() for d in docs]
+    return get_store().find(COLLECTION_FEEDBACK, "agent_id", agent_id)
 
+@_timed
 def get_feedback_stats(agent_id: str) -> Dict:
     """
     Get feedback statistics (thumbs up/down counts, flagged responses).
@@ -83,6 +252,7 @@ def get_feedback_stats(agent_id: str) -> Dict:
 
 # ===== KNOWLEDGE BASE FUNCTIONS =====
 
+@_timed
 def save_kb_document(agent_id: str, content: str, metadata: Dict):
     """
     Save a knowledge base document for an agent.
@@ -93,17 +263,16 @@ def save_kb_document(agent_id: str, content: str, metadata: Dict):
         "metadata": metadata,
         "created_at": datetime.now().isoformat(),
     }
-    doc_ref = db.collection(COLLECTION_KB).document()
-    doc_ref.set(doc_data)
-    return doc_ref.id
+    return get_store().add(COLLECTION_KB, doc_data)
 
+@_timed
 def get_kb_documents(agent_id: str) -> List[Dict]:
     """
     Get all knowledge base documents for an agent.
     """
-    docs = db.collection(COLLECTION_KB).where("agent_id", "==", agent_id).stream()
-    return [d.to_dict() for d in docs]
+    return get_store().find(COLLECTION_KB, "agent_id", agent_id)
 
+@_timed
 def save_faq(agent_id: str, faq_entries: List[Dict]):
     """
     Save FAQ entries for an agent.
@@ -116,10 +285,11 @@ def save_faq(agent_id: str, faq_entries: List[Dict]):
             "category": entry.get("category", ""),
             "created_at": datetime.now().isoformat(),
         }
-        db.collection(COLLECTION_KB).document().set(faq_doc)
+        get_store().add(COLLECTION_KB, faq_doc)
 
 # ===== RESPONSE SAVING FUNCTIONS =====
 
+@_timed
 def save_response(agent_id: str, user_message: str, bot_response: str, tags: List[str] = None):
     """
     Save a bot response for later reference/bookmarking.
@@ -132,50 +302,110 @@ def save_response(agent_id: str, user_message: str, bot_response: str, tags: Lis
         "created_at": datetime.now().isoformat(),
         "likes": 0,  # for users to rate saved responses
     }
-    doc_ref = db.collection(COLLECTION_SAVED_RESPONSES).document()
-    doc_ref.set(response_data)
-    return doc_ref.id
+    return get_store().add(COLLECTION_SAVED_RESPONSES, response_data)
 
+@_timed
 def get_saved_responses(agent_id: str, tags: List[str] = None) -> List[Dict]:
     """
     Get saved responses for an agent, optionally filtered by tags.
     """
-    query = db.collection(COLLECTION_SAVED_RESPONSES).where("agent_id", "==", agent_id)
-    if tags:
-        query = query.where("tags", "array-contains-any", tags)
-    docs = query.stream()
-    return [d.to_dict() for d in docs]
+    return get_store().find(COLLECTION_SAVED_RESPONSES, "agent_id", agent_id, tags=tags)
 
 # ===== MULTI-BOT LINKING FUNCTIONS =====
 
+# Links are few and read far more often than written: the whole collection
+# is held as an adjacency graph, loaded once and then kept current by the
+# store's change feed (or reloaded every CHAIN_GRAPH_TTL seconds without one)
+
+CHAIN_GRAPH_TTL = float(os.getenv("CHAIN_GRAPH_TTL", "300"))
+
+_links = LinkGraph()
+_links_lock = threading.Lock()
+_links_loaded_at = None
+_links_watch = None
+
+
+def _links_fresh() -> bool:
+    if _links_loaded_at is None:
+        return False
+    if _links_watch is not None and getattr(_links_watch, "is_active", False):
+        return True
+    return time.monotonic() - _links_loaded_at < CHAIN_GRAPH_TTL
+
+
+def _link_graph() -> LinkGraph:
+    global _links_loaded_at, _links_watch
+    if _links_fresh():
+        return _links
+    with _links_lock:
+        if _links_fresh():
+            return _links
+        store = get_store()
+        _links.replace(store.list_records(COLLECTION_AGENT_CHAINS))
+        _links_loaded_at = time.monotonic()
+        if AGENT_CACHE_WATCH:
+            if _links_watch is not None:
+                try:
+                    _links_watch.unsubscribe()
+                except Exception:
+                    pass
+            try:
+                _links_watch = store.watch_records(COLLECTION_AGENT_CHAINS, _links.apply)
+            except Exception as e:
+                _links_watch = None
+                print("Chain link listener unavailable:", e)
+    return _links
+
+@_timed
 def create_agent_chain(primary_agent_id: str, secondary_agent_id: str):
     """
     Create a link between two agents for chaining responses.
+    Idempotent: linking the same pair again returns the existing link id.
     """
+    links = _link_graph()
+    existing = links.get(primary_agent_id, secondary_agent_id)
+    if existing is not None:
+        return existing["id"]
+
+    chain_id = link_id(primary_agent_id, secondary_agent_id)
     chain_data = {
         "primary_agent_id": primary_agent_id,
         "secondary_agent_id": secondary_agent_id,
         "created_at": datetime.now().isoformat(),
     }
-    doc_ref = db.collection(COLLECTION_AGENT_CHAINS).document()
-    doc_ref.set(chain_data)
-    return doc_ref.id
+    get_store().add(COLLECTION_AGENT_CHAINS, chain_data, chain_id)
+    links.apply([(chain_id, chain_data)])
+    return chain_id
 
+@_timed
 def get_agent_chains(agent_id: str) -> List[Dict]:
     """
     Get all agents linked to this agent (primary or secondary).
     """
     try:
-        primary_docs = list(db.collection(COLLECTION_AGENT_CHAINS).where("primary_agent_id", "==", agent_id).stream())
-        secondary_docs = list(db.collection(COLLECTION_AGENT_CHAINS).where("secondary_agent_id", "==", agent_id).stream())
-        all_chains = [d.to_dict() for d in primary_docs + secondary_docs]
-        return all_chains
+        return _link_graph().links_for(agent_id)
     except Exception as e:
         return []
 
-def save_chain_conversation(primary_agent_id: str, secondary_agent_id: str, user_message: str, primary_response: str, secondary_response: str):
+@_timed
+def get_chain_neighbors(agent_id: str, hops: int = 1, direction: str = "both") -> Dict[str, int]:
     """
-    Save a multi-agent conversation chain.
+    Agents reachable from agent_id within `hops` chain links -> distance.
+    """
+    return _link_graph().neighbors(agent_id, hops, direction)
+
+def chain_graph_stats() -> Dict:
+    return {
+        **_link_graph().stats(),
+        "listener_active": _links_watch is not None and getattr(_links_watch, "is_active", False),
+        "ttl_seconds": CHAIN_GRAPH_TTL,
+    }
+
+@_timed
+def save_chain_conversation(primary_agent_id: str, secondary_agent_id: str, user_message: str, primary_response: str, secondary_response: str, conversation_id: Optional[str] = None):
+    """
+    Save a multi-agent conversation chain. Pass a conversation_id from
+    chain_conversation_id() when the write may be retried.
     """
     chain_data = {
         "primary_agent_id": primary_agent_id,
@@ -185,10 +415,32 @@ def save_chain_conversation(primary_agent_id: str, secondary_agent_id: str, user
         "secondary_response": secondary_response,
         "created_at": datetime.now().isoformat(),
     }
-    db.collection("chain_conversations").document().set(chain_data)
+    get_store().add(COLLECTION_CHAIN_CONVERSATIONS, chain_data, conversation_id or chain_conversation_id())
+
+def chain_conversation_id() -> str:
+    """
+    Document id for a chain conversation, chosen before the write is queued
+    so a retried write replaces its earlier attempt instead of duplicating it.
+    """
+    return uuid.uuid4().hex
+
+@_timed
+def save_chain_graph_conversation(user_message: str, nodes: Dict[str, Dict], reply: str, conversation_id: Optional[str] = None):
+    """
+    Save a multi-agent DAG run: per node its agent, status and answer.
+    """
+    chain_data = {
+        "agent_ids": list(dict.fromkeys(node["agent_id"] for node in nodes.values())),
+        "user_message": user_message,
+        "nodes": nodes,
+        "reply": reply,
+        "created_at": datetime.now().isoformat(),
+    }
+    get_store().add(COLLECTION_CHAIN_CONVERSATIONS, chain_data, conversation_id or chain_conversation_id())
 
 # ===== AGENT MEMORY FUNCTIONS =====
 
+@_timed
 def get_agent_memory(agent_id: str) -> List[str]:
     """
     Retrieve long-term memory entries for an agent.
@@ -200,21 +452,46 @@ def get_agent_memory(agent_id: str) -> List[str]:
     return agent.get("memory", [])
 
 
+@_timed
 def add_agent_memory(agent_id: str, memory_item: str):
     """
     Append a new memory entry to an agent.
     """
-    ref = db.collection(COLLECTION_AGENTS).document(agent_id)
-    snap = ref.get()
+    return add_agent_memories(agent_id, [memory_item])
 
-    if not snap.exists:
+
+@_timed
+def add_agent_memories(agent_id: str, memory_items: List[str]):
+    """
+    Append several memory entries to an agent in one atomic write.
+    """
+    agent = get_agent_by_id(agent_id)
+    if not agent:
         return False
 
-    data = snap.to_dict()
-    memory = data.get("memory", [])
+    known = set(agent.get("memory", []))
+    new_items = [m for m in dict.fromkeys(memory_items) if m not in known]
+    if not new_items:
+        return True
 
-    if memory_item not in memory:
-        memory.append(memory_item)
-        ref.update({"memory": memory})
+    # The store appends atomically, so concurrent requests never
+    # overwrite each other's entries
+    if not get_store().append_agent_memory(agent_id, new_items):
+        return False
 
+    _append_cached_memory(agent_id, new_items)
     return True
+
+
+def _append_cached_memory(agent_id: str, memory_items: List[str]):
+    with _agent_cache_lock:
+        entry = _agent_cache.get(agent_id)
+        if entry is None:
+            return
+        data, cached_at = entry
+        memory = data.get("memory", [])
+        # Copy-on-write: readers may still hold the previous list
+        memory = memory + [m for m in memory_items if m not in memory]
+        _agent_cache[agent_id] = ({**data, "memory": memory}, cached_at)
+
+    memory_index.extend(agent_id, memory)
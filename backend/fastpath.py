@@ -0,0 +1,106 @@
+# backend/fastpath.py
+"""
+Zero-LLM tier for trivial messages ("hi", "thanks", "bye").
+
+Phrases and per-language reply templates live in confidence_rules.json under
+"fast_path" and follow the matcher's hot reload. A message qualifies only if,
+once lowercased and stripped of surrounding punctuation, it is exactly one of
+the configured phrases; the phrase also tells us the language, so no
+detection, memory lookup or LLM call is needed.
+"""
+import threading
+from collections import Counter, namedtuple
+from typing import Dict, Optional
+
+import matcher
+
+FastMatch = namedtuple("FastMatch", ["intent", "language"])
+
+_PUNCTUATION = " \t\r\n!?.,;:¡¿~…'\"()"
+
+
+def normalize(text: str) -> str:
+    return " ".join((text or "").lower().strip(_PUNCTUATION).split())
+
+
+class FastPath:
+    def __init__(self, config: Dict):
+        self.enabled = bool(config.get("enabled", False))
+        self.templates = {}
+        self.phrases = {}  # normalized phrase -> FastMatch
+        self.no_specialties = config.get("no_specialties", {})
+        self.max_length = 0
+
+        for intent, spec in config.get("intents", {}).items():
+            self.templates[intent] = spec.get("templates", {})
+            for language, phrases in spec.get("phrases", {}).items():
+                for phrase in phrases:
+                    key = normalize(phrase)
+                    if key:
+                        self.phrases.setdefault(key, FastMatch(intent, language))
+                        self.max_length = max(self.max_length, len(key))
+
+    def match(self, user_message: str) -> Optional[FastMatch]:
+        if not self.enabled or not user_message:
+            return None
+        # Cheap length bound before normalizing long messages
+        if len(user_message) > self.max_length * 2 + 16:
+            return None
+        found = self.phrases.get(normalize(user_message))
+        if found is None or found.language not in self.templates.get(found.intent, {}):
+            return None
+        return found
+
+    def render(self, found: FastMatch, agent: Dict) -> str:
+        specialties = [str(s) for s in (agent.get("specialties") or []) if s]
+        if specialties:
+            shown = ", ".join(specialties[:3])
+        else:
+            shown = self.no_specialties.get(found.language, "all kinds of questions")
+        template = self.templates[found.intent][found.language]
+        return template.format(
+            name=agent.get("name") or "your assistant",
+            specialties=shown,
+        )
+
+
+# Rebuilt whenever the matcher hands out a new rules snapshot
+_lock = threading.Lock()
+_compiled_for = None
+_fast_path: Optional[FastPath] = None
+_served = Counter()
+_stats = {"checked": 0, "served": 0}
+
+
+def current() -> FastPath:
+    global _compiled_for, _fast_path
+    ruleset = matcher.current()
+    if ruleset is not _compiled_for:
+        with _lock:
+            if ruleset is not _compiled_for:
+                _fast_path = FastPath(ruleset.rules.get("fast_path", {}))
+                _compiled_for = ruleset
+    return _fast_path
+
+
+def match(user_message: str) -> Optional[FastMatch]:
+    _stats["checked"] += 1
+    return current().match(user_message)
+
+
+def render(found: FastMatch, agent: Dict) -> str:
+    _stats["served"] += 1
+    _served[found.intent] += 1
+    return current().render(found, agent)
+
+
+def stats() -> Dict:
+    fast_path = current()
+    checked = _stats["checked"]
+    return {
+        **_stats,
+        "enabled": fast_path.enabled,
+        "served_by_intent": dict(_served),
+        "served_rate": round(_stats["served"] / checked, 4) if checked else 0.0,
+        "phrases": len(fast_path.phrases),
+    }
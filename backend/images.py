@@ -0,0 +1,113 @@
+# backend/images.py
+import os
+import io
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(8 * 1024 * 1024)))
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "256"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+# The vision model fits images into 2048x2048 and then scales the shortest
+# side down to 768px; anything larger is uploaded only to be thrown away.
+MODEL_MAX_SIDE = 2048
+MODEL_SHORT_SIDE = 768
+
+# Refuse decompression bombs well before they reach memory
+Image.MAX_IMAGE_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+
+
+class ImageError(ValueError):
+    pass
+
+
+class ImageTooLarge(ImageError):
+    pass
+
+
+def decode_base64_image(image_base64: str) -> bytes:
+    """
+    Accept a data URL ("data:image/png;base64,...") or bare base64.
+    """
+    payload = image_base64
+    if payload.startswith("data:"):
+        _, _, payload = payload.partition(",")
+    if len(payload) * 3 // 4 > IMAGE_MAX_BYTES:
+        raise ImageTooLarge(f"Image exceeds {IMAGE_MAX_BYTES} bytes")
+    try:
+        return base64.b64decode(payload, validate=False)
+    except ValueError:
+        raise ImageError("Invalid base64 image")
+
+
+def target_size(width: int, height: int):
+    scale = min(1.0, MODEL_MAX_SIDE / max(width, height))
+    scale = min(scale, MODEL_SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _preprocess(raw: bytes) -> str:
+    try:
+        img = Image.open(io.BytesIO(raw))
+        size = target_size(*img.size)
+        # thumbnail() lets the JPEG decoder skip detail we are about to discard
+        img.thumbnail(size, Image.LANCZOS)
+        img = ImageOps.exif_transpose(img)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ImageError(f"Unsupported image: {e}")
+
+    if img.mode not in ("RGB", "L"):
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        rgba = img.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        img = background
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    return "data:image/jpeg;base64," + base64.b64encode(out.getvalue()).decode("ascii")
+
+
+_cache = OrderedDict()  # sha256 of original bytes -> prepared data URL
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+def prepare_image(raw: bytes) -> str:
+    """
+    Downscale + re-encode an uploaded image for the vision model.
+    Returns a JPEG data URL; identical uploads are served from a
+    content-hash cache and skip decoding entirely.
+    """
+    if len(raw) > IMAGE_MAX_BYTES:
+        raise ImageTooLarge(f"Image exceeds {IMAGE_MAX_BYTES} bytes")
+    if not raw:
+        raise ImageError("Empty image")
+
+    digest = hashlib.sha256(raw).hexdigest()
+    with _lock:
+        data_url = _cache.get(digest)
+        if data_url is not None:
+            _cache.move_to_end(digest)
+            _stats["hits"] += 1
+            return data_url
+
+    data_url = _preprocess(raw)
+
+    with _lock:
+        _stats["misses"] += 1
+        _stats["bytes_in"] += len(raw)
+        _stats["bytes_out"] += len(data_url)
+        _cache[digest] = data_url
+        while len(_cache) > IMAGE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return data_url
+
+
+def stats() -> Dict:
+    with _lock:
+        return {**_stats, "entries": len(_cache), "max_bytes": IMAGE_MAX_BYTES}
@@ -0,0 +1,129 @@
+# backend/language.py
+import os
+import re
+import threading
+from functools import lru_cache
+
+from langdetect import DetectorFactory, detect, LangDetectException
+from langdetect.detector_factory import init_factory
+
+# langdetect is randomized unless seeded; a fixed seed makes the same text
+# always map to the same language
+DetectorFactory.seed = int(os.getenv("LANGDETECT_SEED", "0"))
+
+LANGUAGE_CACHE_SIZE = int(os.getenv("LANGUAGE_CACHE_SIZE", "4096"))
+
+LANGUAGE_NAMES = {
+    "en": "English",
+    "es": "Spanish",
+    "zh-cn": "Chinese",
+    "zh": "Chinese",
+    "fr": "French",
+    "de": "German",
+    "ja": "Japanese",
+    "ko": "Korean",
+    "it": "Italian",
+    "pt": "Portuguese",
+    "ru": "Russian",
+    "ar": "Arabic",
+    "hi": "Hindi",
+    "th": "Thai",
+    "vi": "Vietnamese",
+    "id": "Indonesian",
+    "ms": "Malay",
+    "tr": "Turkish",
+    "nl": "Dutch",
+    "sv": "Swedish",
+    "no": "Norwegian",
+    "da": "Danish",
+    "fi": "Finnish",
+    "pl": "Polish",
+    "uk": "Ukrainian",
+    "el": "Greek",
+    "he": "Hebrew",
+}
+
+# Short greeting heuristics (langdetect is unreliable for very short text)
+GREETING_LANGUAGES = {
+    "hello": "English",
+    "hi": "English",
+    "hey": "English",
+    "yo": "English",
+    "sup": "English",
+    "hola": "Spanish",
+    "bonjour": "French",
+    "salut": "French",
+    "ciao": "Italian",
+    "hallo": "German",
+    "guten tag": "German",
+    "ola": "Portuguese",
+    "oi": "Portuguese",
+    "hej": "Swedish",
+    "hei": "English",
+}
+
+# Unicode script ranges for CJK languages (more reliable for short text).
+# The first matching character decides, same as scanning left to right.
+_SCRIPT_RE = re.compile(
+    "(?P<Korean>[\uac00-\ud7af\u1100-\u11ff\u3130-\u318f])"  # Hangul
+    "|(?P<Japanese>[\u3040-\u309f\u30a0-\u30ff])"           # Hiragana / Katakana
+    "|(?P<Chinese>[\u4e00-\u9fff])"                           # CJK Unified Ideographs
+)
+
+
+def language_name(lang_code: str) -> str:
+    return LANGUAGE_NAMES.get(lang_code, lang_code or "English")
+
+
+_profiles_loaded = False
+_profiles_lock = threading.Lock()
+
+
+def warm_up():
+    """
+    Load langdetect's language profiles now instead of on the first chat.
+    """
+    global _profiles_loaded
+    # langdetect's own lazy init is not thread-safe; concurrent first calls
+    # could see a half-loaded profile set
+    with _profiles_lock:
+        if not _profiles_loaded:
+            init_factory()
+            _profiles_loaded = True
+
+
+def detect_language(text: str) -> str:
+    if not text:
+        return "English"
+    return _detect_normalized(" ".join(text.strip().split()))
+
+
+@lru_cache(maxsize=LANGUAGE_CACHE_SIZE)
+def _detect_normalized(cleaned: str) -> str:
+    if not cleaned:
+        return "English"
+    lowered = cleaned.lower()
+
+    if len(lowered) <= 20:
+        if lowered in GREETING_LANGUAGES:
+            return GREETING_LANGUAGES[lowered]
+
+        # If it's short ASCII-only text and not a known greeting, default to English
+        if lowered.isascii():
+            return "English"
+
+    m = _SCRIPT_RE.search(cleaned)
+    if m:
+        return m.lastgroup
+
+    if not _profiles_loaded:
+        warm_up()
+
+    try:
+        return language_name(detect(cleaned))
+    except LangDetectException:
+        return "English"
+
+
+def cache_stats() -> dict:
+    return _detect_normalized.cache_info()._asdict()
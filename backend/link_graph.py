@@ -0,0 +1,129 @@
+# backend/link_graph.py
+"""
+In-memory adjacency graph of agent chain links (primary -> secondary).
+
+Links are deduplicated by pair: legacy documents written before link ids
+became deterministic may hold the same pair several times, which collapses
+to one edge here. Lookups are dict reads; neighbors() walks several hops
+breadth-first.
+"""
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+Pair = Tuple[str, str]
+
+
+def link_id(primary_agent_id: str, secondary_agent_id: str) -> str:
+    """
+    Deterministic document id for a link, so linking twice is a no-op.
+    """
+    return f"{primary_agent_id}__{secondary_agent_id}"
+
+
+class LinkGraph:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs: Dict[str, Pair] = {}  # document id -> pair
+        self._pairs: Dict[Pair, Dict] = {}  # pair -> link, "id" is the first document seen
+        self._doc_ids: Dict[Pair, Set[str]] = {}  # pair -> documents holding it
+        self._out: Dict[str, Set[str]] = {}
+        self._in: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def replace(self, records: List[Tuple[str, Dict]]):
+        """
+        Rebuild from a full listing of the links collection.
+        """
+        fresh = LinkGraph()
+        fresh.apply([(doc_id, data) for doc_id, data in records])
+        with self._lock:
+            self._docs, self._pairs, self._doc_ids = fresh._docs, fresh._pairs, fresh._doc_ids
+            self._out, self._in = fresh._out, fresh._in
+
+    def apply(self, changes: List[Tuple[str, Optional[Dict]]]):
+        """
+        (document id, link data or None when removed), as a change feed delivers them.
+        """
+        with self._lock:
+            for doc_id, data in changes:
+                self._discard(doc_id)
+                if data is None:
+                    continue
+                primary, secondary = data.get("primary_agent_id"), data.get("secondary_agent_id")
+                if not primary or not secondary:
+                    continue
+                pair = (primary, secondary)
+                self._docs[doc_id] = pair
+                self._doc_ids.setdefault(pair, set()).add(doc_id)
+                if pair not in self._pairs:
+                    self._pairs[pair] = {
+                        "id": doc_id,
+                        "primary_agent_id": primary,
+                        "secondary_agent_id": secondary,
+                        "created_at": data.get("created_at"),
+                    }
+                    self._out.setdefault(primary, set()).add(secondary)
+                    self._in.setdefault(secondary, set()).add(primary)
+
+    def _discard(self, doc_id: str):
+        pair = self._docs.pop(doc_id, None)
+        if pair is None:
+            return
+        holders = self._doc_ids.get(pair, set())
+        holders.discard(doc_id)
+        if holders:
+            return
+        self._doc_ids.pop(pair, None)
+        self._pairs.pop(pair, None)
+        primary, secondary = pair
+        self._out.get(primary, set()).discard(secondary)
+        self._in.get(secondary, set()).discard(primary)
+
+    def get(self, primary_agent_id: str, secondary_agent_id: str) -> Optional[Dict]:
+        link = self._pairs.get((primary_agent_id, secondary_agent_id))
+        return dict(link) if link is not None else None
+
+    def links_for(self, agent_id: str) -> List[Dict]:
+        """
+        Links where the agent is primary, then those where it is secondary.
+        """
+        with self._lock:
+            out = [self._pairs[(agent_id, s)] for s in sorted(self._out.get(agent_id, ()))]
+            into = [self._pairs[(p, agent_id)] for p in sorted(self._in.get(agent_id, ()))]
+        return [dict(link) for link in out + into]
+
+    def neighbors(self, agent_id: str, hops: int = 1, direction: str = "both") -> Dict[str, int]:
+        """
+        Agents reachable within `hops` links -> distance. direction is
+        "out" (follow primary -> secondary), "in", or "both".
+        """
+        with self._lock:
+            seen = {agent_id: 0}
+            queue = deque([agent_id])
+            while queue:
+                current = queue.popleft()
+                distance = seen[current]
+                if distance >= hops:
+                    continue
+                nexts = set()
+                if direction in ("out", "both"):
+                    nexts |= self._out.get(current, set())
+                if direction in ("in", "both"):
+                    nexts |= self._in.get(current, set())
+                for neighbor in nexts:
+                    if neighbor not in seen:
+                        seen[neighbor] = distance + 1
+                        queue.append(neighbor)
+        del seen[agent_id]
+        return seen
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "links": len(self._pairs),
+                "documents": len(self._docs),
+                "agents": len({a for a, s in self._out.items() if s} | {a for a, s in self._in.items() if s}),
+            }
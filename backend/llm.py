@@ -0,0 +1,359 @@
+# backend/llm.py
+"""
+LLM backend interface used by every route.
+
+LLM_BACKEND=openai (default) talks to the OpenAI API.
+LLM_BACKEND=fake serves deterministic local replies with configurable latency,
+token streaming and error injection, for load tests and benchmarks without
+network access or API spend.
+"""
+import os
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional
+
+import prompts
+import metrics
+import upstream
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+# Deadline / retries / hedging / circuit breaker around every backend
+LLM_RESILIENCE = os.getenv("LLM_RESILIENCE", "1") != "0"
+
+
+class LLMError(Exception):
+    """
+    Upstream LLM failure. `retryable` marks transient errors (timeouts,
+    connection resets, rate limits, 5xx). `timed_out` marks errors caused by
+    the call's own deadline running out.
+    """
+    status_code = 500
+
+    def __init__(self, message: str, retryable: bool = False, timed_out: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+        self.timed_out = timed_out
+
+
+def error_headers(e: LLMError) -> Optional[Dict]:
+    """
+    Response headers for an LLMError surfaced as an HTTP error (Retry-After
+    while the circuit breaker is open).
+    """
+    retry_after = getattr(e, "retry_after", None)
+    if retry_after is None:
+        return None
+    return {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+
+class LLMResult:
+    def __init__(self, text: str, model: str, usage=None):
+        self.text = text
+        self.model = model
+        self.usage = usage
+
+
+def _record_usage(model: str, usage):
+    prompts.record_usage(usage)
+    metrics.observe_tokens(model, usage)
+
+
+class LLMBackend:
+    name = "base"
+
+    async def complete(
+        self,
+        messages: List[Dict],
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = 300,
+        temperature: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> LLMResult:
+        raise NotImplementedError
+
+    def stream(
+        self,
+        messages: List[Dict],
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = 300,
+        temperature: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Async iterator of reply text deltas.
+        """
+        raise NotImplementedError
+
+    async def prewarm(self):
+        """
+        Open upstream connections before the first request needs them.
+        """
+
+
+# ===== OPENAI =====
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def __init__(self):
+        self._client = None
+        self._http_client = None
+
+    @property
+    def client(self):
+        # One keep-alive pool for every upstream call in the process. Resolved
+        # per use: after upstream.aclose() (app shutdown) the next lifespan
+        # gets a fresh pool, and the OpenAI client is rebuilt around it
+        http_client = upstream.get_client()
+        if self._http_client is not http_client:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                timeout=DEFAULT_TIMEOUT,
+                # Retries are handled by resilience.ResilientBackend
+                max_retries=0,
+                http_client=http_client,
+            )
+            self._http_client = http_client
+        return self._client
+
+    async def prewarm(self):
+        # GET /models is cheap and authenticated, so it opens real
+        # connections (TLS included) without spending tokens
+        await upstream.prewarm(
+            f"{str(self.client.base_url).rstrip('/')}/models",
+            headers={"Authorization": f"Bearer {self.client.api_key}"},
+        )
+
+    def _params(self, model, max_tokens, temperature, timeout):
+        params = {"model": model, "max_tokens": max_tokens}
+        if temperature is not None:
+            params["temperature"] = temperature
+        if timeout is not None:
+            params["timeout"] = timeout
+        return params
+
+    async def complete(self, messages, model=DEFAULT_MODEL, max_tokens=300, temperature=None, timeout=None):
+        start = time.perf_counter()
+        try:
+            resp = await self.client.chat.completions.create(
+                messages=messages,
+                **self._params(model, max_tokens, temperature, timeout),
+            )
+        except Exception as e:
+            metrics.observe_llm(model, "complete", "error", time.perf_counter() - start)
+            raise _wrap_openai_error(e)
+
+        metrics.observe_llm(model, "complete", "ok", time.perf_counter() - start)
+        _record_usage(model, resp.usage)
+        return LLMResult(resp.choices[0].message.content or "", model, resp.usage)
+
+    async def stream(self, messages, model=DEFAULT_MODEL, max_tokens=300, temperature=None, timeout=None):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            stream = await self.client.chat.completions.create(
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **self._params(model, max_tokens, temperature, timeout),
+            )
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    _record_usage(model, chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+            outcome = "ok"
+        except LLMError:
+            raise
+        except Exception as e:
+            raise _wrap_openai_error(e)
+        finally:
+            metrics.observe_llm(model, "stream", outcome, time.perf_counter() - start)
+
+
+def _wrap_openai_error(e: Exception) -> LLMError:
+    import openai
+
+    retryable = isinstance(e, (
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+    ))
+    err = LLMError(f"OpenAI error: {e}", retryable=retryable, timed_out=isinstance(e, openai.APITimeoutError))
+    err.__cause__ = e
+    return err
+
+
+# ===== FAKE (offline) =====
+
+_WORD_RE = re.compile(r"[a-zA-Z]{4,}")
+
+
+class FakeBackend(LLMBackend):
+    """
+    Offline stand-in for load testing.
+
+    Latency per call is drawn from FAKE_LLM_LATENCY_DIST:
+      fixed        -> always FAKE_LLM_LATENCY_MS
+      uniform      -> uniform in [0.5, 1.5] x FAKE_LLM_LATENCY_MS
+      lognormal    -> median FAKE_LLM_LATENCY_MS, shape FAKE_LLM_LATENCY_SIGMA (long tail)
+      exponential  -> mean FAKE_LLM_LATENCY_MS
+    Streaming waits the drawn latency before the first token, then
+    FAKE_LLM_TOKEN_MS between tokens. FAKE_LLM_ERROR_RATE of calls fail with a
+    retryable LLMError. Replies depend only on the request, so runs repeat.
+    """
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: Optional[float] = None,
+        dist: Optional[str] = None,
+        sigma: Optional[float] = None,
+        token_ms: Optional[float] = None,
+        error_rate: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv("FAKE_LLM_LATENCY_MS", "300"))
+        self.dist = dist or os.getenv("FAKE_LLM_LATENCY_DIST", "lognormal")
+        self.sigma = sigma if sigma is not None else float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+        self.token_ms = token_ms if token_ms is not None else float(os.getenv("FAKE_LLM_TOKEN_MS", "10"))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+        self.rng = random.Random(seed if seed is not None else int(os.getenv("FAKE_LLM_SEED", "0")))
+        if self.dist not in ("fixed", "uniform", "lognormal", "exponential"):
+            raise ValueError(f"Unknown FAKE_LLM_LATENCY_DIST: {self.dist}")
+
+    def _latency(self) -> float:
+        base = self.latency_ms / 1000.0
+        if self.dist == "fixed":
+            return base
+        if self.dist == "uniform":
+            return self.rng.uniform(0.5 * base, 1.5 * base)
+        if self.dist == "exponential":
+            return self.rng.expovariate(1.0 / base) if base > 0 else 0.0
+        return base * math.exp(self.rng.gauss(0.0, self.sigma))
+
+    def _maybe_fail(self):
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise LLMError("Fake LLM injected failure", retryable=True)
+
+    def _reply(self, messages: List[Dict], max_tokens: int) -> str:
+        system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+        user = messages[-1]["content"] if messages else ""
+        if isinstance(user, list):
+            user = " ".join(p.get("text", "") for p in user if p.get("type") == "text")
+
+        words = list(dict.fromkeys(w.lower() for w in _WORD_RE.findall(user)))
+        if "valid JSON" in system:
+            # Tag extraction: prefer words the system prompt lists as known tags
+            known = [w for w in words if f"'{w}'" in system]
+            return json.dumps({"tags": (known or words)[:2]})
+
+        digest = hashlib.sha256(json.dumps(messages, default=str).encode("utf-8")).hexdigest()
+        topic = " ".join(words[:3]) or "that"
+        text = (
+            f"Happy to help with {topic}. "
+            f"Here is a short, practical answer (ref {digest[:8]}): "
+            "start small, be consistent, and review your progress every week.\n"
+            "Would you like me to go into more detail?"
+        )
+        return " ".join(text.split(" ")[:max_tokens])
+
+    def _usage(self, messages, text):
+        prompt_tokens = sum(
+            prompts.count_tokens(m["content"]) if isinstance(m["content"], str) else 85
+            for m in messages
+        )
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=prompts.count_tokens(text),
+            prompt_tokens_details=SimpleNamespace(cached_tokens=0),
+        )
+
+    async def complete(self, messages, model=DEFAULT_MODEL, max_tokens=300, temperature=None, timeout=None):
+        start = time.perf_counter()
+        delay = self._latency()
+        try:
+            if timeout is not None and delay > timeout:
+                await asyncio.sleep(timeout)
+                raise LLMError("Fake LLM timed out", retryable=True, timed_out=True)
+            await asyncio.sleep(delay)
+            self._maybe_fail()
+        except LLMError:
+            metrics.observe_llm(model, "complete", "error", time.perf_counter() - start)
+            raise
+        metrics.observe_llm(model, "complete", "ok", time.perf_counter() - start)
+
+        text = self._reply(messages, max_tokens)
+        usage = self._usage(messages, text)
+        _record_usage(model, usage)
+        return LLMResult(text, model, usage)
+
+    async def stream(self, messages, model=DEFAULT_MODEL, max_tokens=300, temperature=None, timeout=None):
+        start = time.perf_counter()
+        outcome = "error"
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        async def sleep(seconds):
+            # Like the real client, give up once the call's timeout is spent
+            if deadline is not None and time.monotonic() + seconds > deadline:
+                await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+                raise LLMError("Fake LLM timed out", retryable=True, timed_out=True)
+            await asyncio.sleep(seconds)
+
+        try:
+            await sleep(self._latency())
+            self._maybe_fail()
+
+            text = self._reply(messages, max_tokens)
+            for i, word in enumerate(text.split(" ")):
+                if i:
+                    await sleep(self.token_ms / 1000.0)
+                yield word if i == 0 else " " + word
+            outcome = "ok"
+        finally:
+            metrics.observe_llm(model, "stream", outcome, time.perf_counter() - start)
+        _record_usage(model, self._usage(messages, text))
+
+
+# ===== SELECTION =====
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "fake": FakeBackend,
+}
+
+_backend: Optional[LLMBackend] = None
+
+
+def get_backend() -> LLMBackend:
+    global _backend
+    if _backend is None:
+        name = os.getenv("LLM_BACKEND", "openai").lower()
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown LLM_BACKEND: {name}")
+        backend = BACKENDS[name]()
+        if LLM_RESILIENCE:
+            from resilience import ResilientBackend
+            backend = ResilientBackend(backend)
+        _backend = backend
+    return _backend
+
+
+def set_backend(backend: Optional[LLMBackend]):
+    """
+    Swap the process-wide backend (benchmarks, local experiments).
+    """
+    global _backend
+    _backend = backend
@@ -2,7 +2,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from routes.agent import router as agent_router
@@ -12,11 +13,45 @@ from routes.feedback import router as feedback_router
 from routes.kb import router as kb_router
 from routes.responses import router as responses_router
 from routes.chains import router as chains_router
+import language
+import metrics
+import background
+import profiling
+import llm
+import upstream
 
 cred_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 
 app = FastAPI(title="AI Agent Engine - Lightweight")
 
+
+@app.on_event("startup")
+def warm_up():
+    # Load langdetect profiles before the first chat pays for it
+    language.warm_up()
+    # A previous lifespan in this process may have drained the queue
+    background.queue.open()
+
+
+@app.on_event("startup")
+async def prewarm_upstream():
+    # Open LLM connections now so the first chats skip the TCP / TLS handshake
+    await llm.get_backend().prewarm()
+
+
+@app.on_event("shutdown")
+async def drain_background():
+    # Let queued memory / chain / feedback writes finish before exiting
+    await background.queue.drain()
+
+
+@app.on_event("shutdown")
+async def close_upstream():
+    await upstream.aclose()
+
+
+app.add_middleware(profiling.ServerTimingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -32,3 +67,19 @@ app.include_router(feedback_router, prefix="/feedback")
 app.include_router(kb_router, prefix="/kb")
 app.include_router(responses_router, prefix="/responses")
 app.include_router(chains_router, prefix="/chains")
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/profiles/{name}", include_in_schema=False)
+def get_profile(name: str, request: Request):
+    if not profiling.authorized(request.headers.get(profiling.TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path)
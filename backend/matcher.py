@@ -0,0 +1,202 @@
+# backend/matcher.py
+"""
+Compiled multi-pattern matcher for the rule tables in confidence_rules.json
+(greetings, vague keywords, refusal phrases, memory rules).
+
+All literal patterns are merged into one trie and rendered as a single regex,
+so a message or reply is classified in one pass whose cost depends on the
+text length and the longest pattern, not on how many rules exist. The rules
+file is re-read when its mtime changes.
+
+Pattern modes:
+  exact     -> the whole (lowercased, trimmed) text equals the pattern
+  word      -> the pattern is not glued to letters/digits on either side
+  substring -> the pattern appears anywhere
+"""
+import os
+import re
+import json
+import time
+import threading
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_PATH = os.getenv("CONFIDENCE_RULES_PATH", os.path.join(BASE_DIR, "confidence_rules.json"))
+RULES_RELOAD_INTERVAL = float(os.getenv("RULES_RELOAD_INTERVAL", "2"))
+
+_END = ""  # trie key marking "a pattern ends here"
+
+MessageTraits = namedtuple("MessageTraits", ["is_greeting", "is_vague", "memories"])
+
+
+class PatternSet:
+    """
+    Literal patterns -> labels, matched in one regex pass over the text.
+    """
+
+    def __init__(self, patterns):
+        # patterns: iterable of (text, mode, label)
+        self._rules: Dict[str, List] = {}
+        for text, mode, label in patterns:
+            text = text.lower().strip()
+            if text:
+                self._rules.setdefault(text, []).append((mode, label))
+
+        # A match at some position is the longest pattern starting there;
+        # every shorter pattern that is a prefix of it matched there too
+        self._prefixes = {
+            p: [q for q in self._rules if p.startswith(q)] for p in self._rules
+        }
+        self._regex = _compile_trie(self._rules) if self._rules else None
+
+    def __len__(self):
+        return len(self._rules)
+
+    def scan(self, text: str) -> set:
+        """
+        Labels of all patterns found in text.
+        """
+        labels = set()
+        if self._regex is None or not text:
+            return labels
+        text = text.lower().strip()
+        n = len(text)
+        search = self._regex.search
+        m = search(text)
+        while m is not None:
+            start = m.start()
+            for pattern in self._prefixes[m.group(0)]:
+                end = start + len(pattern)
+                for mode, label in self._rules[pattern]:
+                    if label in labels:
+                        continue
+                    if mode == "exact" and not (start == 0 and end == n):
+                        continue
+                    if mode == "word" and (
+                        (start > 0 and text[start - 1].isalnum())
+                        or (end < n and text[end].isalnum())
+                    ):
+                        continue
+                    labels.add(label)
+            # Resume right after this start, not after the match, so
+            # overlapping patterns are still found
+            m = search(text, start + 1)
+        return labels
+
+
+def _compile_trie(patterns) -> "re.Pattern":
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for ch in pattern:
+            node = node.setdefault(ch, {})
+        node[_END] = True
+    return re.compile(_render(trie), re.DOTALL)
+
+
+def _render(node: Dict) -> str:
+    alts = [re.escape(ch) + _render(child) for ch, child in sorted(node.items()) if ch != _END]
+    if not alts:
+        return ""
+    body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+    if _END in node:
+        # Greedy optional: prefer the longest pattern, fall back to this one
+        body = "(?:" + body + ")?"
+    return body
+
+
+class RuleSet:
+    """
+    One compiled snapshot of confidence_rules.json.
+    """
+
+    def __init__(self, rules: Dict):
+        self.rules = rules
+        self.min_length = rules.get("min_length", 20)
+        self.clear_length = rules.get("clear_length", 50)
+        self.memory_facts = [r["memory"] for r in rules.get("memory_rules", [])]
+
+        patterns = []
+        patterns += [(g, "exact", "greeting") for g in rules.get("greetings", [])]
+        patterns += [(k, "word", "vague") for k in rules.get("vague_keywords", [])]
+        patterns += [(p, "substring", "refusal") for p in rules.get("refusal_patterns", [])]
+        for i, rule in enumerate(rules.get("memory_rules", [])):
+            patterns += [(p, rule.get("mode", "substring"), ("memory", i)) for p in rule["patterns"]]
+        self.patterns = PatternSet(patterns)
+
+    def classify_message(self, user_message: str) -> MessageTraits:
+        labels = self.patterns.scan(user_message)
+        length = len((user_message or "").strip())
+
+        # Short, or leaning on filler words ("help me", "idk"), unless the
+        # message is long enough to be clear anyway
+        is_vague = (length < self.min_length or "vague" in labels) and length <= self.clear_length
+        memories = [
+            fact for i, fact in enumerate(self.memory_facts) if ("memory", i) in labels
+        ]
+        return MessageTraits("greeting" in labels, is_vague, list(dict.fromkeys(memories)))
+
+    def is_refusal(self, reply: str) -> bool:
+        return "refusal" in self.patterns.scan(reply)
+
+
+# ===== HOT RELOAD =====
+
+_lock = threading.Lock()
+_ruleset: Optional[RuleSet] = None
+_mtime = None
+_checked_at = 0.0
+_stats = {"reloads": 0, "reload_errors": 0}
+
+
+def _load() -> RuleSet:
+    global _ruleset
+    with open(RULES_PATH, "r", encoding="utf-8") as f:
+        ruleset = RuleSet(json.load(f))
+    _ruleset = ruleset
+    _stats["reloads"] += 1
+    return ruleset
+
+
+def current() -> RuleSet:
+    """
+    Compiled rules, rebuilt if confidence_rules.json changed since the last
+    check (checked at most every RULES_RELOAD_INTERVAL seconds).
+    """
+    global _checked_at, _mtime
+    ruleset = _ruleset
+    now = time.monotonic()
+    if ruleset is not None and now - _checked_at < RULES_RELOAD_INTERVAL:
+        return ruleset
+
+    with _lock:
+        if _ruleset is None:
+            _mtime = os.stat(RULES_PATH).st_mtime_ns
+            _checked_at = now
+            return _load()
+        if now - _checked_at < RULES_RELOAD_INTERVAL:
+            return _ruleset
+        _checked_at = now
+        try:
+            mtime = os.stat(RULES_PATH).st_mtime_ns
+            if mtime != _mtime:
+                # Remember the attempt either way: a broken file is retried
+                # only once it changes again
+                _mtime = mtime
+                _load()
+        except Exception as e:
+            # Keep serving the last good rules while the file is being edited
+            _stats["reload_errors"] += 1
+            print("Rules reload failed:", e)
+        return _ruleset
+
+
+def stats() -> Dict:
+    ruleset = current()
+    return {
+        **_stats,
+        "patterns": len(ruleset.patterns),
+        "memory_rules": len(ruleset.memory_facts),
+        "path": RULES_PATH,
+    }
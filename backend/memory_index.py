@@ -0,0 +1,161 @@
+# backend/memory_index.py
+import os
+import re
+import math
+import heapq
+import threading
+from collections import Counter
+from typing import List, Dict, Optional
+
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "5"))
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can could did do does doing down during
+each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just let me more most my myself
+no nor not now of off on once only or other our ours ourselves out over own
+please same she should so some such than that the their theirs them themselves
+then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your yours
+yourself yourselves user
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        t for t in _TOKEN_RE.findall((text or "").lower())
+        if t not in STOP_WORDS
+    ]
+
+
+class MemoryIndex:
+    """
+    Inverted index over one agent's memory entries with BM25 ranking.
+    Memory is append-only, so new entries are indexed incrementally.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()  # held while syncing or searching
+        self.clear()
+
+    def clear(self):
+        self.entries = []     # doc id -> memory string
+        self.doc_lens = []    # doc id -> token count
+        self.postings = {}    # term -> {doc id: term frequency}
+        self.total_len = 0
+        self.source = None    # memory list last synced against
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, memory_item: str):
+        doc_id = len(self.entries)
+        tokens = tokenize(memory_item)
+        self.entries.append(memory_item)
+        self.doc_lens.append(len(tokens))
+        self.total_len += len(tokens)
+
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def search(self, query: str, k: int = MEMORY_TOP_K) -> List[str]:
+        terms = set(tokenize(query))
+        if not terms or not self.entries:
+            return []
+
+        n = len(self.entries)
+        avg_len = (self.total_len / n) or 1.0
+        scores = {}
+
+        matched = [self.postings[t] for t in terms if t in self.postings]
+        # Terms present in most memories barely move the ranking but cost a full
+        # postings walk; treat them as stop words when a rarer term is present
+        rare = [docs for docs in matched if len(docs) <= n // 2]
+        if rare:
+            matched = rare
+
+        # Only documents that share a term with the query are touched
+        for docs in matched:
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = K1 * (1 - B + B * self.doc_lens[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+
+        # Ties keep insertion order (older memories first)
+        best = heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.entries[doc_id] for doc_id, _ in best]
+
+
+_indexes: Dict[str, MemoryIndex] = {}
+# Guards _indexes only; each index has its own lock, so agents are
+# synced and searched in parallel
+_lock = threading.Lock()
+
+
+def _index_for(agent_id: str, create: bool = True) -> Optional[MemoryIndex]:
+    with _lock:
+        index = _indexes.get(agent_id)
+        if index is None and create:
+            index = _indexes[agent_id] = MemoryIndex()
+        return index
+
+
+def _sync(index: MemoryIndex, memory: List[str]):
+    # Caller holds index.lock
+    if not _consistent(index, memory):
+        index.clear()
+    for item in memory[len(index):]:
+        index.add(item)
+    index.source = memory
+
+
+def sync(agent_id: str, memory: List[str]) -> MemoryIndex:
+    """
+    Return the agent's index, brought up to date with its stored memory.
+    Appended entries are indexed incrementally; any other change rebuilds.
+    """
+    index = _index_for(agent_id)
+    with index.lock:
+        _sync(index, memory)
+    return index
+
+
+def extend(agent_id: str, memory: List[str]):
+    """
+    Index entries appended to an agent's memory, if the agent is indexed.
+    """
+    index = _index_for(agent_id, create=False)
+    if index is None:
+        return
+    with index.lock:
+        _sync(index, memory)
+
+
+def drop(agent_id: str):
+    with _lock:
+        _indexes.pop(agent_id, None)
+
+
+def search(agent_id: str, memory: List[str], query: str, k: int = MEMORY_TOP_K) -> List[str]:
+    index = _index_for(agent_id)
+    with index.lock:
+        _sync(index, memory)
+        return index.search(query, k)
+
+
+def _consistent(index: MemoryIndex, memory: List[str]) -> bool:
+    # db hands out copy-on-write memory lists, so the list the index was last
+    # synced against is unchanged; anything else must extend the indexed
+    # entries exactly, or deleted / edited memories would keep being served
+    if memory is index.source:
+        return True
+    if len(index) > len(memory):
+        return False
+    return memory[:len(index)] == index.entries
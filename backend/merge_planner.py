@@ -0,0 +1,94 @@
+# backend/merge_planner.py
+"""
+Decides locally whether a chain's merge LLM call is worth making.
+
+The merge is skipped, and the useful answer returned as is, when:
+- refused   -> every answer but one is a refusal (matcher refusal patterns)
+- duplicate -> the answers say the same thing: word 3-gram containment of
+               the shorter one in the longer one is >= MERGE_SKIP_SIMILARITY;
+               the longer answer is kept
+
+If every answer is a refusal the merge still runs, since the merge prompt
+turns that into a helpful "chain with a relevant agent" reply.
+"""
+import os
+import re
+from collections import Counter, namedtuple
+from typing import Dict, List
+
+import matcher
+
+MERGE_PLANNER = os.getenv("MERGE_PLANNER", "1") == "1"
+MERGE_SKIP_SIMILARITY = float(os.getenv("MERGE_SKIP_SIMILARITY", "0.8"))
+
+# skip: no merge call needed, reply with responses[index]
+# inputs: otherwise, indexes of the responses worth merging
+MergePlan = namedtuple("MergePlan", ["skip", "index", "inputs", "reason"])
+
+_WORD = re.compile(r"\w+")
+_SHINGLE = 3
+
+_stats = {"planned": 0, "merged": 0, "skipped": 0}
+_skipped = Counter()
+
+
+def _shingles(text: str) -> set:
+    words = _WORD.findall((text or "").lower())
+    if len(words) < _SHINGLE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + _SHINGLE]) for i in range(len(words) - _SHINGLE + 1)}
+
+
+def similarity(a: str, b: str) -> float:
+    """
+    Share of the smaller answer's word 3-grams that also appear in the other.
+    """
+    sa, sb = _shingles(a), _shingles(b)
+    if not sa or not sb:
+        return 0.0
+    return len(sa & sb) / min(len(sa), len(sb))
+
+
+def plan(responses: List[str]) -> MergePlan:
+    _stats["planned"] += 1
+    everything = list(range(len(responses)))
+    if not MERGE_PLANNER:
+        return _merge(everything, "disabled")
+
+    rules = matcher.current()
+    useful = [i for i, r in enumerate(responses) if r and r.strip() and not rules.is_refusal(r)]
+    if not useful:
+        return _merge(everything, "all_refused")
+    if len(useful) == 1 and len(responses) > 1:
+        return _skip(useful[0], "refused")
+
+    # Longest first, so a near-duplicate keeps the fuller answer
+    distinct: List[int] = []
+    for i in sorted(useful, key=lambda i: len(responses[i]), reverse=True):
+        if all(similarity(responses[i], responses[j]) < MERGE_SKIP_SIMILARITY for j in distinct):
+            distinct.append(i)
+    if len(distinct) == 1 and len(responses) > 1:
+        return _skip(distinct[0], "duplicate")
+    return _merge(sorted(distinct), "distinct")
+
+
+def _skip(index: int, reason: str) -> MergePlan:
+    _stats["skipped"] += 1
+    _skipped[reason] += 1
+    return MergePlan(True, index, [index], reason)
+
+
+def _merge(inputs: List[int], reason: str) -> MergePlan:
+    _stats["merged"] += 1
+    return MergePlan(False, None, inputs, reason)
+
+
+def stats() -> Dict:
+    planned = _stats["planned"]
+    return {
+        **_stats,
+        "enabled": MERGE_PLANNER,
+        "skipped_by_reason": dict(_skipped),
+        "skip_rate": round(_stats["skipped"] / planned, 4) if planned else 0.0,
+        "similarity_threshold": MERGE_SKIP_SIMILARITY,
+    }
@@ -0,0 +1,268 @@
+# backend/metrics.py
+"""
+Prometheus metrics, served at GET /metrics.
+
+- http_request_duration_seconds{method, route, status}: every request, by route template
+- request_stage_duration_seconds{route, stage}: where /chat and /chains time goes
+- db_operation_duration_seconds{op, backend, outcome}: every public db.py call
+- llm_request_duration_seconds{model, kind, outcome}: each upstream attempt
+- llm_tokens_total{model, type}: prompt / completion / cached prompt tokens
+- background_job_duration_seconds{job, outcome}: queued persistence, per attempt
+- background_queue_depth: jobs waiting for a background worker
+- llm_http_in_flight / llm_http_pool_max_connections: shared upstream client load vs its limit
+- llm_http_pool_waits_total: upstream requests queued behind a full connection pool
+
+Stage timings are also summed per request while collect_timings() is active
+(see profiling.ServerTimingMiddleware, which turns them into Server-Timing).
+
+Label children are cached, so recording a sample costs a dict lookup plus
+the histogram update (a few microseconds).
+"""
+import time
+import functools
+import contextvars
+from typing import Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Fine resolution at the low end for cache hits / local stores,
+# long tail for LLM calls
+_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response body is fully sent",
+    ["method", "route", "status"],
+    buckets=_BUCKETS,
+)
+STAGE_DURATION = Histogram(
+    "request_stage_duration_seconds",
+    "Time spent in one stage of a request pipeline",
+    ["route", "stage"],
+    buckets=_BUCKETS,
+)
+DB_DURATION = Histogram(
+    "db_operation_duration_seconds",
+    "db.py call latency",
+    ["op", "backend", "outcome"],
+    buckets=_BUCKETS,
+)
+LLM_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "Upstream LLM call latency (one attempt; streams until the last token)",
+    ["model", "kind", "outcome"],
+    buckets=_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the LLM provider",
+    ["model", "type"],
+)
+BACKGROUND_DURATION = Histogram(
+    "background_job_duration_seconds",
+    "Background job attempt latency (outcome ok, retried or failed)",
+    ["job", "outcome"],
+    buckets=_BUCKETS,
+)
+BACKGROUND_DEPTH = Gauge(
+    "background_queue_depth",
+    "Jobs waiting in the background work queue",
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "llm_http_in_flight",
+    "Requests open on the shared upstream LLM HTTP client",
+)
+UPSTREAM_POOL_SIZE = Gauge(
+    "llm_http_pool_max_connections",
+    "Connection limit of the shared upstream LLM HTTP client",
+)
+UPSTREAM_POOL_WAITS = Counter(
+    "llm_http_pool_waits_total",
+    "Upstream LLM requests that found every pooled connection busy",
+)
+
+_children = {}
+
+# Stage name -> seconds for the request being handled, if someone asked
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def _child(metric, *labels):
+    key = (metric, labels)
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(*labels)
+    return child
+
+
+def observe_stage(route: str, stage: str, seconds: float):
+    _child(STAGE_DURATION, route, stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def collect_timings() -> Dict[str, float]:
+    """
+    Start summing stage timings for the current request. The returned dict
+    is filled in by every stage recorded from this context onwards,
+    including work handed to asyncio.to_thread (which copies the context).
+    """
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+class stage:
+    """
+    Time a block as one pipeline stage:
+
+        with metrics.stage("chat", "llm"):
+            reply = await ...
+    """
+    __slots__ = ("route", "name", "start", "seconds")
+
+    def __init__(self, route: str, name: str):
+        self.route = route
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        observe_stage(self.route, self.name, self.seconds)
+        return False
+
+
+def timed(route: str, name: str, fn):
+    """
+    Wrap a sync function (e.g. one handed to asyncio.to_thread) as a stage.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with stage(route, name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def timed_db(backend_name):
+    """
+    Decorator for db.py functions; `backend_name()` returns the storage label.
+    """
+    def decorate(fn):
+        op = fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = fn(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                _child(DB_DURATION, op, backend_name(), outcome).observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def observe_llm(model: str, kind: str, outcome: str, seconds: float):
+    _child(LLM_DURATION, model, kind, outcome).observe(seconds)
+
+
+def observe_background_job(job: str, outcome: str, seconds: float):
+    _child(BACKGROUND_DURATION, job, outcome).observe(seconds)
+
+
+def observe_background_depth(depth: int):
+    BACKGROUND_DEPTH.set(depth)
+
+
+def observe_upstream_in_flight(count: int):
+    UPSTREAM_IN_FLIGHT.set(count)
+
+
+def observe_upstream_pool_size(size: int):
+    UPSTREAM_POOL_SIZE.set(size)
+
+
+def observe_upstream_pool_wait():
+    UPSTREAM_POOL_WAITS.inc()
+
+
+def observe_tokens(model: str, usage):
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    for token_type, value in (
+        ("prompt", getattr(usage, "prompt_tokens", 0)),
+        ("completion", getattr(usage, "completion_tokens", 0)),
+        ("cached", getattr(details, "cached_tokens", 0)),
+    ):
+        if value:
+            _child(LLM_TOKENS, model, token_type).inc(value)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording status and latency per route template
+    (/agents/{agent_id}, not /agents/123, to keep label cardinality bounded).
+    Streaming responses are timed until their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _child(HTTP_DURATION, scope["method"], route_template(scope), str(status[0])).observe(
+                time.perf_counter() - start
+            )
+
+
+def route_template(scope) -> str:
+    """
+    Full route template for a handled request, e.g. /chat/query or
+    /agents/{agent_id}. Depending on the FastAPI version, scope["route"].path
+    may or may not include the include_router prefix; when it does not, the
+    prefix is whatever part of the request path the route did not match.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    regex = getattr(route, "path_regex", None)
+    if not template or regex is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    i = 0
+    while i != -1:
+        if regex.match(path[i:]):
+            return path[:i] + template
+        i = path.find("/", i + 1)
+    return template
+
+
+def render():
+    """
+    (body, content_type) in the Prometheus text exposition format.
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
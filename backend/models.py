@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 from enum import Enum
 
@@ -29,6 +29,7 @@ class FeedbackRequest(BaseModel):
     agent_id: str
     feedback_type: FeedbackType
     user_comment: Optional[str] = ""
+    response_id: Optional[str] = None  # "response_id" returned by /chat/query
 
 # === KNOWLEDGE BASE ===
 class DocumentMetadata(BaseModel):
@@ -66,4 +67,15 @@ class AgentChainRequest(BaseModel):
     primary_agent_id: str
     secondary_agent_id: str
     user_message: str
-    pass_context: bool = True
\ No newline at end of file
+    pass_context: bool = True
+class ChainNode(BaseModel):
+    id: str
+    agent_id: str
+    depends_on: List[str] = []  # nodes whose answers this one refines
+    timeout: Optional[float] = Field(None, ge=1.0, le=300.0)  # seconds; default CHAIN_NODE_TIMEOUT
+
+class ChainGraphRequest(BaseModel):
+    user_message: str
+    nodes: List[ChainNode]
+    synthesizer_agent_id: Optional[str] = None  # default: generic merge prompt
+    timeout: Optional[float] = Field(None, ge=1.0, le=300.0)  # whole chain, seconds; default CHAIN_TIMEOUT
@@ -0,0 +1,152 @@
+# backend/profiling.py
+"""
+Per-request debugging: Server-Timing headers and an on-demand profiler.
+
+Every response carries a Server-Timing header with the pipeline stages
+recorded through metrics.stage / metrics.timed while the request was being
+handled (db, memory, lang, prompt, cache, llm, persist, ...) plus "app", the
+time until the response headers were sent. Stages that finish after the
+headers (the LLM part of /chat/stream, background memory writes) are only in
+/metrics.
+
+With PROFILE_TOKEN set, a request sending that token in the X-Profile-Token
+header or as ?profile=<token> is run under pyinstrument (imported on first
+use). The profile is written to PROFILE_DIR in speedscope format (open it at
+https://www.speedscope.app) or as HTML with PROFILE_FORMAT=html; its file
+name comes back in the X-Profile header and can be downloaded from
+GET /profiles/{name} with the same X-Profile-Token header. One request is
+profiled at a time; requests without the token never touch the profiler.
+"""
+import os
+import re
+import hmac
+import uuid
+import time
+import asyncio
+from typing import Optional
+from urllib.parse import parse_qs
+
+import metrics
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "speedscope").lower()
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+
+TOKEN_HEADER = "x-profile-token"
+_TOKEN_HEADER = TOKEN_HEADER.encode()
+
+_EXTENSIONS = {"speedscope": ".speedscope.json", "html": ".html"}
+
+_profiling = False
+
+
+def authorized(token: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(
+        token.encode(), PROFILE_TOKEN.encode()
+    )
+
+
+def _requested(scope) -> bool:
+    if not PROFILE_TOKEN:
+        return False
+    for name, value in scope["headers"]:
+        if name == _TOKEN_HEADER:
+            return authorized(value.decode("latin-1"))
+    query = scope.get("query_string", b"")
+    if b"profile=" in query:
+        return authorized(parse_qs(query.decode("latin-1")).get("profile", [None])[0])
+    return False
+
+
+def profile_path(name: str) -> Optional[str]:
+    """
+    Path of a stored profile, or None (also for names reaching outside PROFILE_DIR).
+    """
+    if name != os.path.basename(name) or not name.endswith(tuple(_EXTENSIONS.values())):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def _server_timing(timings, app_seconds: float) -> bytes:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    parts.append(f"app;dur={app_seconds * 1000:.1f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+def _start_profiler():
+    from pyinstrument import Profiler
+
+    # async_mode="enabled" attributes awaited time to this request's task only
+    profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+    profiler.start()
+    return profiler
+
+
+def _write_profile(profiler, name: str):
+    if PROFILE_FORMAT == "html":
+        output = profiler.output_html()
+    else:
+        from pyinstrument.renderers import SpeedscopeRenderer
+        output = profiler.output(renderer=SpeedscopeRenderer())
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, name), "w", encoding="utf-8") as f:
+        f.write(output)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _profiling
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        timings = metrics.collect_timings()
+        extra_headers = []
+        profiler = None
+        profile_name = None
+
+        if _requested(scope):
+            if _profiling:
+                extra_headers.append((b"x-profile", b"busy"))
+            else:
+                try:
+                    profiler = _start_profiler()
+                except ImportError:
+                    extra_headers.append((b"x-profile", b"unavailable"))
+                else:
+                    _profiling = True
+                    route = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+                    profile_name = "%s-%s-%s-%s%s" % (
+                        time.strftime("%Y%m%d-%H%M%S"),
+                        uuid.uuid4().hex[:6],
+                        scope["method"].lower(),
+                        route[:64],
+                        _EXTENSIONS.get(PROFILE_FORMAT, _EXTENSIONS["speedscope"]),
+                    )
+                    extra_headers.append((b"x-profile", profile_name.encode("latin-1")))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(timings, time.perf_counter() - start)))
+                headers.extend(extra_headers)
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler is not None:
+                try:
+                    profiler.stop()
+                    # Rendering walks the whole call tree; keep it off the loop
+                    await asyncio.to_thread(_write_profile, profiler, profile_name)
+                except Exception as e:
+                    print("Profile write failed:", e)
+                finally:
+                    _profiling = False
@@ -0,0 +1,258 @@
+# backend/prompts.py
+"""
+System prompt compiler.
+
+The static part of each agent's prompt (persona, specialties, rules) is rendered
+once per agent version and memoized. Per-request values (memory, language) are
+appended at the end, so the long prefix is byte-identical across calls and the
+provider's prompt-prefix cache can reuse it.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from response_cache import agent_fingerprint
+
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "1024"))
+
+
+# ===== TEMPLATES =====
+
+def _render_chat(agent: Dict) -> str:
+    specialties = ", ".join(agent.get("specialties", []))
+    persona = agent.get("persona", "")
+    summary = agent.get("summary", "")
+    name = agent.get("name", "AI Assistant")
+
+    return f"""
+    You are an AI assistant named {name}.
+
+    LANGUAGE RULE (VERY IMPORTANT):
+    - Always respond in the SAME language as the user's question
+    - If the user switches languages, switch with them
+    - Do NOT mention language detection
+    - Respond ONLY in the language named at the end of these instructions
+
+    Persona:
+    {persona}
+
+    Summary:
+    {summary}
+
+    Specialties:
+    {specialties}
+
+    STRICT DOMAIN RULES (VERY IMPORTANT):
+    - You MUST ONLY answer questions directly related to your specialties.
+    - If a question is NOT related to your specialties:
+    - You MUST politely refuse.
+    - You MUST NOT answer the question.
+    - You MUST NOT give tips, examples, or partial help.
+    - You MUST suggest what you CAN help with instead.
+    - Do NOT guess.
+    - Do NOT stretch your expertise.
+    - Do NOT answer "just to be helpful".
+
+    Response style rules:
+    - Sound like a friendly human, not a robot.
+    - Keep responses short and conversational.
+    - Do NOT use bullet points unless explicitly asked.
+    - Use at most ONE emoji if it feels natural.
+    - Always end with exactly ONE gentle follow-up question.
+    - The follow-up question must be on its own line.
+
+    If the user uploads an image:
+    - Describe what you see first.
+    - ONLY continue if the image is related to your specialties.
+    """
+
+
+def _render_agent(agent: Dict) -> str:
+    specialties = ", ".join(agent.get("specialties", [])) or "general knowledge"
+    guidelines = agent.get("guidelines", "")
+
+    return f"""
+You are {agent.get('name')}.
+
+LANGUAGE RULE:
+- Respond in the SAME language as the user's question
+- Do NOT translate unless the user asks
+
+
+Role:
+{agent.get('role')}
+
+Specialties:
+{specialties}
+
+Guidelines:
+{guidelines}
+
+IMPORTANT RULES (STRICT MODE):
+- You MUST ONLY answer questions directly related to your specialties
+- If the question is outside your specialties:
+  - You MUST refuse
+  - You MUST NOT give partial answers
+  - You MUST NOT give related tips
+- Do NOT speculate
+- Do NOT be helpful outside your domain
+"""
+
+
+def _render_chain(agent: Dict) -> str:
+    specialties = ", ".join(agent.get("specialties", [])) or "general knowledge"
+
+    return f"""
+You are {agent.get('name')} in a multi-agent collaboration.
+
+Your specialties:
+{specialties}
+
+LANGUAGE RULE (VERY IMPORTANT):
+- Respond in the SAME language as the user's question
+- If the user switches languages, switch with them
+- Do NOT mention language detection
+
+CHAIN MODE RULES:
+- Answer ONLY the parts of the question related to your specialties
+- IGNORE parts outside your specialties (do NOT refuse)
+- Do NOT mention limitations or scope
+- Do NOT ask follow-up questions
+- Provide ONLY information within your domain
+- It is OK to give a PARTIAL answer
+"""
+
+
+TEMPLATES = {
+    "chat": _render_chat,
+    "agent": _render_agent,
+    "chain": _render_chain,
+}
+
+MERGE_SYSTEM_PROMPT = """
+You merge multiple responses into one coherent answer.
+
+You are a final response synthesizer.
+
+You are given two agent responses. Each agent strictly follows its own specialty
+and may refuse if the question is outside its scope.
+
+Your task:
+- Produce ONE final answer for the user
+- If one agent refused but the other gave useful info, use the useful info
+- If both agents refused, politely explain the limitation and suggest chaining with a relevant agent
+- Do NOT mention agents, roles, or refusals explicitly
+- Do NOT say "outside my scope"
+- Sound like a single helpful assistant
+- Respond ONLY in the language named at the end of the user's message
+"""
+
+
+# ===== TOKEN COUNTING =====
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Exact count with tiktoken when installed, else a ~4 chars/token estimate.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+# ===== COMPILER =====
+
+_compiled = OrderedDict()  # (kind, agent_id, version) -> (static_text, static_tokens)
+_lock = threading.Lock()
+_stats = {
+    "compile_hits": 0,
+    "compile_misses": 0,
+    "requests": 0,
+    "static_tokens": 0,
+    "dynamic_tokens": 0,
+    "usage_prompt_tokens": 0,
+    "usage_cached_tokens": 0,
+    "usage_completion_tokens": 0,
+}
+
+
+def compile_static(kind: str, agent: Dict):
+    """
+    Static prompt prefix for an agent, rendered once per agent version.
+    Returns (text, token_count).
+    """
+    key = (kind, agent.get("id", ""), agent_fingerprint(agent))
+    with _lock:
+        entry = _compiled.get(key)
+        if entry is not None:
+            _compiled.move_to_end(key)
+            _stats["compile_hits"] += 1
+            return entry
+
+    text = TEMPLATES[kind](agent)
+    entry = (text, count_tokens(text))
+
+    with _lock:
+        _stats["compile_misses"] += 1
+        _compiled[key] = entry
+        while len(_compiled) > PROMPT_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return entry
+
+
+def build(kind: str, agent: Dict, tail: str = "") -> str:
+    """
+    Full system prompt: memoized static prefix + per-request tail.
+    """
+    static_text, static_tokens = compile_static(kind, agent)
+    dynamic_tokens = count_tokens(tail) if tail else 0
+    with _lock:
+        _stats["requests"] += 1
+        _stats["static_tokens"] += static_tokens
+        _stats["dynamic_tokens"] += dynamic_tokens
+    return static_text + tail
+
+
+def chat_tail(relevant_memory: Optional[List[str]], user_language: str) -> str:
+    memory_block = ""
+    if relevant_memory:
+        memory_block = "\n    Relevant memory:\n" + "\n".join(
+            f"    - {m}" for m in relevant_memory
+        ) + "\n"
+
+    return f"""{memory_block}
+    Respond ONLY in this language: {user_language}
+    """
+
+
+def record_usage(usage):
+    """
+    Accumulate token usage reported by the provider (including cached prefix tokens).
+    """
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) or 0
+    with _lock:
+        _stats["usage_prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        _stats["usage_cached_tokens"] += cached
+        _stats["usage_completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+
+def stats() -> Dict:
+    with _lock:
+        out = dict(_stats)
+        out["compiled_prompts"] = len(_compiled)
+        out["tokenizer"] = "tiktoken" if _encoding is not None else "estimate"
+        total = out["static_tokens"] + out["dynamic_tokens"]
+        out["static_share"] = round(out["static_tokens"] / total, 4) if total else 0.0
+        prompt = out["usage_prompt_tokens"]
+        out["usage_cached_share"] = round(out["usage_cached_tokens"] / prompt, 4) if prompt else 0.0
+        return out
@@ -0,0 +1,302 @@
+# backend/resilience.py
+"""
+Resilience layer wrapped around the LLM backend (see llm.get_backend).
+
+- Deadline: `timeout` is the budget for the whole logical call, retries and
+  hedges included; each attempt only gets what is left of it.
+- Retries: retryable LLMErrors are retried with full-jitter exponential backoff.
+- Hedging (LLM_HEDGE=1): if an attempt has not finished after the recent p95
+  latency for that model, a second identical request is sent and whichever
+  returns first wins. Costs extra tokens on roughly 1 call in 20.
+- Circuit breaker: after LLM_BREAKER_FAILURES consecutive upstream failures,
+  calls fail fast with CircuitOpenError (HTTP 503) for LLM_BREAKER_COOLDOWN
+  seconds, then a single probe decides whether to close it again. A timeout
+  only counts as a failure when the call had at least the default budget
+  (LLM_TIMEOUT), so callers with short deadlines cannot trip it.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from llm import LLMBackend, LLMError, DEFAULT_MODEL, DEFAULT_TIMEOUT
+
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BASE_MS = float(os.getenv("LLM_RETRY_BASE_MS", "200"))
+LLM_RETRY_MAX_MS = float(os.getenv("LLM_RETRY_MAX_MS", "2000"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_MS = float(os.getenv("LLM_HEDGE_MIN_MS", "100"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "256"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+
+class CircuitOpenError(LLMError):
+    status_code = 503
+
+    def __init__(self, retry_after: float):
+        super().__init__("LLM upstream unavailable (circuit open)", retryable=False)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `threshold` consecutive failures; open -> half_open
+    after `cooldown` seconds; half_open lets one probe through, which either
+    closes the breaker or opens it again.
+    """
+
+    def __init__(self, threshold: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Admit a call or raise CircuitOpenError. Returns True if this call
+        is the half-open probe; pass that on to record_*() / release().
+        """
+        with self._lock:
+            if self.state == "closed":
+                return False
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            raise CircuitOpenError(max(0.0, self.cooldown - (now - self.opened_at)))
+
+    def record_success(self, probe: bool = False):
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+            if probe:
+                self._probe_in_flight = False
+
+    def record_failure(self, probe: bool = False):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            if probe:
+                self._probe_in_flight = False
+
+    def release(self, probe: bool = False):
+        # Attempt ended without telling us anything about upstream health;
+        # only the probe itself may hand the probe slot back
+        if probe:
+            with self._lock:
+                self._probe_in_flight = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class ResilientBackend(LLMBackend):
+    def __init__(self, inner: LLMBackend, hedge: bool = LLM_HEDGE, retries: int = LLM_RETRIES):
+        self.inner = inner
+        self.name = inner.name
+        self.hedge = hedge
+        self.retries = retries
+        self.breaker = CircuitBreaker()
+        self._latencies: Dict[str, deque] = {}
+        self._rng = random.Random()
+        self._stats = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+        }
+
+    # ----- helpers -----
+
+    def _record_latency(self, model: str, seconds: float):
+        window = self._latencies.get(model)
+        if window is None:
+            window = self._latencies[model] = deque(maxlen=LLM_LATENCY_WINDOW)
+        window.append(seconds)
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """
+        Recent p95 latency for the model, or None until enough samples exist.
+        """
+        window = self._latencies.get(model)
+        if not window or len(window) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(window)
+        index = min(len(ordered) - 1, int(len(ordered) * LLM_HEDGE_PERCENTILE / 100.0))
+        return max(LLM_HEDGE_MIN_MS / 1000.0, ordered[index])
+
+    def _record_timeout(self, budget: float, probe: bool):
+        # Only a call that was given at least the default budget says the
+        # upstream is slow; a caller's short deadline (e.g. a /chains/graph
+        # node) must not be able to open the breaker for everyone else
+        if budget >= DEFAULT_TIMEOUT:
+            self.breaker.record_failure(probe)
+        else:
+            self.breaker.release(probe)
+
+    def _backoff(self, attempt: int) -> float:
+        cap = min(LLM_RETRY_MAX_MS, LLM_RETRY_BASE_MS * (2 ** attempt)) / 1000.0
+        return self._rng.uniform(0, cap)
+
+    async def _attempt(self, messages, model, max_tokens, temperature, deadline, budget):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMError("LLM call deadline exceeded", retryable=False)
+        probe = self.breaker.before_call()
+        self._stats["attempts"] += 1
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(
+                self.inner.complete(messages, model, max_tokens, temperature, timeout=remaining),
+                timeout=remaining,
+            )
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            self._record_timeout(budget, probe)
+            raise LLMError(f"LLM call timed out after {remaining:.1f}s", retryable=True, timed_out=True)
+        except LLMError as e:
+            if e.timed_out:
+                self._stats["timeouts"] += 1
+                self._record_timeout(budget, probe)
+            elif e.retryable:
+                self.breaker.record_failure(probe)
+            else:
+                # A bad request says nothing about upstream health
+                self.breaker.release(probe)
+            raise
+        except BaseException:
+            # Cancelled (e.g. the losing side of a hedge)
+            self.breaker.release(probe)
+            raise
+        self.breaker.record_success(probe)
+        self._record_latency(model, time.monotonic() - start)
+        return result
+
+    async def _hedged(self, make_attempt, delay: float):
+        first = asyncio.ensure_future(make_attempt())
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self._stats["hedged"] += 1
+                tasks.append(asyncio.ensure_future(make_attempt()))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self._stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    # ----- LLMBackend -----
+
+    async def complete(self, messages, model=DEFAULT_MODEL, max_tokens=300, temperature=None, timeout=None):
+        self._stats["calls"] += 1
+        budget = timeout if timeout is not None else DEFAULT_TIMEOUT
+        deadline = time.monotonic() + budget
+        attempt = 0
+
+        make_attempt = lambda: self._attempt(messages, model, max_tokens, temperature, deadline, budget)
+        while True:
+            try:
+                delay = self.hedge_delay(model) if self.hedge else None
+                if delay is not None and time.monotonic() + delay < deadline:
+                    return await self._hedged(make_attempt, delay)
+                return await make_attempt()
+            except LLMError as e:
+                if not e.retryable or attempt >= self.retries:
+                    self._stats["failures"] += 1
+                    raise
+                backoff = self._backoff(attempt)
+                if time.monotonic() + backoff >= deadline:
+                    self._stats["failures"] += 1
+                    raise
+                attempt += 1
+                self._stats["retries"] += 1
+                await asyncio.sleep(backoff)
+
+    async def stream(self, messages, model=DEFAULT_MODEL, max_tokens=300, temperature=None, timeout=None):
+        # Retried only until the first token; after that the client has
+        # already seen output and the error is passed through
+        self._stats["calls"] += 1
+        budget = timeout if timeout is not None else DEFAULT_TIMEOUT
+        deadline = time.monotonic() + budget
+        attempt = 0
+
+        while True:
+            probe = self.breaker.before_call()
+            self._stats["attempts"] += 1
+            started = False
+            try:
+                async for delta in self.inner.stream(
+                    messages, model, max_tokens, temperature, timeout=deadline - time.monotonic()
+                ):
+                    started = True
+                    yield delta
+                self.breaker.record_success(probe)
+                return
+            except LLMError as e:
+                if e.timed_out:
+                    self._record_timeout(budget, probe)
+                elif e.retryable:
+                    self.breaker.record_failure(probe)
+                else:
+                    self.breaker.release(probe)
+                backoff = self._backoff(attempt)
+                if started or not e.retryable or attempt >= self.retries or time.monotonic() + backoff >= deadline:
+                    self._stats["failures"] += 1
+                    raise
+                attempt += 1
+                self._stats["retries"] += 1
+                await asyncio.sleep(backoff)
+            except BaseException:
+                self.breaker.release(probe)
+                raise
+
+    async def prewarm(self):
+        await self.inner.prewarm()
+
+    def stats(self) -> Dict:
+        out = {**self._stats, "hedging": self.hedge, "breaker": self.breaker.stats()}
+        out["hedge_delay_ms"] = {}
+        for model in list(self._latencies):
+            delay = self.hedge_delay(model)
+            if delay is not None:
+                out["hedge_delay_ms"][model] = round(delay * 1000, 1)
+        return out
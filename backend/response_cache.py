@@ -0,0 +1,153 @@
+# backend/response_cache.py
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+
+
+def normalize_message(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def agent_fingerprint(agent: Dict) -> str:
+    """
+    Hash of the agent config that shapes replies (memory is keyed separately).
+    """
+    config = {k: v for k, v in agent.items() if k != "memory"}
+    raw = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(agent: Dict, user_message: str, user_language: str, relevant_memory: List[str]) -> str:
+    context = json.dumps(
+        [agent_fingerprint(agent), relevant_memory or []],
+        ensure_ascii=False,
+    )
+    raw = "\x1f".join([
+        agent.get("id", ""),
+        normalize_message(user_message),
+        user_language,
+        hashlib.sha256(context.encode("utf-8")).hexdigest(),
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of chat replies with a per-entry TTL.
+    Entries are tracked per agent so an agent edit can drop all of them.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (agent_id, reply, expires_at)
+        self._by_agent = {}            # agent_id -> set(keys)
+        self._versions = {}            # agent_id -> last seen fingerprint
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            agent_id, reply, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return reply
+
+    def set(self, key: str, agent_id: str, reply: str):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (agent_id, reply, time.monotonic() + self.ttl)
+            self._by_agent.setdefault(agent_id, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def evict(self, key: str, agent_id: Optional[str] = None) -> bool:
+        """
+        Drop one entry; with agent_id, only if it was cached for that agent.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (agent_id is not None and entry[0] != agent_id):
+                return False
+            self._drop(key)
+            self.invalidations += 1
+            return True
+
+    def invalidate_agent(self, agent_id: str) -> int:
+        with self._lock:
+            keys = self._by_agent.pop(agent_id, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def check_agent_version(self, agent: Dict):
+        """
+        Drop an agent's cached replies as soon as its config changes.
+        """
+        agent_id = agent.get("id", "")
+        version = agent_fingerprint(agent)
+        with self._lock:
+            previous = self._versions.get(agent_id)
+            self._versions[agent_id] = version
+        if previous is not None and previous != version:
+            self.invalidate_agent(agent_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_agent.clear()
+            self._versions.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, key: str):
+        # Caller holds the lock
+        agent_id, _, _ = self._entries.pop(key)
+        keys = self._by_agent.get(agent_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_agent[agent_id]
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL)
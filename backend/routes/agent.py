@@ -29,6 +29,14 @@ async def get_agents():
     return db.list_agents()
 
 
+@router.get("/cache/stats")
+async def get_agent_cache_stats():
+    """
+    Agent document cache counters (hits, misses, listener state).
+    """
+    return db.agent_cache_stats()
+
+
 @router.get("/{agent_id}")
 async def get_agent(agent_id: str):
     agent = db.get_agent_by_id(agent_id)
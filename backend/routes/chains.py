@@ -1,191 +1,163 @@
 from fastapi import APIRouter, HTTPException
-from models import AgentChainRequest, AgentLinkRequest
+from fastapi.responses import StreamingResponse
+from models import AgentChainRequest, AgentLinkRequest, ChainGraphRequest
 import db
-from openai import OpenAI
-import os
+import llm
+import json
+import time
+import asyncio
 from dotenv import load_dotenv
-from langdetect import detect, LangDetectException
+from language import detect_language
+import prompts
+import singleflight
+import metrics
+import background
+import chain_graph
+import merge_planner
+from typing import Optional
 
 load_dotenv()
 router = APIRouter()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-def _language_name(lang_code: str) -> str:
-    mapping = {
-        "en": "English",
-        "es": "Spanish",
-        "zh-cn": "Chinese",
-        "zh": "Chinese",
-        "fr": "French",
-        "de": "German",
-        "ja": "Japanese",
-        "ko": "Korean",
-        "it": "Italian",
-        "pt": "Portuguese",
-        "ru": "Russian",
-        "ar": "Arabic",
-        "hi": "Hindi",
-        "th": "Thai",
-        "vi": "Vietnamese",
-        "id": "Indonesian",
-        "ms": "Malay",
-        "tr": "Turkish",
-        "nl": "Dutch",
-        "sv": "Swedish",
-        "no": "Norwegian",
-        "da": "Danish",
-        "fi": "Finnish",
-        "pl": "Polish",
-        "uk": "Ukrainian",
-        "el": "Greek",
-        "he": "Hebrew",
-    }
-    return mapping.get(lang_code, lang_code or "English")
-
-
-def detect_language(text: str) -> str:
-    if not text:
-        return "English"
-    cleaned = " ".join(text.strip().split())
-    lowered = cleaned.lower()
-
-    # Short greeting heuristics (langdetect is unreliable for very short text)
-    greeting_map = {
-        "hello": "English",
-        "hi": "English",
-        "hey": "English",
-        "yo": "English",
-        "sup": "English",
-        "hola": "Spanish",
-        "bonjour": "French",
-        "salut": "French",
-        "ciao": "Italian",
-        "hallo": "German",
-        "guten tag": "German",
-        "ola": "Portuguese",
-        "oi": "Portuguese",
-        "hej": "Swedish",
-        "hei": "English",
-    }
-
-    if len(lowered) <= 20:
-        if lowered in greeting_map:
-            return greeting_map[lowered]
-
-        # If it's short ASCII-only text and not a known greeting, default to English
-        if all(ord(ch) < 128 for ch in lowered):
-            return "English"
-
-    # Unicode script heuristics for CJK languages (more reliable for short text)
-    for ch in text:
-        code = ord(ch)
-        # Hangul Syllables/Hangul Jamo -> Korean
-        if 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
-            return "Korean"
-        # Hiragana/Katakana -> Japanese
-        if 0x3040 <= code <= 0x309F or 0x30A0 <= code <= 0x30FF:
-            return "Japanese"
-        # CJK Unified Ideographs -> Chinese (default)
-        if 0x4E00 <= code <= 0x9FFF:
-            return "Chinese"
-    try:
-        code = detect(text)
-        return _language_name(code)
-    except LangDetectException:
-        return "English"
+chain_flight = singleflight.get("chains")
 
 def build_system_prompt(agent: dict) -> str:
-    specialties = ", ".join(agent.get("specialties", [])) or "general knowledge"
-    guidelines = agent.get("guidelines", "")
-
-    return f"""
-You are {agent.get('name')}.
-
-LANGUAGE RULE:
-- Respond in the SAME language as the user's question
-- Do NOT translate unless the user asks
-
-
-Role:
-{agent.get('role')}
-
-Specialties:
-{specialties}
+    return prompts.build("agent", agent)
 
-Guidelines:
-{guidelines}
+def build_chain_system_prompt(agent: dict) -> str:
+    return prompts.build("chain", agent)
 
-IMPORTANT RULES (STRICT MODE):
-- You MUST ONLY answer questions directly related to your specialties
-- If the question is outside your specialties:
-  - You MUST refuse
-  - You MUST NOT give partial answers
-  - You MUST NOT give related tips
-- Do NOT speculate
-- Do NOT be helpful outside your domain
-"""
 
-def build_chain_system_prompt(agent: dict) -> str:
-    specialties = ", ".join(agent.get("specialties", [])) or "general knowledge"
 
-    return f"""
-You are {agent.get('name')} in a multi-agent collaboration.
-
-Your specialties:
-{specialties}
-
-LANGUAGE RULE (VERY IMPORTANT):
-- Respond in the SAME language as the user's question
-- If the user switches languages, switch with them
-- Do NOT mention language detection
-
-CHAIN MODE RULES:
-- Answer ONLY the parts of the question related to your specialties
-- IGNORE parts outside your specialties (do NOT refuse)
-- Do NOT mention limitations or scope
-- Do NOT ask follow-up questions
-- Provide ONLY information within your domain
-- It is OK to give a PARTIAL answer
-"""
+async def complete(messages, max_tokens: int = 512, temperature: float = 0.7, timeout: Optional[float] = None) -> str:
+    """
+    One chat completion; identical concurrent calls share a single upstream request.
+    """
+    # The deadline is part of the key: a caller must not inherit a shorter one
+    key = singleflight.make_key("gpt-4o-mini", messages, max_tokens, temperature, timeout)
 
+    async def call():
+        result = await llm.get_backend().complete(
+            messages,
+            model="gpt-4o-mini",
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout,
+        )
+        return result.text
 
+    return await chain_flight.do(key, call)
 
-def query_agent_openai(agent: dict, user_message: str) -> str:
+async def query_agent_openai(agent: dict, user_message: str) -> str:
     messages = [
         {"role": "system", "content": build_system_prompt(agent)},
         {"role": "user", "content": user_message},
     ]
 
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            max_tokens=512,
-            temperature=0.7,
-        )
-        return resp.choices[0].message.content
+        return await complete(messages)
+    except llm.LLMError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=llm.error_headers(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OpenAI error: {str(e)}")
 
-def query_agent_openai_chain(agent: dict, user_message: str) -> str:
+async def query_agent_openai_chain(agent: dict, user_message: str) -> str:
     messages = [
         {"role": "system", "content": build_chain_system_prompt(agent)},
         {"role": "user", "content": user_message},
     ]
 
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            max_tokens=512,
-            temperature=0.7,
-        )
-        return resp.choices[0].message.content
+        return await complete(messages)
+    except llm.LLMError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=llm.error_headers(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OpenAI error: {str(e)}")
 
 
+def _primary_prompt(user_message: str, user_language: str) -> str:
+    return f"""
+        The user asked:
+
+        "{user_message}"
+
+        Your task:
+        - ONLY provide information related to your specialties
+        - Ignore parts of the question outside your domain
+        - Do NOT refuse just because other domains are involved
+        - Respond with information strictly within your expertise
+        - Respond ONLY in this language: {user_language}
+        """
+
+
+def _refine_prompt(upstream, agent_name: str, user_message: str, user_language: str) -> str:
+    # upstream: [(agent name, answer)] this agent builds on
+    if len(upstream) == 1:
+        name, answer = upstream[0]
+        context = f"""The primary agent ({name}) responded:
+
+"{answer}"
+"""
+        target = "this response"
+    else:
+        context = "The previous agents responded:\n\n" + "\n".join(
+            f"""{name}:
+"{answer}"
+""" for name, answer in upstream
+        )
+        target = "these responses"
+    return f"""
+{context}
+Now, as {agent_name}, please enhance, expand, or refine {target}. Add your perspective:
+Original user query: {user_message}
+
+IMPORTANT:
+- Respond ONLY in this language: {user_language}
+"""
+
+
+def _merge_prompt(responses, user_language: str) -> str:
+    blocks = "\n\n".join(
+        f"        Response {chr(ord('A') + i)}:\n        {response}" for i, response in enumerate(responses)
+    )
+    return f"""
+{blocks}
+
+        LANGUAGE RULE:
+        - The final response MUST be in this language: {user_language}
+        - If the user switches languages, switch with them
+        - Do NOT mention language detection
+        """
+
+
+async def _leg(timings: dict, name: str, awaitable):
+    """
+    Await one step of a chain, recording its wall time in `timings` (ms)
+    and as a chains stage metric.
+    """
+    stage = metrics.stage("chains", name)
+    try:
+        with stage:
+            return await awaitable
+    finally:
+        timings[name] = round(stage.seconds * 1000, 1)
+
+
+async def _gather_or_cancel(*awaitables):
+    """
+    asyncio.gather, but the other legs are cancelled as soon as one fails,
+    and have stopped (upstream calls included) by the time this raises.
+    """
+    tasks = [asyncio.ensure_future(a) for a in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
 def build_chain_confidence(user_message: str, primary_response: str, secondary_response: str) -> dict:
     score = 70
     reasons = ["Chained response from multiple agents"]
@@ -218,16 +190,12 @@ def build_chain_confidence(user_message: str, primary_response: str, secondary_r
 
 @router.post("/link")
 async def create_agent_link(req: AgentLinkRequest):
-    print("LINK REQUEST RECEIVED")
-    print("Primary:", req.primary_agent_id)
-    print("Secondary:", req.secondary_agent_id)
-
+    """
+    Link two agents for chaining; linking the same pair again is a no-op.
+    """
     primary = db.get_agent_by_id(req.primary_agent_id)
     secondary = db.get_agent_by_id(req.secondary_agent_id)
 
-    print("Primary exists:", bool(primary))
-    print("Secondary exists:", bool(secondary))
-
     if not primary or not secondary:
         raise HTTPException(status_code=404, detail="One or both agents not found")
 
@@ -238,24 +206,6 @@ async def create_agent_link(req: AgentLinkRequest):
         "chain_id": chain_id,
     }
 
-    primary_agent_id = req.primary_agent_id
-    secondary_agent_id = req.secondary_agent_id
-
-    primary = db.get_agent_by_id(primary_agent_id)
-    secondary = db.get_agent_by_id(secondary_agent_id)
-
-    if not primary or not secondary:
-        raise HTTPException(status_code=404, detail="One or both agents not found")
-
-    chain_id = db.create_agent_chain(primary_agent_id, secondary_agent_id)
-
-    return {
-        "status": "success",
-        "chain_id": chain_id,
-        "primary_agent": primary.get("name"),
-        "secondary_agent": secondary.get("name"),
-    }
-
 @router.post("/query")
 async def query_agent_chain(req: AgentChainRequest):
     """
@@ -264,100 +214,74 @@ async def query_agent_chain(req: AgentChainRequest):
     - Secondary agent refines/enhances primary response (if pass_context=True)
     """
     try:
-        # Get both agents
-        primary = db.get_agent_by_id(req.primary_agent_id)
-        secondary = db.get_agent_by_id(req.secondary_agent_id)
-        
+        timings = {}
+        started = time.perf_counter()
+
+        # Both agent lookups and language detection are independent
+        (primary, secondary), user_language = await asyncio.gather(
+            _leg(timings, "db", asyncio.gather(
+                asyncio.to_thread(db.get_agent_by_id, req.primary_agent_id),
+                asyncio.to_thread(db.get_agent_by_id, req.secondary_agent_id),
+            )),
+            _leg(timings, "lang", asyncio.to_thread(detect_language, req.user_message)),
+        )
+
         if not primary or not secondary:
             raise HTTPException(status_code=404, detail="One or both agents not found")
-        
-        # Detect user language for strict enforcement
-        user_language = detect_language(req.user_message)
 
         # Query primary agent
-        primary_prompt = f"""
-        The user asked:
-
-        "{req.user_message}"
+        primary_prompt = _primary_prompt(req.user_message, user_language)
 
-        Your task:
-        - ONLY provide information related to your specialties
-        - Ignore parts of the question outside your domain
-        - Do NOT refuse just because other domains are involved
-        - Respond with information strictly within your expertise
-        - Respond ONLY in this language: {user_language}
-        """
-
-
-        primary_response = query_agent_openai_chain(primary, primary_prompt)
-
-        
-        # Query secondary agent with context from primary
         if req.pass_context:
-            context_message = f"""
-The primary agent ({primary.get('name')}) responded:
-
-"{primary_response}"
-
-Now, as {secondary.get('name')}, please enhance, expand, or refine this response. Add your perspective:
-Original user query: {req.user_message}
-
-IMPORTANT:
-- Respond ONLY in this language: {user_language}
-"""
-            secondary_response = query_agent_openai_chain(secondary, context_message)
+            # Secondary agent refines the primary answer, so the legs run in order
+            primary_response = await _leg(
+                timings, "llm.primary", query_agent_openai_chain(primary, primary_prompt)
+            )
+            context_message = _refine_prompt(
+                [(primary.get('name'), primary_response)], secondary.get('name'), req.user_message, user_language
+            )
+            secondary_response = await _leg(
+                timings, "llm.secondary", query_agent_openai_chain(secondary, context_message)
+            )
         else:
-            secondary_response = query_agent_openai(secondary, req.user_message)
-            
-        
-        # Save chain conversation to database
-        db.save_chain_conversation(
+            # Independent legs: max(primary, secondary) instead of the sum
+            primary_response, secondary_response = await _gather_or_cancel(
+                _leg(timings, "llm.primary", query_agent_openai_chain(primary, primary_prompt)),
+                _leg(timings, "llm.secondary", query_agent_openai(secondary, req.user_message)),
+            )
+
+        # Save chain conversation off the reply path
+        await background.submit(
+            "chain_conversation",
+            metrics.timed("chains", "persist", db.save_chain_conversation),
             req.primary_agent_id,
             req.secondary_agent_id,
             req.user_message,
             primary_response,
-            secondary_response
+            secondary_response,
+            db.chain_conversation_id(),
         )
-        merge_prompt = f"""
-        You are a final response synthesizer.
-
-        You are given two agent responses. Each agent strictly follows its own specialty
-        and may refuse if the question is outside its scope.
-
-        LANGUAGE RULE:
-        - The final response MUST be in this language: {user_language}
-        - If the user switches languages, switch with them
-        - Do NOT mention language detection
-
-        Response A:
-        {primary_response}
-
-        Response B:
-        {secondary_response}
-
-        Your task:
-        - Produce ONE final answer for the user
-        - If one agent refused but the other gave useful info, use the useful info
-        - If both agents refused, politely explain the limitation and suggest chaining with a relevant agent
-        - Do NOT mention agents, roles, or refusals explicitly
-        - Do NOT say "outside my scope"
-        - Sound like a single helpful assistant
-        """
-        final_response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"You merge multiple responses into one coherent answer. Respond ONLY in this language: {user_language}."
-                },
-                {
-                    "role": "user",
-                    "content": merge_prompt
-                },
-            ],
-            max_tokens=512,
-            temperature=0.6,
-        ).choices[0].message.content
+        # One refused or both said the same thing: no merge round trip
+        responses = [primary_response, secondary_response]
+        plan = merge_planner.plan(responses)
+        if plan.skip:
+            final_response = responses[plan.index]
+        else:
+            merge_prompt = _merge_prompt(responses, user_language)
+            final_response = await _leg(timings, "llm.merge", complete(
+                [
+                    {
+                        "role": "system",
+                        "content": prompts.MERGE_SYSTEM_PROMPT
+                    },
+                    {
+                        "role": "user",
+                        "content": merge_prompt
+                    },
+                ],
+                temperature=0.6,
+            ))
+        timings["total"] = round((time.perf_counter() - started) * 1000, 1)
 
         confidence = build_chain_confidence(
             req.user_message,
@@ -367,24 +291,328 @@ IMPORTANT:
 
         return {
             "reply": final_response,
-            "confidence": confidence
+            "confidence": confidence,
+            "merge_skipped": plan.reason if plan.skip else None,
+            "timings_ms": timings,
         }
 
+    except HTTPException:
+        raise
+    except llm.LLMError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=llm.error_headers(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _agent_event(leg: str, agent: dict, status: str, **extra) -> str:
+    return _sse("agent", {"leg": leg, "agent_id": agent.get("id"), "name": agent.get("name"), "status": status, **extra})
+
+
+@router.post("/stream")
+async def stream_agent_chain(req: AgentChainRequest):
+    """
+    Same chain as /query, streamed as Server-Sent Events:
+    - "agent" events as each agent leg starts and finishes
+    - "token" events carry {"delta": ...} of the merged answer, which starts
+      as soon as both legs are done
+    - a final "done" event carries reply, confidence and timings_ms
+    An "error" event ends the stream if a leg or the merge fails, or with
+    status 504 once CHAIN_TIMEOUT has passed.
+    """
+    timings = {}
+    started = time.perf_counter()
+    # Bounds the whole stream, so a slow upstream cannot hold the connection open
+    deadline = time.monotonic() + chain_graph.CHAIN_TIMEOUT
+
+    (primary, secondary), user_language = await asyncio.gather(
+        _leg(timings, "db", asyncio.gather(
+            asyncio.to_thread(db.get_agent_by_id, req.primary_agent_id),
+            asyncio.to_thread(db.get_agent_by_id, req.secondary_agent_id),
+        )),
+        _leg(timings, "lang", asyncio.to_thread(detect_language, req.user_message)),
+    )
+    if not primary or not secondary:
+        raise HTTPException(status_code=404, detail="One or both agents not found")
+
+    primary_prompt = _primary_prompt(req.user_message, user_language)
+
+    async def events():
+        responses = {}
+        pending = set()
+        try:
+            if req.pass_context:
+                yield _agent_event("primary", primary, "started")
+                responses["primary"] = await asyncio.wait_for(_leg(
+                    timings, "llm.primary", query_agent_openai_chain(primary, primary_prompt)
+                ), deadline - time.monotonic())
+                yield _agent_event("primary", primary, "done", ms=timings["llm.primary"])
+
+                context_message = _refine_prompt(
+                    [(primary.get('name'), responses["primary"])], secondary.get('name'), req.user_message, user_language
+                )
+                yield _agent_event("secondary", secondary, "started")
+                responses["secondary"] = await asyncio.wait_for(_leg(
+                    timings, "llm.secondary", query_agent_openai_chain(secondary, context_message)
+                ), deadline - time.monotonic())
+                yield _agent_event("secondary", secondary, "done", ms=timings["llm.secondary"])
+            else:
+                legs = {
+                    asyncio.ensure_future(_leg(
+                        timings, "llm.primary", query_agent_openai_chain(primary, primary_prompt)
+                    )): ("primary", primary),
+                    asyncio.ensure_future(_leg(
+                        timings, "llm.secondary", query_agent_openai(secondary, req.user_message)
+                    )): ("secondary", secondary),
+                }
+                pending = set(legs)
+                yield _agent_event("primary", primary, "started")
+                yield _agent_event("secondary", secondary, "started")
+                # Report each leg the moment it finishes
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, timeout=deadline - time.monotonic(), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if not done:
+                        raise TimeoutError
+                    for task in done:
+                        leg, agent = legs[task]
+                        responses[leg] = task.result()
+                        yield _agent_event(leg, agent, "done", ms=timings[f"llm.{leg}"])
+        except HTTPException as e:
+            yield _sse("error", {"detail": e.detail, "status": e.status_code})
+            return
+        except TimeoutError:
+            yield _sse("error", {"detail": "Chain deadline exceeded waiting for agents", "status": 504})
+            return
+        finally:
+            # Like _gather_or_cancel: legs still running have stopped
+            # (upstream calls included) before the stream moves on
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        await background.submit(
+            "chain_conversation",
+            metrics.timed("chains", "persist", db.save_chain_conversation),
+            req.primary_agent_id,
+            req.secondary_agent_id,
+            req.user_message,
+            responses["primary"],
+            responses["secondary"],
+            db.chain_conversation_id(),
+        )
+
+        answers = [responses["primary"], responses["secondary"]]
+        plan = merge_planner.plan(answers)
+        parts = []
+        if plan.skip:
+            timings["first_token"] = round((time.perf_counter() - started) * 1000, 1)
+            parts.append(answers[plan.index])
+            yield _sse("token", {"delta": answers[plan.index]})
+        else:
+            messages = [
+                {"role": "system", "content": prompts.MERGE_SYSTEM_PROMPT},
+                {"role": "user", "content": _merge_prompt(answers, user_language)},
+            ]
+            stage = metrics.stage("chains", "llm.merge")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield _sse("error", {"detail": "Chain deadline exceeded before merge", "status": 504})
+                return
+            with stage:
+                try:
+                    async with asyncio.timeout(remaining):
+                        async for delta in llm.get_backend().stream(
+                            messages, model="gpt-4o-mini", max_tokens=512, temperature=0.6, timeout=remaining
+                        ):
+                            if not parts:
+                                timings["first_token"] = round((time.perf_counter() - started) * 1000, 1)
+                            parts.append(delta)
+                            yield _sse("token", {"delta": delta})
+                except TimeoutError:
+                    yield _sse("error", {"detail": "Chain deadline exceeded during merge", "status": 504})
+                    return
+                except llm.LLMError as e:
+                    yield _sse("error", {"detail": str(e), "status": e.status_code})
+                    return
+            timings["llm.merge"] = round(stage.seconds * 1000, 1)
+        timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+
+        yield _sse("done", {
+            "reply": "".join(parts),
+            "confidence": build_chain_confidence(req.user_message, responses["primary"], responses["secondary"]),
+            "merge_skipped": plan.reason if plan.skip else None,
+            "timings_ms": timings,
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/graph")
+async def query_agent_graph(req: ChainGraphRequest):
+    """
+    Query a DAG of agents.
+    - Nodes without depends_on answer the user; independent nodes run concurrently
+    - Nodes with depends_on refine the answers of their upstream nodes
+    - A synthesizer merges the answers no other node built on
+    Nodes that time out or fail are dropped; see "nodes" in the response.
+    """
+    started = time.perf_counter()
+    deadline = time.monotonic() + max(req.timeout or chain_graph.CHAIN_TIMEOUT, chain_graph.CHAIN_MIN_TIMEOUT)
+    try:
+        chain_graph.topological_order(req.nodes)
+    except chain_graph.ChainGraphError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    agent_ids = [node.agent_id for node in req.nodes]
+    if req.synthesizer_agent_id:
+        agent_ids.append(req.synthesizer_agent_id)
+    agent_ids = list(dict.fromkeys(agent_ids))
+
+    timings = {}
+    found, user_language = await asyncio.gather(
+        _leg(timings, "db", asyncio.gather(
+            *(asyncio.to_thread(db.get_agent_by_id, agent_id) for agent_id in agent_ids)
+        )),
+        _leg(timings, "lang", asyncio.to_thread(detect_language, req.user_message)),
+    )
+    agents = dict(zip(agent_ids, found))
+    missing = [agent_id for agent_id, agent in agents.items() if not agent]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Agents not found: {', '.join(missing)}")
+
+    nodes_by_id = {node.id: node for node in req.nodes}
+
+    async def run_node(node, upstream, timeout):
+        agent = agents[node.agent_id]
+        if upstream:
+            prompt = _refine_prompt(
+                [(agents[nodes_by_id[dep].agent_id].get("name"), answer) for dep, answer in upstream.items()],
+                agent.get("name"),
+                req.user_message,
+                user_language,
+            )
+        else:
+            prompt = _primary_prompt(req.user_message, user_language)
+        messages = [
+            {"role": "system", "content": build_chain_system_prompt(agent)},
+            {"role": "user", "content": prompt},
+        ]
+        return await complete(messages, timeout=timeout)
+
+    results = await _leg(timings, "nodes", chain_graph.run(req.nodes, run_node, deadline))
+
+    answers = [results[node_id]["text"] for node_id in chain_graph.frontier(req.nodes, results)]
+    if not answers:
+        timed_out = any(r["status"] == "timeout" for r in results.values())
+        raise HTTPException(
+            status_code=504 if timed_out else 502,
+            detail="No agent in the chain produced an answer",
+        )
+
+    # A requested synthesizer always gets to speak; otherwise drop refusals
+    # and near-duplicates locally and skip the merge if one answer is left
+    plan = None
+    if not req.synthesizer_agent_id and len(answers) > 1:
+        plan = merge_planner.plan(answers)
+        answers = [answers[i] for i in plan.inputs]
+
+    if len(answers) == 1 and not req.synthesizer_agent_id:
+        final_response = answers[0]
+    else:
+        system_prompt = prompts.MERGE_SYSTEM_PROMPT
+        if req.synthesizer_agent_id:
+            system_prompt = build_chain_system_prompt(agents[req.synthesizer_agent_id]) + "\n\n" + system_prompt
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise HTTPException(status_code=504, detail="Chain deadline exceeded before synthesis")
+        try:
+            final_response = await _leg(timings, "llm.merge", asyncio.wait_for(complete(
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": _merge_prompt(answers, user_language)},
+                ],
+                temperature=0.6,
+                timeout=remaining,
+            ), remaining))
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Chain deadline exceeded during synthesis")
+        except llm.LLMError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e), headers=llm.error_headers(e))
+
+    nodes = {
+        node.id: {
+            "agent_id": node.agent_id,
+            **{k: v for k, v in results[node.id].items() if k != "text"},
+        }
+        for node in req.nodes
+    }
+    path = chain_graph.critical_path(req.nodes, results)
+    timings["critical_path"] = round(sum(results[node_id]["ms"] for node_id in path), 1)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+
+    await background.submit(
+        "chain_conversation",
+        metrics.timed("chains", "persist", db.save_chain_graph_conversation),
+        req.user_message,
+        {
+            node.id: {**nodes[node.id], "response": results[node.id].get("text")}
+            for node in req.nodes
+        },
+        final_response,
+        db.chain_conversation_id(),
+    )
+
+    return {
+        "reply": final_response,
+        "merge_skipped": plan.reason if plan and plan.skip else None,
+        "nodes": nodes,
+        "critical_path": path,
+        "timings_ms": timings,
+    }
+
+
 @router.get("/chains/{agent_id}")
-async def get_agent_chains(agent_id: str):
+async def get_agent_chains(agent_id: str, hops: int = 1, direction: str = "both"):
     """
     Get all agents linked to this agent.
+    With hops > 1, "neighbors" also lists agents reachable through several
+    links (agent_id -> distance); direction is "out", "in" or "both".
     """
+    if direction not in ("out", "in", "both"):
+        raise HTTPException(status_code=400, detail="direction must be out, in or both")
     try:
         chains = db.get_agent_chains(agent_id)
         return {
             "agent_id": agent_id,
             "chain_count": len(chains),
             "chains": chains,
+            "neighbors": db.get_chain_neighbors(agent_id, max(1, min(hops, 10)), direction),
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/links/stats")
+async def get_link_stats():
+    """
+    In-memory chain link graph: links, agents and whether a change feed keeps it current.
+    """
+    return db.chain_graph_stats()
+
+
+@router.get("/merge/stats")
+async def get_merge_stats():
+    """
+    Merge planner: chain merges skipped because one agent refused or both
+    agents gave the same answer.
+    """
+    return merge_planner.stats()
@@ -1,366 +1,490 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.formparsers import MultiPartException, MultiPartParser
 import db
 import os
-import openai
-from openai import OpenAI
+import asyncio
+import llm
 from models import ChatRequest
+from response_cache import response_cache, make_key
+import memory_index
+import prompts
+import images
+import singleflight
+import matcher
+import fastpath
+import metrics
+import background
+import upstream
+from typing import Optional
 from dotenv import load_dotenv
 
 
 import json
-from langdetect import detect, LangDetectException
-
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-CONF_PATH = os.path.join(BASE_DIR, "confidence_rules.json")
-
-with open(CONF_PATH, "r") as f:
-    CONF_RULES = json.load(f)
+from language import detect_language
 
 load_dotenv()
 router = APIRouter()
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    timeout=30
-)
-
-def _language_name(lang_code: str) -> str:
-    mapping = {
-        "en": "English",
-        "es": "Spanish",
-        "zh-cn": "Chinese",
-        "zh": "Chinese",
-        "fr": "French",
-        "de": "German",
-        "ja": "Japanese",
-        "ko": "Korean",
-        "it": "Italian",
-        "pt": "Portuguese",
-        "ru": "Russian",
-        "ar": "Arabic",
-        "hi": "Hindi",
-        "th": "Thai",
-        "vi": "Vietnamese",
-        "id": "Indonesian",
-        "ms": "Malay",
-        "tr": "Turkish",
-        "nl": "Dutch",
-        "sv": "Swedish",
-        "no": "Norwegian",
-        "da": "Danish",
-        "fi": "Finnish",
-        "pl": "Polish",
-        "uk": "Ukrainian",
-        "el": "Greek",
-        "he": "Hebrew",
-    }
-    return mapping.get(lang_code, lang_code or "English")
-
-
-def detect_language(text: str) -> str:
-    if not text:
-        return "English"
-    cleaned = " ".join(text.strip().split())
-    lowered = cleaned.lower()
-
-    # Short greeting heuristics (langdetect is unreliable for very short text)
-    greeting_map = {
-        "hello": "English",
-        "hi": "English",
-        "hey": "English",
-        "yo": "English",
-        "sup": "English",
-        "hola": "Spanish",
-        "bonjour": "French",
-        "salut": "French",
-        "ciao": "Italian",
-        "hallo": "German",
-        "guten tag": "German",
-        "ola": "Portuguese",
-        "oi": "Portuguese",
-        "hej": "Swedish",
-        "hei": "English",
-    }
 
-    if len(lowered) <= 20:
-        if lowered in greeting_map:
-            return greeting_map[lowered]
-
-        # If it's short ASCII-only text and not a known greeting, default to English
-        if all(ord(ch) < 128 for ch in lowered):
-            return "English"
-
-    # Unicode script heuristics for CJK languages (more reliable for short text)
-    for ch in text:
-        code = ord(ch)
-        # Hangul Syllables/Hangul Jamo -> Korean
-        if 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
-            return "Korean"
-        # Hiragana/Katakana -> Japanese
-        if 0x3040 <= code <= 0x309F or 0x30A0 <= code <= 0x30FF:
-            return "Japanese"
-        # CJK Unified Ideographs -> Chinese (default)
-        if 0x4E00 <= code <= 0x9FFF:
-            return "Chinese"
-    try:
-        code = detect(text)
-        return _language_name(code)
-    except LangDetectException:
-        return "English"
-
-
-def build_system_prompt(agent: dict, relevant_memory=None, user_language: str = "English") -> str:
-    specialties = ", ".join(agent.get("specialties", []))
-    persona = agent.get("persona", "")
-    summary = agent.get("summary", "")
-    name = agent.get("name", "AI Assistant")
-
-    memory_block = ""
-    if relevant_memory:
-        memory_block = "\nRelevant memory:\n" + "\n".join(
-            f"- {m}" for m in relevant_memory
-        )
+def _on_agent_change(agent_id: str, agent):
+    # Memory-only edits keep the same fingerprint, so cached replies survive them
+    if agent is None:
+        response_cache.invalidate_agent(agent_id)
+    else:
+        response_cache.check_agent_version(agent)
 
-    return f"""
-    You are an AI assistant named {name}.
 
-    LANGUAGE RULE (VERY IMPORTANT):
-    - Always respond in the SAME language as the user's question
-    - If the user switches languages, switch with them
-    - Do NOT mention language detection
-    - Respond ONLY in this language: {user_language}
+db.on_agent_change(_on_agent_change)
 
-    Persona:
-    {persona}
+chat_flight = singleflight.get("chat")
 
-    Summary:
-    {summary}
+# Upper bound on chats in flight at once (each one holds an OpenAI round trip)
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "64"))
+_chat_slots = asyncio.Semaphore(CHAT_MAX_CONCURRENCY)
 
-    {memory_block}
-
-    Specialties:
-    {specialties}
-
-    STRICT DOMAIN RULES (VERY IMPORTANT):
-    - You MUST ONLY answer questions directly related to your specialties.
-    - If a question is NOT related to your specialties:
-    - You MUST politely refuse.
-    - You MUST NOT answer the question.
-    - You MUST NOT give tips, examples, or partial help.
-    - You MUST suggest what you CAN help with instead.
-    - Do NOT guess.
-    - Do NOT stretch your expertise.
-    - Do NOT answer "just to be helpful".
-
-    Response style rules:
-    - Sound like a friendly human, not a robot.
-    - Keep responses short and conversational.
-    - Do NOT use bullet points unless explicitly asked.
-    - Use at most ONE emoji if it feels natural.
-    - Always end with exactly ONE gentle follow-up question.
-    - The follow-up question must be on its own line.
-
-    If the user uploads an image:
-    - Describe what you see first.
-    - ONLY continue if the image is related to your specialties.
-    """
+def build_system_prompt(agent: dict, relevant_memory=None, user_language: str = "English") -> str:
+    # Static, memoized prefix first; memory and language go last so the
+    # prefix stays byte-identical across calls
+    return prompts.build("chat", agent, prompts.chat_tail(relevant_memory, user_language))
 
 def get_agent_sync(agent_id: str):
     return db.get_agent_by_id(agent_id)
 
-def call_openai_sync(system_prompt, user_text, image_base64=None):
-    messages = [
+def build_messages(system_prompt, user_text, image_url=None):
+    if not image_url:
+        user_content = user_text
+    else:
+        # Vision turn: text part (if any) + the preprocessed image
+        user_content = []
+        if user_text:
+            user_content.append({"type": "text", "text": user_text})
+        user_content.append({"type": "image_url", "image_url": {"url": image_url}})
+
+    return [
         {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_text},
+        {"role": "user", "content": user_content},
     ]
 
-    response = client.chat.completions.create(
+async def call_openai(system_prompt, user_text, image_url=None):
+    result = await llm.get_backend().complete(
+        build_messages(system_prompt, user_text, image_url),
         model="gpt-4o-mini",
-        messages=messages,
         max_tokens=300,
     )
+    return result.text
 
-    return response.choices[0].message.content
-
-
-    response = client.chat.completions.create(
+def stream_openai(system_prompt, user_text, image_url=None):
+    """
+    Async iterator of reply text deltas as the model streams them.
+    """
+    return llm.get_backend().stream(
+        build_messages(system_prompt, user_text, image_url),
         model="gpt-4o-mini",
-        messages=messages,
         max_tokens=300,
     )
 
-    return response.choices[0].message.content
-    content = []
-
-    if user_text:
-        content.append({
-            "type": "input_text",
-            "text": user_text
-        })
-
-    if image_base64:
-        content.append({
-            "type": "input_image",
-            "image_url": image_base64
-        })
-
-    response = client.responses.create(
-        model="gpt-4.1",
-        input=[
-            {
-                "role": "system",
-                "content": [
-                    {
-                        "type": "input_text",
-                        "text": system_prompt
-                    }
-                ]
-            },
-            {
-                "role": "user",
-                "content": content
-            }
-        ],
-        max_output_tokens=300,
-    )
-
-    return response.output_text
-
 def get_relevant_memory(agent_id: str, user_message: str):
     """
-    Simple relevance-based memory retrieval.
+    BM25-ranked memory retrieval over a per-agent inverted index.
     """
     memory = db.get_agent_memory(agent_id)
     if not memory:
         return []
 
-    user_words = set(user_message.lower().split())
-    relevant = []
-
-    for mem in memory:
-        for word in user_words:
-            if word in mem.lower():
-                relevant.append(mem)
-                break
-
-    return relevant[:5]  # LIMIT to keep prompt small
+    return memory_index.search(agent_id, memory, user_message)  # top-k keeps prompt small
 
 
 def extract_memory_from_message(user_message: str):
     """
     Extract simple long-term memory facts from user input.
-    Rule-based for now (safe & explainable for presentation).
+    Rule-based for now (safe & explainable for presentation);
+    rules live in confidence_rules.json under "memory_rules".
     """
-    memories = []
-    text = user_message.lower()
+    return matcher.current().classify_message(user_message).memories
 
-    if "student" in text:
-        memories.append("User is a student")
 
-    if "save" in text or "saving" in text:
-        memories.append("User is saving money")
+def is_refusal_reply(reply: str) -> bool:
+    return matcher.current().is_refusal(reply)
 
-    if "car" in text:
-        memories.append("User is saving money for a car")
 
-    if "budget" in text:
-        memories.append("User is budget-conscious")
+def build_confidence(user_message: str, relevant_memory, traits: Optional[matcher.MessageTraits] = None) -> dict:
+    used_long_term_memory = len(relevant_memory) > 0
 
-    return memories
+    if traits is None:
+        traits = matcher.current().classify_message(user_message)
+    is_vague = traits.is_vague
 
+    score = 100
+    reasons = []
 
-def is_refusal_reply(reply: str) -> bool:
-    reply_lower = reply.lower()
-
-    refusal_patterns = [
-        "outside my area of expertise",
-        "outside my expertise",
-        "outside my scope",
-        "i can't help with",
-        "i cannot help with",
-        "i can't offer",
-        "i cannot offer",
-        "i only help with",
-        "i'm here to help with",
-        "i focus on",
-        "i specialize in",
-        "not related to",
-        "not my area"
-    ]
+    if not used_long_term_memory:
+        score -= 25
+        reasons.append("Limited long-term memory available")
+
+    if is_vague:
+        score -= 30
+        reasons.append("User question is vague")
 
-    return any(p in reply_lower for p in refusal_patterns)
+    score = max(0, min(score, 100))
 
+    level = "high" if score >= 60 else "medium" if score >= 30 else "low"
+
+    return {
+        "score": score,
+        "level": level,
+        "reasons": reasons
+    }
 
-@router.post("/query")
-def chat(req: ChatRequest):
-    # 1. Get agent (SYNC)
-    agent = get_agent_sync(req.agent_id)
+
+def prepare_image_sync(image_base64: Optional[str] = None, image_bytes: Optional[bytes] = None):
+    """
+    Downscaled JPEG data URL for the vision model, or None for text-only turns.
+    """
+    try:
+        if image_bytes is None:
+            if not image_base64:
+                return None
+            image_bytes = images.decode_base64_image(image_base64)
+        return images.prepare_image(image_bytes)
+    except images.ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except images.ImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _prepare_chat(req: ChatRequest, image_bytes: Optional[bytes] = None) -> dict:
+    """
+    Pre-LLM stages shared by /query, /stream and /image.
+    """
+    # 1-3. Agent, relevant memory, language and image are independent -> run concurrently
+    agent, relevant_memory, user_language, image_url = await asyncio.gather(
+        asyncio.to_thread(metrics.timed("chat", "db", get_agent_sync), req.agent_id),
+        asyncio.to_thread(metrics.timed("chat", "memory", get_relevant_memory), req.agent_id, req.user_message),
+        asyncio.to_thread(metrics.timed("chat", "lang", detect_language), req.user_message),
+        asyncio.to_thread(metrics.timed("chat", "image", prepare_image_sync), req.image_base64, image_bytes),
+    )
 
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    # 2. Retrieve relevant memory
-    relevant_memory = get_relevant_memory(
-        req.agent_id,
-        req.user_message
-    )
+    with metrics.stage("chat", "prompt"):
+        # 4. Greeting, vagueness and memory facts in one pass over the message
+        traits = matcher.current().classify_message(req.user_message)
 
-    # 3. Detect greeting
-    user_text = req.user_message.lower().strip()
-    is_greeting = user_text in CONF_RULES["greetings"]
+        # Image turns are never served from the response cache
+        cache_key = None
+        if not image_url:
+            response_cache.check_agent_version(agent)
+            cache_key = make_key(agent, req.user_message, user_language, relevant_memory)
 
-    # 4. Detect language
-    user_language = detect_language(req.user_message)
+        system_prompt = build_system_prompt(agent, relevant_memory, user_language)
 
-    # 5. Call OpenAI (SYNC, BLOCKING BUT SAFE)
-    reply = call_openai_sync(
-        build_system_prompt(agent, relevant_memory, user_language),
-        req.user_message,
-        req.image_base64
-    )
+    return {
+        "system_prompt": system_prompt,
+        "relevant_memory": relevant_memory,
+        "is_greeting": traits.is_greeting,
+        "traits": traits,
+        "cache_key": cache_key,
+        "image_url": image_url,
+    }
+
+
+async def _fast_reply(req: ChatRequest) -> Optional[dict]:
+    """
+    Greetings and other trivial intents answered from templates: no LLM,
+    memory lookup or language detection. None if the message does not qualify.
+    """
+    if req.image_base64:
+        return None
+    found = fastpath.match(req.user_message)
+    if found is None:
+        return None
+
+    with metrics.stage("chat", "fastpath"):
+        agent = db.peek_agent(req.agent_id)
+        if agent is None:
+            agent = await asyncio.to_thread(get_agent_sync, req.agent_id)
+        if not agent:
+            raise HTTPException(status_code=404, detail="Agent not found")
+        reply = fastpath.render(found, agent)
+
+    return {
+        "reply": reply,
+        "confidence": None,
+        "response_id": None,
+    }
+
+
+async def _save_memory(req: ChatRequest, ctx: dict, refusal: bool):
+    # Save memory if not refusal; all facts from this turn go out in one
+    # atomic write on the background queue, off the reply path
+    if refusal:
+        return
+    memories = ctx["traits"].memories
+    if memories:
+        await background.submit(
+            "agent_memory", metrics.timed("chat", "persist", db.add_agent_memories), req.agent_id, memories
+        )
+
+
+def _build_result(req: ChatRequest, ctx: dict, reply: str, refusal: bool) -> dict:
+    # Skip confidence for greetings / refusals
+    confidence = None
+    if not (ctx["is_greeting"] or refusal):
+        confidence = build_confidence(req.user_message, ctx["relevant_memory"], ctx["traits"])
+
+    return {
+        "reply": reply,
+        "confidence": confidence,
+        "response_id": ctx["cache_key"],
+    }
+
+
+async def _generate_reply(req: ChatRequest, ctx: dict) -> str:
+    cache_key = ctx["cache_key"]
+
+    async def call():
+        try:
+            reply = await call_openai(ctx["system_prompt"], req.user_message, ctx["image_url"])
+        except llm.LLMError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e), headers=llm.error_headers(e))
+        if cache_key:
+            response_cache.set(cache_key, req.agent_id, reply)
+        return reply
+
+    if not cache_key:
+        return await call()
+    # Identical questions already in flight share one OpenAI call
+    return await chat_flight.do(cache_key, call)
+
+
+@router.post("/query")
+async def chat(req: ChatRequest):
+    fast = await _fast_reply(req)
+    if fast is not None:
+        return fast
+
+    async with _chat_slots:
+        return await _run_chat(req)
+
+
+async def _run_chat(req: ChatRequest, image_bytes: Optional[bytes] = None):
+    ctx = await _prepare_chat(req, image_bytes)
+    cache_key = ctx["cache_key"]
+
+    # 5. Serve repeated questions from the response cache, else call OpenAI
+    with metrics.stage("chat", "cache"):
+        reply = response_cache.get(cache_key) if cache_key else None
+    if reply is None:
+        with metrics.stage("chat", "llm"):
+            reply = await _generate_reply(req, ctx)
 
     refusal = is_refusal_reply(reply)
 
-    # 6. Save memory if not refusal
-    if not refusal:
-        for mem in extract_memory_from_message(req.user_message):
-            db.add_agent_memory(req.agent_id, mem)
+    # 6. Save memory if not refusal (write-behind)
+    await _save_memory(req, ctx, refusal)
 
-    # 7. Skip confidence for greetings / refusals
-    if is_greeting or refusal:
-        return {
-            "reply": reply,
-            "confidence": None
-        }
+    # 7-8. Confidence (skipped for greetings / refusals)
+    return _build_result(req, ctx, reply, refusal)
 
-    # 8. Confidence logic (unchanged)
-    agent_memory = db.get_agent_memory(req.agent_id) or []
-    used_long_term_memory = len(relevant_memory) > 0
 
-    is_vague = len(req.user_message.strip()) < CONF_RULES["min_length"]
-    if len(req.user_message.strip()) > CONF_RULES["clear_length"]:
-        is_vague = False
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-    score = 100
-    reasons = []
 
-    if not used_long_term_memory:
-        score -= 25
-        reasons.append("Limited long-term memory available")
+@router.post("/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Same pipeline as /query, but streams the reply as Server-Sent Events:
+    - "token" events carry {"delta": ...} as the model produces text
+    - a final "done" event carries the same body as /query
+    Memory writes are queued just before the "done" event.
+    """
+    fast = await _fast_reply(req)
+    if fast is not None:
+        return StreamingResponse(
+            iter([_sse("token", {"delta": fast["reply"]}), _sse("done", fast)]),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
-    if is_vague:
-        score -= 30
-        reasons.append("User question is vague")
+    ctx = await _prepare_chat(req)
+    cache_key = ctx["cache_key"]
+
+    async def events():
+        reply = response_cache.get(cache_key) if cache_key else None
+        if reply is not None:
+            yield _sse("token", {"delta": reply})
+        else:
+            parts = []
+            async with _chat_slots:
+                # Timed until the last token, including time spent
+                # waiting on the client to read earlier events
+                with metrics.stage("chat", "llm"):
+                    try:
+                        async for delta in stream_openai(ctx["system_prompt"], req.user_message, ctx["image_url"]):
+                            parts.append(delta)
+                            yield _sse("token", {"delta": delta})
+                    except llm.LLMError as e:
+                        yield _sse("error", {"detail": str(e)})
+                        return
+
+            reply = "".join(parts)
+            if cache_key:
+                response_cache.set(cache_key, req.agent_id, reply)
+
+        refusal = is_refusal_reply(reply)
+
+        await _save_memory(req, ctx, refusal)
+        yield _sse("done", _build_result(req, ctx, reply, refusal))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    score = max(0, min(score, 100))
 
-    level = "high" if score >= 60 else "medium" if score >= 30 else "low"
+async def _capped(stream, limit: int, what: str = "Image"):
+    """
+    Pass a request body through, failing with 413 once it exceeds `limit`
+    (chunked uploads carry no Content-Length to check up front).
+    """
+    size = 0
+    async for chunk in stream:
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail=f"{what} exceeds {limit} bytes")
+        yield chunk
+
+
+@router.post("/image")
+async def chat_image(
+    request: Request,
+    agent_id: Optional[str] = None,
+    user_message: str = "",
+):
+    """
+    Vision chat without the base64-in-JSON overhead. Send either:
+    - multipart/form-data with fields agent_id, user_message and file
+    - a raw image body (Content-Type: image/*) with agent_id and
+      user_message as query parameters
+    Uploads larger than IMAGE_MAX_BYTES are rejected with 413.
+    """
+    # Allow some room for multipart framing and the text fields
+    form_limit = images.IMAGE_MAX_BYTES + 64 * 1024
+    content_length = request.headers.get("content-length")
+    if content_length:
+        try:
+            content_length = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if content_length > form_limit:
+            raise HTTPException(status_code=413, detail=f"Request body exceeds {form_limit} bytes")
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        parser = MultiPartParser(request.headers, _capped(request.stream(), form_limit, "Request body"), max_files=1)
+        try:
+            form = await parser.parse()
+        except MultiPartException as e:
+            raise HTTPException(status_code=400, detail=e.message)
+        try:
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="file is required")
+            if upload.size is not None and upload.size > images.IMAGE_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Image exceeds {images.IMAGE_MAX_BYTES} bytes")
+            image_bytes = await upload.read()
+        finally:
+            await form.close()
+        for field in ("agent_id", "user_message"):
+            if not isinstance(form.get(field, ""), str):
+                raise HTTPException(status_code=400, detail=f"{field} must be a text field")
+        agent_id = form.get("agent_id") or agent_id
+        user_message = form.get("user_message") or user_message
+    else:
+        image_bytes = b"".join([chunk async for chunk in _capped(request.stream(), images.IMAGE_MAX_BYTES)])
+
+    if not agent_id:
+        raise HTTPException(status_code=400, detail="agent_id is required")
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Image body is empty")
+
+    req = ChatRequest(agent_id=agent_id, user_message=user_message)
+    async with _chat_slots:
+        return await _run_chat(req, image_bytes)
+
+
+@router.get("/image/stats")
+async def get_image_stats():
+    """
+    Image preprocessing cache counters.
+    """
+    return images.stats()
 
-    return {
-        "reply": reply,
-        "confidence": {
-            "score": score,
-            "level": level,
-            "reasons": reasons
-        }
-    }
\ No newline at end of file
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Response cache hit / miss / eviction counters.
+    """
+    return response_cache.stats()
+
+
+@router.get("/singleflight/stats")
+async def get_singleflight_stats():
+    """
+    Upstream LLM calls made vs. calls coalesced into one in flight, per route.
+    """
+    return singleflight.stats()
+
+
+@router.get("/fastpath/stats")
+async def get_fastpath_stats():
+    """
+    Messages answered from templates without an LLM call, per intent.
+    """
+    return fastpath.stats()
+
+
+@router.get("/rules/stats")
+async def get_rules_stats():
+    """
+    Compiled rule matcher: pattern counts and hot-reload counters.
+    """
+    return matcher.stats()
+
+
+@router.get("/prompt/stats")
+async def get_prompt_stats():
+    """
+    Prompt compiler counters and token usage (static prefix vs per-request tail).
+    """
+    return prompts.stats()
+
+
+@router.get("/llm/stats")
+async def get_llm_stats():
+    """
+    Upstream LLM calls: retries, timeouts, hedges and circuit breaker state.
+    """
+    backend = llm.get_backend()
+    return backend.stats() if hasattr(backend, "stats") else {"backend": backend.name}
+
+
+@router.get("/background/stats")
+async def get_background_stats():
+    """
+    Post-response write queue: depth, retries and failures per job.
+    """
+    return background.queue.stats()
+
+
+@router.get("/upstream/stats")
+async def get_upstream_stats():
+    """
+    Shared upstream HTTP client: pool limits, in-flight requests, pool waits.
+    """
+    return upstream.stats()
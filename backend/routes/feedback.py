@@ -1,6 +1,9 @@
+import asyncio
 from fastapi import APIRouter, HTTPException
-from models import FeedbackRequest
+from models import FeedbackRequest, FeedbackType
+from response_cache import response_cache
 import db
+import background
 
 
 router = APIRouter()
@@ -18,7 +21,21 @@ async def submit_feedback(req: FeedbackRequest):
             "feedback_type": req.feedback_type,
             "user_comment": req.user_comment,
         }
-        feedback_id = db.save_feedback(feedback_data)
+        if req.response_id:
+            feedback_data["response_id"] = req.response_id
+
+        # A bad answer must not keep being served from the response cache
+        if req.feedback_type in (FeedbackType.THUMBS_DOWN, FeedbackType.FLAG_INCORRECT):
+            if req.response_id:
+                response_cache.evict(req.response_id, agent_id=req.agent_id)
+            else:
+                response_cache.invalidate_agent(req.agent_id)
+
+        # The id is derived from chat/message ids, so the write can be
+        # queued and the id returned right away
+        feedback_id = db.feedback_id(feedback_data)
+        await background.submit("feedback", db.save_feedback, feedback_data)
+
         return {
             "status": "success",
             "feedback_id": feedback_id,
@@ -33,8 +50,10 @@ async def get_agent_feedback(agent_id: str):
     Get all feedback for a specific agent.
     """
     try:
-        feedback = db.get_feedback_for_agent(agent_id)
-        stats = db.get_feedback_stats(agent_id)
+        feedback, stats = await asyncio.gather(
+            asyncio.to_thread(db.get_feedback_for_agent, agent_id),
+            asyncio.to_thread(db.get_feedback_stats, agent_id),
+        )
         return {
             "agent_id": agent_id,
             "feedback": feedback,
@@ -49,7 +68,7 @@ async def get_feedback_stats(agent_id: str):
     Get feedback statistics for an agent (thumbs up/down counts, etc.).
     """
     try:
-        stats = db.get_feedback_stats(agent_id)
+        stats = await asyncio.to_thread(db.get_feedback_stats, agent_id)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,22 +1,19 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-import os
 import re
 import asyncio
 from dotenv import load_dotenv
-from openai import OpenAI
-from firebase_admin import firestore
+import llm
 
 import db as db_layer
+from storage import SERVER_TIMESTAMP
+import singleflight
 
 load_dotenv()
 router = APIRouter()
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    timeout=10
-)
+help_flight = singleflight.get("help")
 
 class HelpRouteRequest(BaseModel):
     prompt: str
@@ -68,7 +65,7 @@ def _next_created_agent_number(all_agents: List[Dict[str, Any]]) -> int:
                 pass
     return (max(nums) + 1) if nums else 1
 
-def _extract_tags_with_ai(prompt: str, known_tags: List[str]) -> List[str]:
+async def _extract_tags_with_ai(prompt: str, known_tags: List[str]) -> List[str]:
     known_tags = [t for t in (known_tags or []) if t]
     known_tags = list(dict.fromkeys([_normalize_tag(t) for t in known_tags if _normalize_tag(t)]))
 
@@ -84,16 +81,17 @@ def _extract_tags_with_ai(prompt: str, known_tags: List[str]) -> List[str]:
         f"known_tags: {known_tags}\n"
     )
 
-    resp = client.responses.create(
-        model="gpt-4.1",
-        input=[
-            {"role": "system", "content": [{"type": "input_text", "text": sys}]},
-            {"role": "user", "content": [{"type": "input_text", "text": prompt}]},
+    resp = await llm.get_backend().complete(
+        [
+            {"role": "system", "content": sys},
+            {"role": "user", "content": prompt},
         ],
-        max_output_tokens=120,
+        model="gpt-4.1",
+        max_tokens=120,
+        timeout=10,
     )
 
-    text = (resp.output_text or "").strip()
+    text = (resp.text or "").strip()
 
     try:
         data = __import__("json").loads(text)
@@ -139,7 +137,9 @@ async def route_help(req: HelpRouteRequest):
             known_tags.append(str(s))
 
     try:
-        tags = await asyncio.to_thread(_extract_tags_with_ai, prompt, known_tags)
+        # Identical prompts already in flight share one OpenAI call
+        key = singleflight.make_key(" ".join(prompt.lower().split()), sorted(set(known_tags)))
+        tags = await help_flight.do(key, lambda: _extract_tags_with_ai(prompt, known_tags))
     except Exception as e:
         # AI failure shouldn't brick UX; fallback to simple keywording
         low = prompt.lower()
@@ -166,11 +166,10 @@ async def route_help(req: HelpRouteRequest):
         persona = "You are a helpful assistant. Be clear, friendly, and practical."
 
     # Use auto-id document so it matches frontend expectations
-    from firebase_admin_init import db as admin_db
-    doc_ref = admin_db.collection("agents").document()
-    agent_id = doc_ref.id
+    agent_id = db_layer.new_agent_id()
 
     doc = {
+        "id": agent_id,
         "name": name,
         "summary": summary,
         "persona": persona,
@@ -178,10 +177,10 @@ async def route_help(req: HelpRouteRequest):
         "icon": "🤖",
         "color": "#3a3a3a",
         "tools": [],
-        "createdAt": firestore.SERVER_TIMESTAMP,
+        "createdAt": SERVER_TIMESTAMP,
         "isActive": True,
     }
 
-    doc_ref.set(doc)
+    await asyncio.to_thread(db_layer.create_agent_doc, doc)
 
     return {"agentId": agent_id, "created": True, "tags": tags}
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from models import KnowledgeBaseUploadRequest, FaqBuilderRequest
 import db
@@ -12,7 +13,8 @@ async def upload_kb_document(req: KnowledgeBaseUploadRequest):
     Upload a document (text or extracted from PDF) to the knowledge base.
     """
     try:
-        doc_id = db.save_kb_document(
+        doc_id = await asyncio.to_thread(
+            db.save_kb_document,
             agent_id=req.agent_id,
             content=req.content,
             metadata=req.metadata.dict()
@@ -41,7 +43,8 @@ async def upload_pdf(agent_id: str, file: UploadFile = File(...)):
             text += page.extract_text()
         
         # Save to KB
-        doc_id = db.save_kb_document(
+        doc_id = await asyncio.to_thread(
+            db.save_kb_document,
             agent_id=agent_id,
             content=text,
             metadata={
@@ -66,7 +69,8 @@ async def upload_text(req: KnowledgeBaseUploadRequest):
     Upload raw text to knowledge base.
     """
     try:
-        doc_id = db.save_kb_document(
+        doc_id = await asyncio.to_thread(
+            db.save_kb_document,
             agent_id=req.agent_id,
             content=req.content,
             metadata=req.metadata.dict()
@@ -90,11 +94,12 @@ async def upload_from_url(req: KnowledgeBaseUploadRequest):
         from bs4 import BeautifulSoup
         
         url = req.metadata.source_url or ""
-        response = requests.get(url)
+        response = await asyncio.to_thread(requests.get, url)
         soup = BeautifulSoup(response.content, 'html.parser')
         text = soup.get_text()
         
-        doc_id = db.save_kb_document(
+        doc_id = await asyncio.to_thread(
+            db.save_kb_document,
             agent_id=req.agent_id,
             content=text,
             metadata=req.metadata.dict()
@@ -115,7 +120,7 @@ async def upload_faq(req: FaqBuilderRequest):
     """
     try:
         faq_list = [entry.dict() for entry in req.faq_entries]
-        db.save_faq(req.agent_id, faq_list)
+        await asyncio.to_thread(db.save_faq, req.agent_id, faq_list)
         return {
             "status": "success",
             "faq_count": len(faq_list),
@@ -130,7 +135,7 @@ async def get_agent_kb(agent_id: str):
     Get all knowledge base documents for an agent.
     """
     try:
-        docs = db.get_kb_documents(agent_id)
+        docs = await asyncio.to_thread(db.get_kb_documents, agent_id)
         return {
             "agent_id": agent_id,
             "document_count": len(docs),
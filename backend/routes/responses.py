@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, HTTPException
 from models import SaveResponseRequest
 import db
@@ -10,7 +11,8 @@ async def save_response(req: SaveResponseRequest):
     Save/bookmark a bot response for later reference.
     """
     try:
-        response_id = db.save_response(
+        response_id = await asyncio.to_thread(
+            db.save_response,
             agent_id=req.agent_id,
             user_message=req.user_message,
             bot_response=req.bot_response,
@@ -32,7 +34,7 @@ async def get_saved_responses(agent_id: str, tags: str = None):
     """
     try:
         tag_list = tags.split(",") if tags else None
-        responses = db.get_saved_responses(agent_id, tag_list)
+        responses = await asyncio.to_thread(db.get_saved_responses, agent_id, tag_list)
         return {
             "agent_id": agent_id,
             "count": len(responses),
@@ -0,0 +1,88 @@
+# backend/singleflight.py
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict
+
+
+def make_key(*parts) -> str:
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls: the first caller for a key starts
+    the upstream call, later callers with the same key await its result.
+    The shared call keeps running while anyone still waits for it, and is
+    cancelled once the last waiter goes away (disconnect, timeout, a chain
+    leg abandoned), so abandoned calls stop holding upstream connections.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]):
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda t: self._done(key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody left to use the answer; later callers start afresh
+                self.abandoned += 1
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                flight.task.cancel()
+
+    def _done(self, key: str, flight: _Flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        # Mark the error as retrieved even if every waiter went away
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def stats(self) -> Dict:
+        total = self.calls + self.coalesced
+        return {
+            "upstream_calls": self.calls,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._inflight),
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+        }
+
+
+_flights: Dict[str, SingleFlight] = {}
+
+
+def get(name: str) -> SingleFlight:
+    flight = _flights.get(name)
+    if flight is None:
+        flight = _flights[name] = SingleFlight(name)
+    return flight
+
+
+def stats() -> Dict:
+    return {name: flight.stats() for name, flight in _flights.items()}
@@ -0,0 +1,66 @@
+# backend/storage/__init__.py
+"""
+Persistence backends behind db.py, selected with STORAGE_BACKEND:
+
+  firestore (default) -> Google Firestore via firebase_admin_init
+  memory              -> process-local dicts, nothing persisted
+  sqlite              -> single file at STORAGE_SQLITE_PATH
+"""
+import os
+import threading
+from typing import Optional
+
+from storage.base import Store, SERVER_TIMESTAMP
+
+
+def _firestore():
+    from storage.firestore import FirestoreStore
+    return FirestoreStore()
+
+
+def _memory():
+    from storage.memory import MemoryStore
+    return MemoryStore()
+
+
+def _sqlite():
+    from storage.sqlite import SQLiteStore
+    return SQLiteStore()
+
+
+BACKENDS = {
+    "firestore": _firestore,
+    "memory": _memory,
+    "sqlite": _sqlite,
+}
+
+_store: Optional[Store] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Store:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                name = os.getenv("STORAGE_BACKEND", "firestore").lower()
+                if name not in BACKENDS:
+                    raise ValueError(f"Unknown STORAGE_BACKEND: {name}")
+                _store = BACKENDS[name]()
+    return _store
+
+
+def backend_name() -> str:
+    """
+    Name of the active (or configured, if not yet created) backend.
+    """
+    store = _store
+    return store.name if store is not None else os.getenv("STORAGE_BACKEND", "firestore").lower()
+
+
+def set_store(store: Optional[Store]):
+    """
+    Swap the process-wide store (tests, benchmarks).
+    """
+    global _store
+    _store = store
@@ -0,0 +1,120 @@
+# backend/storage/base.py
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+COLLECTION_AGENTS = "agents"
+COLLECTION_FEEDBACK = "feedback"
+COLLECTION_KB = "knowledge_base"
+COLLECTION_SAVED_RESPONSES = "saved_responses"
+COLLECTION_AGENT_CHAINS = "agent_chains"
+COLLECTION_CHAIN_CONVERSATIONS = "chain_conversations"
+
+# Record fields that are looked up by equality; local backends index these
+INDEXED_FIELDS = {
+    COLLECTION_FEEDBACK: ("agent_id",),
+    COLLECTION_KB: ("agent_id",),
+    COLLECTION_SAVED_RESPONSES: ("agent_id",),
+    COLLECTION_AGENT_CHAINS: ("primary_agent_id", "secondary_agent_id"),
+    COLLECTION_CHAIN_CONVERSATIONS: ("primary_agent_id", "secondary_agent_id"),
+}
+
+
+class _ServerTimestamp:
+    def __repr__(self):
+        return "SERVER_TIMESTAMP"
+
+
+# Placeholder for "time of the write", resolved by each backend
+SERVER_TIMESTAMP = _ServerTimestamp()
+
+
+def resolve_timestamps(data: Dict, now=None) -> Dict:
+    """
+    Copy of data with SERVER_TIMESTAMP replaced by the current UTC time.
+    """
+    if not any(v is SERVER_TIMESTAMP for v in data.values()):
+        return dict(data)
+    now = now or datetime.now(timezone.utc).isoformat()
+    return {k: (now if v is SERVER_TIMESTAMP else v) for k, v in data.items()}
+
+
+# Change feed callback: list of (agent_id, agent dict or None when removed)
+AgentChanges = List[Tuple[str, Optional[Dict]]]
+
+
+class Store:
+    """
+    Persistence interface behind db.py.
+
+    Agents are documents keyed by id; "memory" is a list field appended to
+    atomically. Everything else (feedback, KB, saved responses, chains) is
+    an append-mostly record collection queried by one field.
+    """
+    name = "base"
+
+    # ----- agents -----
+
+    def new_agent_id(self) -> str:
+        raise NotImplementedError
+
+    def get_agent(self, agent_id: str) -> Optional[Dict]:
+        """
+        Agent dict with "id" set, or None.
+        """
+        raise NotImplementedError
+
+    def list_agents(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def put_agent(self, agent_id: str, doc: Dict) -> Dict:
+        """
+        Create or replace an agent. Returns the doc as it will read back.
+        """
+        raise NotImplementedError
+
+    def append_agent_memory(self, agent_id: str, items: List[str]) -> bool:
+        """
+        Atomically append items not already present. False if the agent is missing.
+        """
+        raise NotImplementedError
+
+    def watch_agents(self, callback: Callable[[AgentChanges], None]):
+        """
+        Start a change feed on agents. Returns a handle with `is_active` and
+        `unsubscribe()`, or None when the backend has no feed (callers then
+        rely on TTL expiry).
+        """
+        return None
+
+    # ----- records -----
+
+    def add(self, collection: str, data: Dict, doc_id: Optional[str] = None) -> str:
+        """
+        Insert (or replace, when doc_id exists) a record. Returns its id.
+        """
+        raise NotImplementedError
+
+    def find(self, collection: str, field: str, value, tags: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Records where data[field] == value, optionally only those whose
+        "tags" list shares at least one entry with `tags`.
+        """
+        raise NotImplementedError
+
+    def list_records(self, collection: str) -> List[Tuple[str, Dict]]:
+        """
+        Every record of a (small) collection as (id, data).
+        """
+        raise NotImplementedError
+
+    def watch_records(self, collection: str, callback: Callable[[AgentChanges], None]):
+        """
+        Change feed on a record collection, same contract as watch_agents.
+        """
+        return None
+
+
+def matches_tags(data: Dict, tags: Optional[List[str]]) -> bool:
+    if not tags:
+        return True
+    return any(t in (data.get("tags") or []) for t in tags)
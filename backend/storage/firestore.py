@@ -0,0 +1,104 @@
+# backend/storage/firestore.py
+from typing import Dict, List, Optional, Tuple
+
+from storage.base import Store, SERVER_TIMESTAMP, COLLECTION_AGENTS, resolve_timestamps
+
+
+class FirestoreStore(Store):
+    name = "firestore"
+
+    def __init__(self, client=None):
+        from firebase_admin import firestore
+
+        if client is None:
+            # Importing firebase_admin_init connects and needs credentials,
+            # so only do it when this backend is actually selected
+            from firebase_admin_init import db as client
+        self.client = client
+        self._firestore = firestore
+
+    def _agents(self):
+        return self.client.collection(COLLECTION_AGENTS)
+
+    def _to_firestore(self, data: Dict) -> Dict:
+        return {
+            k: (self._firestore.SERVER_TIMESTAMP if v is SERVER_TIMESTAMP else v)
+            for k, v in data.items()
+        }
+
+    # ----- agents -----
+
+    def new_agent_id(self) -> str:
+        # Auto-id, same shape as documents created by the frontend
+        return self._agents().document().id
+
+    def get_agent(self, agent_id: str) -> Optional[Dict]:
+        snap = self._agents().document(agent_id).get()
+        if not snap.exists:
+            return None
+        data = snap.to_dict()
+        data["id"] = snap.id  #  REQUIRED
+        return data
+
+    def list_agents(self) -> List[Dict]:
+        agents = []
+        for d in self._agents().stream():
+            data = d.to_dict()
+            data["id"] = d.id  #  REQUIRED
+            agents.append(data)
+        return agents
+
+    def put_agent(self, agent_id: str, doc: Dict) -> Dict:
+        self._agents().document(agent_id).set(self._to_firestore(doc))
+        # Close enough to the server time until the listener delivers it
+        return resolve_timestamps(doc)
+
+    def append_agent_memory(self, agent_id: str, items: List[str]) -> bool:
+        from google.api_core.exceptions import NotFound
+
+        # ArrayUnion is applied atomically server-side, so concurrent requests
+        # never overwrite each other's entries
+        try:
+            self._agents().document(agent_id).update(
+                {"memory": self._firestore.ArrayUnion(items)}
+            )
+        except NotFound:
+            return False
+        return True
+
+    def watch_agents(self, callback):
+        return self._watch(self._agents(), callback)
+
+    def _watch(self, collection_ref, callback):
+        def on_snapshot(docs, changes, read_time):
+            out = []
+            for change in changes:
+                doc = change.document
+                if change.type.name == "REMOVED":
+                    out.append((doc.id, None))
+                    continue
+                data = doc.to_dict()
+                data["id"] = doc.id
+                out.append((doc.id, data))
+            callback(out)
+
+        return collection_ref.on_snapshot(on_snapshot)
+
+    # ----- records -----
+
+    def add(self, collection: str, data: Dict, doc_id: Optional[str] = None) -> str:
+        doc_ref = self.client.collection(collection).document(doc_id)
+        doc_ref.set(self._to_firestore(data))
+        return doc_ref.id
+
+    def find(self, collection: str, field: str, value, tags: Optional[List[str]] = None) -> List[Dict]:
+        query = self.client.collection(collection).where(field, "==", value)
+        if tags:
+            query = query.where("tags", "array-contains-any", tags)
+        return [d.to_dict() for d in query.stream()]
+
+    def list_records(self, collection: str) -> List[Tuple[str, Dict]]:
+        return [(d.id, d.to_dict()) for d in self.client.collection(collection).stream()]
+
+    def watch_records(self, collection: str, callback):
+        return self._watch(self.client.collection(collection), callback)
@@ -0,0 +1,82 @@
+# backend/storage/memory.py
+import copy
+import uuid
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from storage.base import Store, INDEXED_FIELDS, matches_tags, resolve_timestamps
+
+
+class MemoryStore(Store):
+    """
+    Process-local store for tests, benchmarks and throwaway single-node runs.
+    Nothing survives a restart.
+    """
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents: Dict[str, Dict] = {}
+        self._records: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+        # collection -> field -> value -> set of record ids
+        self._index = defaultdict(lambda: defaultdict(lambda: defaultdict(set)))
+
+    # ----- agents -----
+
+    def new_agent_id(self) -> str:
+        return uuid.uuid4().hex[:20]
+
+    def get_agent(self, agent_id: str) -> Optional[Dict]:
+        with self._lock:
+            data = self._agents.get(agent_id)
+            return {**copy.deepcopy(data), "id": agent_id} if data is not None else None
+
+    def list_agents(self) -> List[Dict]:
+        with self._lock:
+            return [{**copy.deepcopy(d), "id": i} for i, d in self._agents.items()]
+
+    def put_agent(self, agent_id: str, doc: Dict) -> Dict:
+        doc = resolve_timestamps(doc)
+        with self._lock:
+            self._agents[agent_id] = copy.deepcopy(doc)
+        return doc
+
+    def append_agent_memory(self, agent_id: str, items: List[str]) -> bool:
+        with self._lock:
+            data = self._agents.get(agent_id)
+            if data is None:
+                return False
+            memory = data.get("memory") or []
+            data["memory"] = memory + [m for m in items if m not in memory]
+        return True
+
+    # ----- records -----
+
+    def add(self, collection: str, data: Dict, doc_id: Optional[str] = None) -> str:
+        doc_id = doc_id or uuid.uuid4().hex[:20]
+        data = copy.deepcopy(resolve_timestamps(data))
+        fields = INDEXED_FIELDS.get(collection, ())
+        with self._lock:
+            records = self._records[collection]
+            old = records.get(doc_id)
+            for field in fields:
+                if old is not None:
+                    self._index[collection][field][old.get(field)].discard(doc_id)
+                self._index[collection][field][data.get(field)].add(doc_id)
+            records[doc_id] = data
+        return doc_id
+
+    def find(self, collection: str, field: str, value, tags: Optional[List[str]] = None) -> List[Dict]:
+        with self._lock:
+            records = self._records[collection]
+            if field in INDEXED_FIELDS.get(collection, ()):
+                ids = self._index[collection][field].get(value, ())
+                candidates = [records[i] for i in ids]
+            else:
+                candidates = [r for r in records.values() if r.get(field) == value]
+            return [copy.deepcopy(r) for r in candidates if matches_tags(r, tags)]
+
+    def list_records(self, collection: str) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            return [(i, copy.deepcopy(r)) for i, r in self._records[collection].items()]
@@ -0,0 +1,135 @@
+# backend/storage/sqlite.py
+import os
+import json
+import uuid
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from storage.base import Store, COLLECTION_AGENTS, INDEXED_FIELDS, matches_tags, resolve_timestamps
+
+STORAGE_SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", "agent_engine.db")
+
+
+def _dumps(data: Dict) -> str:
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SQLiteStore(Store):
+    """
+    Single-file store for single-node deployments.
+
+    Documents are stored as JSON; the fields records are queried by get
+    their own indexed columns. One connection is shared behind a lock:
+    statements take microseconds, far below a network round trip.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or STORAGE_SQLITE_PATH
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {COLLECTION_AGENTS} (id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            for collection, fields in INDEXED_FIELDS.items():
+                columns = "".join(f", {f} TEXT" for f in fields)
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {collection} (id TEXT PRIMARY KEY{columns}, data TEXT NOT NULL)"
+                )
+                for field in fields:
+                    self._conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_{collection}_{field} ON {collection} ({field})"
+                    )
+
+    # ----- agents -----
+
+    def new_agent_id(self) -> str:
+        return uuid.uuid4().hex[:20]
+
+    def get_agent(self, agent_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT data FROM {COLLECTION_AGENTS} WHERE id = ?", (agent_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row[0]), "id": agent_id}
+
+    def list_agents(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id, data FROM {COLLECTION_AGENTS}").fetchall()
+        return [{**json.loads(data), "id": agent_id} for agent_id, data in rows]
+
+    def put_agent(self, agent_id: str, doc: Dict) -> Dict:
+        doc = resolve_timestamps(doc)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {COLLECTION_AGENTS} (id, data) VALUES (?, ?)",
+                (agent_id, _dumps(doc)),
+            )
+        return doc
+
+    def append_agent_memory(self, agent_id: str, items: List[str]) -> bool:
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so other processes
+            # sharing the file cannot interleave a read-modify-write
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT data FROM {COLLECTION_AGENTS} WHERE id = ?", (agent_id,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                data = json.loads(row[0])
+                memory = data.get("memory") or []
+                data["memory"] = memory + [m for m in items if m not in memory]
+                self._conn.execute(
+                    f"UPDATE {COLLECTION_AGENTS} SET data = ? WHERE id = ?",
+                    (_dumps(data), agent_id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    # ----- records -----
+
+    def add(self, collection: str, data: Dict, doc_id: Optional[str] = None) -> str:
+        doc_id = doc_id or uuid.uuid4().hex[:20]
+        data = resolve_timestamps(data)
+        fields = INDEXED_FIELDS[collection]
+        columns = ", ".join(("id",) + fields + ("data",))
+        placeholders = ", ".join("?" * (len(fields) + 2))
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {collection} ({columns}) VALUES ({placeholders})",
+                (doc_id, *[data.get(f) for f in fields], _dumps(data)),
+            )
+        return doc_id
+
+    def find(self, collection: str, field: str, value, tags: Optional[List[str]] = None) -> List[Dict]:
+        if field in INDEXED_FIELDS[collection]:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT data FROM {collection} WHERE {field} = ?", (value,)
+                ).fetchall()
+            records = [json.loads(r[0]) for r in rows]
+        else:
+            with self._lock:
+                rows = self._conn.execute(f"SELECT data FROM {collection}").fetchall()
+            records = [d for d in (json.loads(r[0]) for r in rows) if d.get(field) == value]
+        return [r for r in records if matches_tags(r, tags)]
+
+    def list_records(self, collection: str) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id, data FROM {collection}").fetchall()
+        return [(doc_id, json.loads(data)) for doc_id, data in rows]
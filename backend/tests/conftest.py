@@ -0,0 +1,45 @@
+"""
+Tests run against the in-memory store and the fake LLM backend, so nothing
+leaves the machine.
+
+    cd backend
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "5")
+os.environ.setdefault("FAKE_LLM_LATENCY_DIST", "fixed")
+os.environ.setdefault("FAKE_LLM_TOKEN_MS", "0")
+os.environ.setdefault("LLM_HTTP_PREWARM", "0")
+os.environ.setdefault("BACKGROUND_RETRY_BASE_MS", "1")
+os.environ.setdefault("BACKGROUND_RETRY_MAX_MS", "5")
+os.environ.setdefault("AGENT_CACHE_WATCH", "0")
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def client():
+    import db
+    from fastapi.testclient import TestClient
+    from main import app
+
+    for agent_id in ("alpha", "beta"):
+        db.create_agent_doc({"id": agent_id, "name": agent_id.title(), "role": "helper", "specialties": [agent_id]})
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def fake_backend():
+    import llm
+
+    previous = llm.get_backend()
+    yield lambda **kwargs: llm.set_backend(llm.FakeBackend(**{"dist": "fixed", **kwargs}))
+    llm.set_backend(previous)
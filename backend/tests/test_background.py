@@ -0,0 +1,70 @@
+import asyncio
+
+from background import WorkQueue
+
+
+def test_jobs_run_after_submit():
+    queue = WorkQueue(workers=2)
+    ran = []
+
+    async def scenario():
+        for i in range(5):
+            await queue.submit("job", ran.append, i)
+        await queue.drain()
+
+    asyncio.run(scenario())
+    assert sorted(ran) == [0, 1, 2, 3, 4]
+    assert queue.stats()["jobs"]["job"]["ok"] == 5
+
+
+def test_failed_job_is_retried():
+    queue = WorkQueue(workers=1, retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise RuntimeError("transient")
+
+    async def scenario():
+        await queue.submit("flaky", flaky)
+        await queue.drain()
+
+    asyncio.run(scenario())
+    assert len(attempts) == 2
+    assert queue.stats()["jobs"]["flaky"] == {"retried": 1, "ok": 1}
+
+
+def test_submit_after_drain_runs_inline_and_stays_closed():
+    queue = WorkQueue(workers=1)
+    ran = []
+
+    async def scenario():
+        await queue.submit("job", ran.append, "before")
+        await queue.drain()
+        await queue.submit("job", ran.append, "after")
+        # Ran before submit returned, with no worker left behind
+        assert ran == ["before", "after"]
+        assert queue._tasks == []
+
+    asyncio.run(scenario())
+    assert queue._closed
+
+
+def test_open_accepts_queued_jobs_again():
+    queue = WorkQueue(workers=1)
+    ran = []
+
+    async def first():
+        await queue.submit("job", ran.append, 1)
+        await queue.drain()
+
+    async def second():
+        queue.open()
+        await queue.submit("job", ran.append, 2)
+        assert queue._tasks
+        await queue.drain()
+
+    asyncio.run(first())
+    asyncio.run(second())
+    assert ran == [1, 2]
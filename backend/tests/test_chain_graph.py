@@ -0,0 +1,87 @@
+import time
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+import chain_graph
+from chain_graph import ChainGraphError
+from models import ChainGraphRequest, ChainNode
+
+
+def node(id, depends_on=(), timeout=None):
+    # model_construct skips validation, like a direct (non-HTTP) caller
+    return ChainNode.model_construct(id=id, agent_id=f"agent-{id}", depends_on=list(depends_on), timeout=timeout)
+
+
+def test_topological_order_puts_dependencies_first():
+    nodes = [node("c", ["a", "b"]), node("a"), node("b", ["a"])]
+    order = [n.id for n in chain_graph.topological_order(nodes)]
+    assert order == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize("nodes", [
+    [],
+    [node("a"), node("a")],
+    [node("a", ["missing"])],
+    [node("a", ["b"]), node("b", ["a"])],
+])
+def test_invalid_graphs_are_rejected(nodes):
+    with pytest.raises(ChainGraphError):
+        chain_graph.topological_order(nodes)
+
+
+def test_independent_nodes_run_concurrently_and_dependents_see_upstream():
+    nodes = [node("a"), node("b"), node("c", ["a", "b"])]
+    seen = {}
+
+    async def run_node(n, upstream, timeout):
+        seen[n.id] = dict(upstream)
+        await asyncio.sleep(0.1)
+        return n.id.upper()
+
+    start = time.perf_counter()
+    results = asyncio.run(chain_graph.run(nodes, run_node, time.monotonic() + 5))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.28  # a and b overlap: ~0.2s, not 0.3s
+    assert seen["c"] == {"a": "A", "b": "B"}
+    assert {k: r["status"] for k, r in results.items()} == {"a": "ok", "b": "ok", "c": "ok"}
+    assert chain_graph.critical_path(nodes, results)[-1] == "c"
+    assert chain_graph.frontier(nodes, results) == ["c"]
+
+
+def test_timed_out_node_is_dropped_and_dependents_still_run():
+    nodes = [node("slow", timeout=1.0), node("fast"), node("end", ["slow", "fast"])]
+    seen = {}
+
+    async def run_node(n, upstream, timeout):
+        seen[n.id] = dict(upstream)
+        await asyncio.sleep(5 if n.id == "slow" else 0.01)
+        return n.id
+
+    results = asyncio.run(chain_graph.run(nodes, run_node, time.monotonic() + 10))
+    assert results["slow"]["status"] == "timeout"
+    assert results["end"]["status"] == "ok"
+    assert seen["end"] == {"fast": "fast"}
+
+
+def test_tiny_node_timeouts_are_floored():
+    nodes = [node("a", timeout=0.001)]
+    budgets = []
+
+    async def run_node(n, upstream, timeout):
+        budgets.append(timeout)
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    results = asyncio.run(chain_graph.run(nodes, run_node, time.monotonic() + 5))
+    assert results["a"]["status"] == "ok"
+    assert budgets[0] >= chain_graph.CHAIN_MIN_TIMEOUT - 0.01
+
+
+def test_request_models_reject_tiny_timeouts():
+    with pytest.raises(ValidationError):
+        ChainGraphRequest(user_message="hi", nodes=[{"id": "a", "agent_id": "x", "timeout": 0.001}])
+    with pytest.raises(ValidationError):
+        ChainGraphRequest(user_message="hi", nodes=[{"id": "a", "agent_id": "x"}], timeout=0)
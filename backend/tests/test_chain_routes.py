@@ -0,0 +1,148 @@
+import time
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import llm
+import chain_graph
+from routes import chains
+
+
+def test_independent_legs_run_concurrently(client, fake_backend):
+    fake_backend(latency_ms=200)
+    r = client.post("/chains/query", json={
+        "primary_agent_id": "alpha",
+        "secondary_agent_id": "beta",
+        "user_message": "Compare two laptops for travel",
+        "pass_context": False,
+    })
+    assert r.status_code == 200
+    timings = r.json()["timings_ms"]
+    assert timings["llm.primary"] >= 200 and timings["llm.secondary"] >= 200
+    # Two legs plus the merge, not three calls back to back
+    assert timings["total"] < 550
+
+
+def test_abandoned_chain_leg_stops_its_llm_call(fake_backend):
+    fake_backend(latency_ms=2000)
+    backend = llm.get_backend()
+    original = backend.complete
+    state = {}
+
+    async def spy(*args, **kwargs):
+        try:
+            return await original(*args, **kwargs)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    backend.complete = spy
+
+    async def failing_leg():
+        await asyncio.sleep(0.05)
+        raise HTTPException(status_code=502, detail="boom")
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await chains._gather_or_cancel(
+                chains.complete([{"role": "user", "content": "abandoned leg"}]),
+                failing_leg(),
+            )
+
+    asyncio.run(scenario())
+    assert state == {"cancelled": True}
+
+
+def test_graph_rejects_tiny_node_timeout(client):
+    r = client.post("/chains/graph", json={
+        "user_message": "hi",
+        "nodes": [{"id": "a", "agent_id": "alpha", "timeout": 0.001}],
+    })
+    assert r.status_code == 422
+
+
+def test_graph_runs_nodes(client, fake_backend):
+    fake_backend(latency_ms=5)
+    r = client.post("/chains/graph", json={
+        "user_message": "Plan a weekend trip",
+        "nodes": [
+            {"id": "a", "agent_id": "alpha"},
+            {"id": "b", "agent_id": "beta", "depends_on": ["a"]},
+        ],
+    })
+    assert r.status_code == 200
+    body = r.json()
+    assert body["reply"]
+    assert {n: v["status"] for n, v in body["nodes"].items()} == {"a": "ok", "b": "ok"}
+
+
+def _event_names(text):
+    return [line.split(": ", 1)[1] for line in text.splitlines() if line.startswith("event:")]
+
+
+def test_stream_reports_legs_then_merged_answer(client, fake_backend):
+    fake_backend(latency_ms=5)
+    r = client.post("/chains/stream", json={
+        "primary_agent_id": "alpha",
+        "secondary_agent_id": "beta",
+        "user_message": "Compare two cameras for hiking",
+        "pass_context": True,
+    })
+    names = _event_names(r.text)
+    assert names[:4] == ["agent"] * 4
+    assert names[-1] == "done"
+    assert "token" in names
+
+
+def test_stream_ends_with_error_when_chain_deadline_passes(client, fake_backend, monkeypatch):
+    fake_backend(latency_ms=50, token_ms=100)
+    monkeypatch.setattr(chain_graph, "CHAIN_TIMEOUT", 0.5)
+    r = client.post("/chains/stream", json={
+        "primary_agent_id": "alpha",
+        "secondary_agent_id": "beta",
+        "user_message": "Compare two laptops for travel",
+        "pass_context": False,
+    })
+    assert _event_names(r.text)[-1] == "error"
+    assert '"status": 504' in r.text
+
+
+def test_link_is_idempotent(client):
+    first = client.post("/chains/link", json={"primary_agent_id": "alpha", "secondary_agent_id": "beta"})
+    second = client.post("/chains/link", json={"primary_agent_id": "alpha", "secondary_agent_id": "beta"})
+    assert first.status_code == second.status_code == 200
+    assert first.json()["chain_id"] == second.json()["chain_id"]
+    chains_for = client.get("/chains/chains/alpha").json()
+    assert len(chains_for["chains"]) == 1
+
+
+@pytest.mark.parametrize("pass_context", [True, False])
+def test_stream_deadline_covers_slow_legs(client, fake_backend, monkeypatch, pass_context):
+    fake_backend(latency_ms=3000)
+    backend = llm.get_backend()
+    original = backend.complete
+    cancelled = []
+
+    async def spy(*args, **kwargs):
+        try:
+            return await original(*args, **kwargs)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    backend.complete = spy
+    monkeypatch.setattr(chain_graph, "CHAIN_TIMEOUT", 0.3)
+
+    start = time.perf_counter()
+    r = client.post("/chains/stream", json={
+        "primary_agent_id": "alpha",
+        "secondary_agent_id": "beta",
+        "user_message": f"Slow legs, context {pass_context}",
+        "pass_context": pass_context,
+    })
+    assert time.perf_counter() - start < 2
+    assert _event_names(r.text)[-1] == "error"
+    assert '"status": 504' in r.text
+    # The legs were stopped, not left running after the stream ended
+    assert cancelled == [True] * (1 if pass_context else 2)
@@ -0,0 +1,152 @@
+import io
+import json
+import time
+
+from PIL import Image
+
+import images
+
+from response_cache import response_cache
+from routes import chat as chat_routes
+
+
+def test_query_replies_with_confidence(client):
+    r = client.post("/chat/query", json={"agent_id": "alpha", "user_message": "How should I plan meals for a busy week?"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["reply"].startswith("Happy to help with")
+    assert body["response_id"]
+    assert body["confidence"] is not None
+
+
+def test_query_unknown_agent(client):
+    r = client.post("/chat/query", json={"agent_id": "nobody", "user_message": "How should I plan meals for a busy week?"})
+    assert r.status_code == 404
+
+
+def test_query_runs_pre_llm_stages_concurrently(client, monkeypatch):
+    get_agent = chat_routes.get_agent_sync
+    detect = chat_routes.detect_language
+
+    def slow_agent(agent_id):
+        time.sleep(0.2)
+        return get_agent(agent_id)
+
+    def slow_language(text):
+        time.sleep(0.2)
+        return detect(text)
+
+    monkeypatch.setattr(chat_routes, "get_agent_sync", slow_agent)
+    monkeypatch.setattr(chat_routes, "detect_language", slow_language)
+
+    start = time.perf_counter()
+    r = client.post("/chat/query", json={"agent_id": "alpha", "user_message": "Which stretches help after a long run?"})
+    assert r.status_code == 200
+    assert time.perf_counter() - start < 0.35
+
+
+def _events(text):
+    out = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def test_stream_sends_tokens_then_done(client):
+    r = client.post("/chat/stream", json={"agent_id": "beta", "user_message": "What is a good way to learn chess openings?"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _events(r.text)
+    names = [name for name, _ in events]
+    assert names[-1] == "done" and set(names[:-1]) == {"token"}
+    done = events[-1][1]
+    assert "".join(data["delta"] for _, data in events[:-1]) == done["reply"]
+    assert done["response_id"]
+
+
+def test_stream_replays_cached_reply(client):
+    body = {"agent_id": "beta", "user_message": "How long should I steep green tea?"}
+    first = client.post("/chat/query", json=body).json()
+    events = _events(client.post("/chat/stream", json=body).text)
+    assert events == [("token", {"delta": first["reply"]}), ("done", first)]
+
+
+def test_thumbs_down_evicts_cached_reply(client):
+    body = {"agent_id": "alpha", "user_message": "Is it worth learning to touch type?"}
+    reply = client.post("/chat/query", json=body).json()
+    assert response_cache.get(reply["response_id"]) == reply["reply"]
+
+    r = client.post("/feedback/", json={
+        "chat_id": "c1",
+        "message_id": "m1",
+        "agent_id": "alpha",
+        "feedback_type": "thumbs_down",
+        "response_id": reply["response_id"],
+    })
+    assert r.status_code == 200
+    assert response_cache.get(reply["response_id"]) is None
+
+
+def test_image_raw_upload(client):
+    out = io.BytesIO()
+    Image.new("RGB", (1200, 900)).save(out, format="PNG")
+    r = client.post(
+        "/chat/image?agent_id=alpha&user_message=What is in this picture?",
+        content=out.getvalue(),
+        headers={"content-type": "image/png"},
+    )
+    assert r.status_code == 200
+    assert r.json()["reply"]
+
+
+def test_image_rejects_malformed_content_length(client):
+    r = client.post(
+        "/chat/image?agent_id=alpha",
+        content=b"abc",
+        headers={"content-type": "image/png", "content-length": "zz"},
+    )
+    assert r.status_code == 400
+
+
+def test_image_caps_chunked_multipart_upload(client, monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_MAX_BYTES", 1000)
+    body = (
+        b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.png"\r\n'
+        b"Content-Type: image/png\r\n\r\n" + b"x" * 200_000 + b"\r\n--b--\r\n"
+    )
+
+    def chunks():
+        for i in range(0, len(body), 4096):
+            yield body[i:i + 4096]
+
+    r = client.post(
+        "/chat/image?agent_id=alpha",
+        content=chunks(),
+        headers={"content-type": "multipart/form-data; boundary=b"},
+    )
+    assert r.status_code == 413
+    assert r.json()["detail"] == f"Request body exceeds {1000 + 64 * 1024} bytes"
+
+
+def test_image_rejects_non_text_fields(client):
+    r = client.post(
+        "/chat/image",
+        data={"agent_id": "alpha"},
+        files={"file": ("a.png", b"x" * 10, "image/png"), "user_message": ("m.txt", b"hi", "text/plain")},
+    )
+    assert r.status_code == 400
+
+
+def test_feedback_cannot_evict_another_agents_reply(client):
+    reply = client.post("/chat/query", json={"agent_id": "alpha", "user_message": "Should I learn Rust or Go first?"}).json()
+
+    r = client.post("/feedback/", json={
+        "chat_id": "c2",
+        "message_id": "m2",
+        "agent_id": "beta",
+        "feedback_type": "thumbs_down",
+        "response_id": reply["response_id"],
+    })
+    assert r.status_code == 200
+    assert response_cache.get(reply["response_id"]) == reply["reply"]
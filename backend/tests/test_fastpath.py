@@ -0,0 +1,47 @@
+from fastpath import FastPath, FastMatch
+
+
+CONFIG = {
+    "enabled": True,
+    "intents": {
+        "greeting": {
+            "phrases": {"English": ["hi", "hello there"], "Spanish": ["hola"], "Klingon": ["nuqneH"]},
+            "templates": {"English": "Hi, I'm {name}. Ask me about {specialties}.", "Spanish": "¡Hola! Soy {name}."},
+        },
+    },
+    "no_specialties": {"English": "anything"},
+}
+
+
+def test_matches_whole_phrases_only():
+    fast_path = FastPath(CONFIG)
+    assert fast_path.match("Hi!") == FastMatch("greeting", "English")
+    assert fast_path.match("  HELLO   there ") == FastMatch("greeting", "English")
+    assert fast_path.match("¡Hola!") == FastMatch("greeting", "Spanish")
+    assert fast_path.match("hi, can you help me with my taxes?") is None
+    assert fast_path.match("") is None
+
+
+def test_needs_a_template_for_the_language():
+    assert FastPath(CONFIG).match("nuqneH") is None
+
+
+def test_disabled():
+    assert FastPath({**CONFIG, "enabled": False}).match("hi") is None
+
+
+def test_render():
+    fast_path = FastPath(CONFIG)
+    found = fast_path.match("hi")
+    agent = {"name": "Ada", "specialties": ["math", "physics", "chess", "poetry"]}
+    assert fast_path.render(found, agent) == "Hi, I'm Ada. Ask me about math, physics, chess."
+    assert fast_path.render(found, {}) == "Hi, I'm your assistant. Ask me about anything."
+
+
+def test_greeting_skips_the_llm(client, fake_backend):
+    fake_backend(error_rate=1.0)
+    r = client.post("/chat/query", json={"agent_id": "alpha", "user_message": "Hello!"})
+    assert r.status_code == 200
+    body = r.json()
+    assert "Alpha" in body["reply"]
+    assert body["response_id"] is None
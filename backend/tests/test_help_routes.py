@@ -0,0 +1,10 @@
+import db
+
+
+def test_help_route_creates_agent_when_none_match(client):
+    r = client.post("/help/route", json={"prompt": "Teach me underwater basket weaving"})
+    assert r.status_code == 200
+    body = r.json()
+    agent = db.get_agent_by_id(body["agentId"])
+    assert agent is not None
+    assert "createdAt" in agent
@@ -0,0 +1,54 @@
+import io
+import base64
+
+import pytest
+from PIL import Image
+
+import images
+
+
+def _png(width, height, mode="RGB"):
+    out = io.BytesIO()
+    Image.new(mode, (width, height)).save(out, format="PNG")
+    return out.getvalue()
+
+
+def _decode(data_url):
+    assert data_url.startswith("data:image/jpeg;base64,")
+    return Image.open(io.BytesIO(base64.b64decode(data_url.partition(",")[2])))
+
+
+def test_downscales_to_the_model_size():
+    img = _decode(images.prepare_image(_png(3000, 1500)))
+    assert img.format == "JPEG"
+    assert img.size == (1536, 768)
+
+
+def test_small_and_transparent_images_become_jpeg():
+    img = _decode(images.prepare_image(_png(64, 32, "RGBA")))
+    assert img.size == (64, 32) and img.mode == "RGB"
+
+
+def test_identical_uploads_hit_the_cache():
+    raw = _png(40, 40)
+    first = images.prepare_image(raw)
+    hits = images.stats()["hits"]
+    assert images.prepare_image(raw) == first
+    assert images.stats()["hits"] == hits + 1
+
+
+def test_rejects_bad_input(monkeypatch):
+    with pytest.raises(images.ImageError):
+        images.prepare_image(b"")
+    with pytest.raises(images.ImageError):
+        images.prepare_image(b"not an image")
+    monkeypatch.setattr(images, "IMAGE_MAX_BYTES", 10)
+    with pytest.raises(images.ImageTooLarge):
+        images.prepare_image(b"x" * 11)
+
+
+def test_decodes_data_urls():
+    raw = _png(8, 8)
+    encoded = base64.b64encode(raw).decode("ascii")
+    assert images.decode_base64_image("data:image/png;base64," + encoded) == raw
+    assert images.decode_base64_image(encoded) == raw
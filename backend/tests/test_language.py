@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import language
+from language import detect_language
+
+
+def test_short_text_uses_greetings_and_defaults_to_english():
+    assert detect_language("Hola") == "Spanish"
+    assert detect_language("  bonjour ") == "French"
+    assert detect_language("ok thanks") == "English"
+    assert detect_language("") == "English"
+
+
+def test_script_decides_cjk():
+    assert detect_language("안녕하세요") == "Korean"
+    assert detect_language("こんにちは、元気ですか") == "Japanese"
+    assert detect_language("你好") == "Chinese"
+
+
+def test_long_text_is_detected_and_deterministic():
+    text = "Je voudrais apprendre à cuisiner des plats simples pour la semaine"
+    assert detect_language(text) == "French"
+    assert {detect_language(text) for _ in range(5)} == {"French"}
+
+
+def test_whitespace_variants_share_a_cache_entry():
+    text = "Quisiera aprender a cocinar platos sencillos para toda la semana"
+    detect_language(text)
+    hits = language.cache_stats()["hits"]
+    assert detect_language("  " + text.replace(" ", "   ") + "\n") == "Spanish"
+    assert language.cache_stats()["hits"] == hits + 1
+
+
+def test_concurrent_first_calls_agree():
+    texts = ["Ich möchte lernen, wie man einfache Gerichte für die Woche kocht"] * 16
+    with ThreadPoolExecutor(8) as pool:
+        assert set(pool.map(detect_language, texts)) == {"German"}
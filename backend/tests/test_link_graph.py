@@ -0,0 +1,39 @@
+from link_graph import LinkGraph, link_id
+
+
+def link(primary, secondary):
+    return {"primary_agent_id": primary, "secondary_agent_id": secondary}
+
+
+def graph():
+    g = LinkGraph()
+    g.replace([
+        (link_id("a", "b"), link("a", "b")),
+        (link_id("b", "c"), link("b", "c")),
+        (link_id("c", "d"), link("c", "d")),
+        (link_id("e", "a"), link("e", "a")),
+    ])
+    return g
+
+
+def test_neighbors_by_hops_and_direction():
+    g = graph()
+    assert g.neighbors("a") == {"b": 1, "e": 1}
+    assert g.neighbors("a", hops=3, direction="out") == {"b": 1, "c": 2, "d": 3}
+    assert g.neighbors("a", hops=3, direction="in") == {"e": 1}
+    assert g.neighbors("c", hops=2) == {"b": 1, "d": 1, "a": 2}
+    assert g.neighbors("missing") == {}
+
+
+def test_duplicate_documents_collapse_to_one_edge():
+    g = graph()
+    g.apply([("legacy-1", link("a", "b")), ("legacy-2", link("a", "b"))])
+    assert len(g) == 4
+    assert [l["id"] for l in g.links_for("a")] == [link_id("a", "b"), link_id("e", "a")]
+
+    # The edge stays until every document holding it is gone
+    g.apply([(link_id("a", "b"), None), ("legacy-1", None)])
+    assert g.neighbors("a", direction="out") == {"b": 1}
+    g.apply([("legacy-2", None)])
+    assert g.neighbors("a", direction="out") == {}
+    assert g.stats() == {"links": 3, "documents": 3, "agents": 5}
@@ -0,0 +1,92 @@
+import os
+import json
+
+import pytest
+
+import matcher
+from matcher import PatternSet, RuleSet
+
+
+RULES = {
+    "min_length": 20,
+    "clear_length": 50,
+    "greetings": ["hi", "hello"],
+    "vague_keywords": ["help", "idk"],
+    "refusal_patterns": ["outside my expertise", "i can't help with"],
+    "memory_rules": [
+        {"patterns": ["student"], "memory": "User is a student"},
+        {"patterns": ["car"], "mode": "word", "memory": "User is saving for a car"},
+    ],
+}
+
+
+def test_modes():
+    patterns = PatternSet([
+        ("hi", "exact", "greeting"),
+        ("car", "word", "car"),
+        ("student", "substring", "student"),
+    ])
+    assert patterns.scan("Hi ") == {"greeting"}
+    assert patterns.scan("hi there") == set()
+    assert patterns.scan("my car broke") == {"car"}
+    assert patterns.scan("a careful plan") == set()
+    assert patterns.scan("postgraduate students") == {"student"}
+    assert patterns.scan("") == set()
+
+
+def test_overlapping_and_prefix_patterns_all_match():
+    patterns = PatternSet([("help", "substring", "a"), ("help me", "substring", "b"), ("elp", "substring", "c")])
+    assert patterns.scan("please help me") == {"a", "b", "c"}
+    assert patterns.scan("help") == {"a", "c"}
+
+
+def test_classify_message():
+    rules = RuleSet(RULES)
+    traits = rules.classify_message("hello")
+    assert traits.is_greeting and traits.is_vague
+
+    traits = rules.classify_message("I'm a student saving for a car, what should I budget first?")
+    assert not traits.is_greeting and not traits.is_vague
+    assert traits.memories == ["User is a student", "User is saving for a car"]
+
+    assert rules.classify_message("idk, can you help with my taxes?").is_vague
+    assert rules.is_refusal("Sorry, that is outside my expertise.")
+    assert not rules.is_refusal("Happy to help!")
+
+
+@pytest.fixture
+def rules_file(tmp_path, monkeypatch):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(RULES))
+    monkeypatch.setattr(matcher, "RULES_PATH", str(path))
+    monkeypatch.setattr(matcher, "RULES_RELOAD_INTERVAL", 0)
+    monkeypatch.setattr(matcher, "_ruleset", None)
+    monkeypatch.setattr(matcher, "_mtime", None)
+    return path
+
+
+def _touch(path, text):
+    stat = os.stat(path)
+    path.write_text(text)
+    # Make sure the mtime moves even on coarse-grained filesystems
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_reloads_when_the_file_changes(rules_file):
+    first = matcher.current()
+    assert matcher.current() is first
+    assert not first.is_refusal("That is not my area.")
+
+    _touch(rules_file, json.dumps({**RULES, "refusal_patterns": ["not my area"]}))
+    second = matcher.current()
+    assert second is not first
+    assert second.is_refusal("That is not my area.")
+
+
+def test_keeps_last_good_rules_on_a_broken_file(rules_file):
+    first = matcher.current()
+    errors = matcher.stats()["reload_errors"]
+
+    _touch(rules_file, "{not json")
+    assert matcher.current() is first
+    assert matcher.stats()["reload_errors"] == errors + 1
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import memory_index
+
+
+def test_ranks_relevant_memory_first():
+    memory = ["User likes green tea", "User is budget-conscious", "User lives in Oslo"]
+    assert memory_index.search("rank", memory, "cheap budget trip")[0] == "User is budget-conscious"
+
+
+def test_appends_are_indexed_incrementally():
+    memory = ["User likes tea"]
+    index = memory_index.sync("append", memory)
+    memory = memory + ["User plays chess"]
+    assert memory_index.sync("append", memory) is index
+    assert memory_index.search("append", memory, "chess") == ["User plays chess"]
+
+
+def test_deleted_memory_is_not_returned():
+    memory = ["User likes tea", "User is budget-conscious"]
+    assert "User is budget-conscious" in memory_index.search("delete", memory, "a budget")
+
+    memory = memory[:-1]
+    assert memory_index.search("delete", memory, "a budget") == []
+
+
+def test_edit_in_the_middle_rebuilds():
+    memory = ["User likes tea", "User lives in Oslo", "User plays chess"]
+    memory_index.search("edit", memory, "oslo")
+
+    memory = ["User likes tea", "User lives in Bergen", "User plays chess"]
+    assert memory_index.search("edit", memory, "oslo") == []
+    assert memory_index.search("edit", memory, "bergen") == ["User lives in Bergen"]
+
+
+def test_agents_do_not_share_a_lock():
+    memory = ["User likes tea"]
+    memory_index.sync("busy", memory)
+    index = memory_index.sync("busy", memory)
+    with ThreadPoolExecutor(1) as pool, index.lock:
+        # Another agent is searched while this one is held
+        found = pool.submit(memory_index.search, "free", ["User plays chess"], "chess")
+        assert found.result(timeout=1) == ["User plays chess"]
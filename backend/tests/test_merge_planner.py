@@ -0,0 +1,39 @@
+import merge_planner
+from merge_planner import MergePlan
+
+
+ANSWER = "Start with a small monthly budget, track every expense for a few weeks, then cut the biggest leak."
+OTHER = "Pick a laptop with a long battery life, a light chassis and a bright screen for working outdoors."
+REFUSAL = "Sorry, that is outside my area of expertise, but I can help with cooking."
+
+
+def test_one_refusal_skips_the_merge():
+    assert merge_planner.plan([REFUSAL, ANSWER]) == MergePlan(True, 1, [1], "refused")
+    assert merge_planner.plan([ANSWER, ""]) == MergePlan(True, 0, [0], "refused")
+
+
+def test_all_refused_still_merges():
+    assert merge_planner.plan([REFUSAL, REFUSAL]) == MergePlan(False, None, [0, 1], "all_refused")
+
+
+def test_duplicates_keep_the_longer_answer():
+    longer = ANSWER + " Review it every month."
+    assert merge_planner.plan([ANSWER, longer]) == MergePlan(True, 1, [1], "duplicate")
+
+
+def test_distinct_answers_are_merged():
+    assert merge_planner.plan([ANSWER, OTHER]) == MergePlan(False, None, [0, 1], "distinct")
+    # A near-duplicate is dropped from the merge inputs
+    plan = merge_planner.plan([ANSWER, OTHER, ANSWER + " Review it every month."])
+    assert plan == MergePlan(False, None, [1, 2], "distinct")
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(merge_planner, "MERGE_PLANNER", False)
+    assert merge_planner.plan([REFUSAL, ANSWER]) == MergePlan(False, None, [0, 1], "disabled")
+
+
+def test_similarity():
+    assert merge_planner.similarity(ANSWER, ANSWER) == 1.0
+    assert merge_planner.similarity(ANSWER, OTHER) < 0.2
+    assert merge_planner.similarity("", ANSWER) == 0.0
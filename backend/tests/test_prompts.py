@@ -0,0 +1,33 @@
+import prompts
+
+
+AGENT = {"id": "p1", "name": "Ada", "role": "tutor", "specialties": ["math"], "memory": []}
+
+
+def test_static_prefix_is_compiled_once_per_version():
+    text, tokens = prompts.compile_static("chat", AGENT)
+    assert "Ada" in text and "math" in text
+    assert tokens == prompts.count_tokens(text)
+
+    hits = prompts.stats()["compile_hits"]
+    # Memory is not part of the version: the prefix stays byte-identical
+    assert prompts.compile_static("chat", {**AGENT, "memory": ["User likes tea"]}) == (text, tokens)
+    assert prompts.stats()["compile_hits"] == hits + 1
+
+    edited, _ = prompts.compile_static("chat", {**AGENT, "specialties": ["physics"]})
+    assert "physics" in edited and edited != text
+
+
+def test_build_appends_the_per_request_tail():
+    static_text, _ = prompts.compile_static("chat", AGENT)
+    tail = prompts.chat_tail(["User is a student"], "French")
+    prompt = prompts.build("chat", AGENT, tail)
+    assert prompt.startswith(static_text)
+    assert prompt.endswith(tail)
+    assert "User is a student" in tail and "French" in tail
+
+
+def test_count_tokens():
+    assert prompts.count_tokens("") == 0
+    assert prompts.count_tokens("hello world") >= 2
+    assert prompts.count_tokens("word " * 100) > prompts.count_tokens("word " * 10)
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+import llm
+from resilience import CircuitBreaker, CircuitOpenError, ResilientBackend
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class SlowBackend(llm.LLMBackend):
+    name = "slow"
+
+    async def complete(self, messages, model=llm.DEFAULT_MODEL, max_tokens=300, temperature=None, timeout=None):
+        await asyncio.sleep(10)
+
+
+class ClientTimeoutBackend(llm.LLMBackend):
+    # Like the OpenAI client giving up on its own timeout first
+    name = "client_timeout"
+
+    async def complete(self, messages, model=llm.DEFAULT_MODEL, max_tokens=300, temperature=None, timeout=None):
+        raise llm.LLMError("timed out", retryable=True, timed_out=True)
+
+
+class FailingBackend(llm.LLMBackend):
+    name = "failing"
+
+    async def complete(self, messages, model=llm.DEFAULT_MODEL, max_tokens=300, temperature=None, timeout=None):
+        raise llm.LLMError("upstream 500", retryable=True)
+
+
+async def _call_many(backend, n, timeout=None):
+    for _ in range(n):
+        with pytest.raises(llm.LLMError):
+            await backend.complete(MESSAGES, timeout=timeout)
+
+
+@pytest.mark.parametrize("inner", [SlowBackend, ClientTimeoutBackend])
+def test_short_caller_deadlines_do_not_open_breaker(inner):
+    backend = ResilientBackend(inner(), retries=0)
+    asyncio.run(_call_many(backend, backend.breaker.threshold + 3, timeout=0.01))
+    assert backend.breaker.state == "closed"
+    assert backend.breaker.failures == 0
+
+
+def test_upstream_failures_open_breaker():
+    backend = ResilientBackend(FailingBackend(), retries=0)
+
+    async def scenario():
+        await _call_many(backend, backend.breaker.threshold)
+        with pytest.raises(CircuitOpenError):
+            await backend.complete(MESSAGES)
+
+    asyncio.run(scenario())
+    assert backend.breaker.state == "open"
+
+
+def test_full_budget_timeouts_count_as_failures():
+    backend = ResilientBackend(ClientTimeoutBackend(), retries=0)
+    asyncio.run(_call_many(backend, backend.breaker.threshold))
+    assert backend.breaker.state == "open"
+
+
+def test_only_the_probe_frees_the_half_open_slot():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    assert breaker.before_call() is False
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    probe = breaker.before_call()
+    assert probe is True
+    # A cancelled call that was admitted before the breaker opened (e.g. a
+    # hedge loser) must not let a second probe through
+    breaker.release(False)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.release(probe)
+    assert breaker.before_call() is True
@@ -0,0 +1,74 @@
+import time
+
+from response_cache import ResponseCache, make_key
+
+
+AGENT = {"id": "a1", "name": "Ada", "role": "tutor", "memory": []}
+
+
+def test_hit_after_set():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    key = make_key(AGENT, "Hello there", "en", [])
+    assert cache.get(key) is None
+    cache.set(key, "a1", "hi")
+    assert cache.get(key) == "hi"
+
+
+def test_key_ignores_case_and_spacing_but_not_memory():
+    key = make_key(AGENT, "Hello  there", "en", [])
+    assert key == make_key(AGENT, "hello there", "en", [])
+    assert key != make_key(AGENT, "hello there", "en", ["User likes tea"])
+
+
+def test_config_change_invalidates_agent():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    cache.check_agent_version(AGENT)
+    key = make_key(AGENT, "hi", "en", [])
+    cache.set(key, "a1", "reply")
+
+    cache.check_agent_version({**AGENT, "role": "critic"})
+    assert cache.get(key) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_memory_only_change_keeps_entries():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    cache.check_agent_version(AGENT)
+    key = make_key(AGENT, "hi", "en", [])
+    cache.set(key, "a1", "reply")
+
+    cache.check_agent_version({**AGENT, "memory": ["User likes tea"]})
+    assert cache.get(key) == "reply"
+
+
+def test_invalidate_agent_leaves_others():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    cache.set("k1", "a1", "one")
+    cache.set("k2", "a2", "two")
+    assert cache.invalidate_agent("a1") == 1
+    assert cache.get("k1") is None
+    assert cache.get("k2") == "two"
+
+
+def test_lru_eviction_and_ttl():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.set("k1", "a1", "one")
+    cache.set("k2", "a1", "two")
+    cache.get("k1")
+    cache.set("k3", "a1", "three")
+    assert cache.get("k2") is None
+    assert cache.get("k1") == "one"
+
+    short = ResponseCache(max_entries=2, ttl=0.01)
+    short.set("k", "a1", "v")
+    time.sleep(0.02)
+    assert short.get("k") is None
+
+
+def test_evict_checks_the_agent():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    cache.set("k", "a1", "reply")
+    assert not cache.evict("k", agent_id="a2")
+    assert cache.get("k") == "reply"
+    assert cache.evict("k", agent_id="a1")
+    assert cache.get("k") is None
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_identical_calls_share_one_upstream_call():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("k", fn) for _ in range(3)))
+
+    assert asyncio.run(scenario()) == ["answer"] * 3
+    assert len(calls) == 1
+    assert flight.stats()["coalesced"] == 2
+
+
+def test_call_survives_while_someone_still_waits():
+    flight = SingleFlight("test")
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("k", fn))
+        second = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "answer"
+    assert flight.stats()["abandoned"] == 0
+
+
+def test_call_is_cancelled_when_last_waiter_leaves():
+    flight = SingleFlight("test")
+    state = {}
+
+    async def fn():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def scenario():
+        waiter = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert state == {"cancelled": True}
+    assert flight.stats()["in_flight"] == 0
+    assert flight.stats()["abandoned"] == 1
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight("test")
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(flight.do("k", fn), flight.do("k", fn), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+
+from storage import SERVER_TIMESTAMP
+from storage.base import COLLECTION_FEEDBACK, COLLECTION_SAVED_RESPONSES
+from storage.memory import MemoryStore
+from storage.sqlite import SQLiteStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore()
+    return SQLiteStore(str(tmp_path / "test.db"))
+
+
+def test_agents_round_trip(store):
+    agent_id = store.new_agent_id()
+    doc = store.put_agent(agent_id, {"name": "Ada", "createdAt": SERVER_TIMESTAMP})
+    assert isinstance(doc["createdAt"], str)
+
+    assert store.get_agent(agent_id) == {**doc, "id": agent_id}
+    assert store.get_agent("missing") is None
+    assert [a["id"] for a in store.list_agents()] == [agent_id]
+
+
+def test_append_agent_memory_skips_duplicates(store):
+    store.put_agent("a1", {"name": "Ada", "memory": ["User likes tea"]})
+    assert store.append_agent_memory("a1", ["User likes tea", "User is a student"])
+    assert store.get_agent("a1")["memory"] == ["User likes tea", "User is a student"]
+    assert not store.append_agent_memory("missing", ["x"])
+
+
+def test_records_are_found_by_field_and_tags(store):
+    store.add(COLLECTION_SAVED_RESPONSES, {"agent_id": "a1", "tags": ["budget"]})
+    store.add(COLLECTION_SAVED_RESPONSES, {"agent_id": "a1", "tags": ["travel"]})
+    store.add(COLLECTION_SAVED_RESPONSES, {"agent_id": "a2", "tags": ["budget"]})
+
+    assert len(store.find(COLLECTION_SAVED_RESPONSES, "agent_id", "a1")) == 2
+    found = store.find(COLLECTION_SAVED_RESPONSES, "agent_id", "a1", tags=["budget"])
+    assert [r["tags"] for r in found] == [["budget"]]
+    # Unindexed fields fall back to a scan
+    assert len(store.find(COLLECTION_SAVED_RESPONSES, "tags", ["budget"])) == 2
+
+
+def test_add_with_id_replaces_the_record(store):
+    store.add(COLLECTION_FEEDBACK, {"agent_id": "a1", "feedback_type": "thumbs_up"}, doc_id="f1")
+    store.add(COLLECTION_FEEDBACK, {"agent_id": "a2", "feedback_type": "thumbs_down"}, doc_id="f1")
+
+    assert store.find(COLLECTION_FEEDBACK, "agent_id", "a1") == []
+    assert store.list_records(COLLECTION_FEEDBACK) == [
+        ("f1", {"agent_id": "a2", "feedback_type": "thumbs_down"})
+    ]
+
+
+def test_firestore_put_agent_resolves_timestamps_like_local_stores():
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+    from fake_firestore import FakeFirestore
+    from storage.firestore import FirestoreStore
+
+    store = FirestoreStore(client=FakeFirestore(latency_ms=0))
+    doc = store.put_agent("a1", {"name": "Ada", "createdAt": SERVER_TIMESTAMP})
+    assert isinstance(doc["createdAt"], str)
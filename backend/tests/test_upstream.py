@@ -0,0 +1,42 @@
+import asyncio
+
+import httpx
+
+import llm
+import upstream
+
+
+def test_openai_backend_survives_upstream_close():
+    backend = llm.OpenAIBackend()
+
+    async def scenario():
+        first = backend.client
+        await upstream.aclose()
+        second = backend.client
+        assert second is not first
+        assert not second._client.is_closed
+        await upstream.aclose()
+
+    asyncio.run(scenario())
+
+
+class StubTransport(httpx.AsyncBaseTransport):
+    async def handle_async_request(self, request):
+        return httpx.Response(200, stream=httpx.ByteStream(b"ok"))
+
+
+def test_client_is_shared_and_counts_requests():
+    async def scenario():
+        client = upstream.get_client()
+        assert upstream.get_client() is client
+        transport = upstream._transport
+        transport.inner = StubTransport()
+
+        responses = await asyncio.gather(*(client.get("https://llm.test/ping") for _ in range(3)))
+        assert [r.text for r in responses] == ["ok"] * 3
+        stats = upstream.stats()
+        assert stats["requests"] == 3 and stats["in_flight"] == 0
+        await upstream.aclose()
+        assert upstream.stats()["active"] is False
+
+    asyncio.run(scenario())
@@ -0,0 +1,192 @@
+# backend/upstream.py
+"""
+Process-wide HTTP client for upstream LLM calls.
+
+Every route reaches the LLM through llm.get_backend(), and the OpenAI
+backend sends all its requests through the one httpx.AsyncClient built here,
+so a burst of chats reuses warm keep-alive connections instead of opening
+new ones (TCP + TLS handshakes) per client.
+
+- Pool: LLM_HTTP_MAX_CONNECTIONS total, LLM_HTTP_MAX_KEEPALIVE idle ones
+  kept for LLM_HTTP_KEEPALIVE_EXPIRY seconds
+- LLM_HTTP2=1 multiplexes requests over fewer connections (needs the h2
+  package; falls back to HTTP/1.1 without it)
+- prewarm() opens LLM_HTTP_PREWARM connections at startup
+- In-flight requests and requests that found every connection busy are
+  exported on /metrics (llm_http_in_flight, llm_http_pool_waits_total)
+"""
+import os
+import time
+import asyncio
+from typing import Dict, Optional
+
+import httpx
+
+import metrics
+
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "5"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "0") == "1"
+LLM_HTTP_PREWARM = int(os.getenv("LLM_HTTP_PREWARM", "2"))
+
+
+class _CountingStream(httpx.AsyncByteStream):
+    """
+    Response body wrapper that marks the request finished once the body is
+    closed, so streamed completions count as in flight until their last token.
+    """
+
+    def __init__(self, inner, done):
+        self._inner = inner
+        self._done = done
+
+    async def __aiter__(self):
+        async for chunk in self._inner:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._inner.aclose()
+        finally:
+            self._done()
+
+
+class PoolTransport(httpx.AsyncBaseTransport):
+    """
+    httpx.AsyncHTTPTransport plus in-flight / pool-wait accounting.
+    """
+
+    def __init__(self, limits: httpx.Limits, http2: bool):
+        self.inner = httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+        self.max_connections = limits.max_connections
+        self.http2 = http2
+        self.in_flight = 0
+        self.requests = 0
+        self.pool_waits = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if not self.http2 and self.in_flight >= self.max_connections:
+            # HTTP/1.1: one request per connection, so this one queues
+            self.pool_waits += 1
+            metrics.observe_upstream_pool_wait()
+        self.in_flight += 1
+        metrics.observe_upstream_in_flight(self.in_flight)
+
+        finished = False
+
+        def done():
+            nonlocal finished
+            if not finished:
+                finished = True
+                self.in_flight -= 1
+                metrics.observe_upstream_in_flight(self.in_flight)
+
+        try:
+            response = await self.inner.handle_async_request(request)
+        except BaseException:
+            done()
+            raise
+        response.stream = _CountingStream(response.stream, done)
+        return response
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+    def connections(self) -> Dict:
+        # httpcore's pool exposes its connections; count open vs idle ones
+        pool = getattr(self.inner, "_pool", None)
+        conns = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for c in conns if getattr(c, "is_idle", lambda: False)())
+        return {"open": len(conns), "idle": idle}
+
+
+_client: Optional[httpx.AsyncClient] = None
+_transport: Optional[PoolTransport] = None
+_stats = {"prewarmed": 0, "prewarm_ms": None}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client, _transport
+    if _client is None:
+        http2 = LLM_HTTP2
+        if http2 and not _http2_available():
+            print("LLM_HTTP2=1 but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+        limits = httpx.Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+        )
+        _transport = PoolTransport(limits, http2)
+        _client = httpx.AsyncClient(
+            transport=_transport,
+            # Per-request read deadlines come from the LLM call itself
+            timeout=httpx.Timeout(None, connect=LLM_HTTP_CONNECT_TIMEOUT),
+        )
+        metrics.observe_upstream_pool_size(LLM_HTTP_MAX_CONNECTIONS)
+    return _client
+
+
+async def prewarm(url: str, headers: Optional[Dict] = None, connections: int = LLM_HTTP_PREWARM):
+    """
+    Open `connections` keep-alive connections to the upstream host by
+    sending that many concurrent cheap requests. Failures are ignored:
+    this only saves the first requests a handshake.
+    """
+    if connections <= 0:
+        return
+    client = get_client()
+    start = time.perf_counter()
+
+    async def ping():
+        try:
+            response = await client.get(url, headers=headers, timeout=LLM_HTTP_CONNECT_TIMEOUT * 2)
+            await response.aclose()
+            return True
+        except Exception as e:
+            print("Upstream prewarm failed:", e)
+            return False
+
+    results = await asyncio.gather(*(ping() for _ in range(connections)))
+    _stats["prewarmed"] += sum(results)
+    _stats["prewarm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def aclose():
+    global _client, _transport
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _transport = None
+
+
+def stats() -> Dict:
+    transport = _transport
+    out = {
+        **_stats,
+        "max_connections": LLM_HTTP_MAX_CONNECTIONS,
+        "max_keepalive": LLM_HTTP_MAX_KEEPALIVE,
+        "keepalive_expiry": LLM_HTTP_KEEPALIVE_EXPIRY,
+    }
+    if transport is None:
+        return {**out, "active": False}
+    return {
+        **out,
+        "active": True,
+        "http2": transport.http2,
+        "requests": transport.requests,
+        "in_flight": transport.in_flight,
+        "pool_waits": transport.pool_waits,
+        "connections": transport.connections(),
+    }